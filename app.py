@@ -7,6 +7,8 @@ from typing import Any, Dict, Optional
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
+from src.task_store import TaskStore
+
 
 # ---------- Agent Card (A2A) ----------
 AGENT_CARD: Dict[str, Any] = {
@@ -35,7 +37,11 @@ AGENT_CARD: Dict[str, Any] = {
 
 app = FastAPI(title="Green Agent", version="0.1.0")
 
-_TASK_STORE: Dict[str, Dict[str, Any]] = {}
+# bounded: finished echo tasks expire after TTL and the oldest are evicted past max_tasks
+_TASK_STORE = TaskStore(
+    max_tasks=int(os.getenv("TASK_STORE_MAX_TASKS", "256")),
+    ttl_seconds=float(os.getenv("TASK_STORE_TTL_SECONDS", "86400")),
+)
 
 
 @app.get("/.well-known/agent-card.json")
@@ -138,15 +144,16 @@ async def _handle_jsonrpc(request: Request):
             "metadata": {},
         }
 
-        _TASK_STORE[task_id] = result
+        _TASK_STORE.put(task_id, result)
         return JSONResponse({"jsonrpc": "2.0", "id": req_id, "result": result})
 
     # ---- tasks/get ----
     if method == "tasks/get":
         task_id = (params or {}).get("id")
-        if not task_id or task_id not in _TASK_STORE:
+        task = _TASK_STORE.get(task_id) if task_id else None
+        if task is None:
             return _jsonrpc_error(req_id, -32004, "Task not found")
-        return JSONResponse({"jsonrpc": "2.0", "id": req_id, "result": _TASK_STORE[task_id]})
+        return JSONResponse({"jsonrpc": "2.0", "id": req_id, "result": task})
 
     return _jsonrpc_error(req_id, -32601, f"Method not found: {method}")
 
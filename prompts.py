@@ -1,4 +1,7 @@
-from langchain.prompts import PromptTemplate
+try:
+    from langchain_core.prompts import PromptTemplate
+except ImportError:
+    from langchain.prompts import PromptTemplate
 
 REACT_INSTRUCTION = """解决一个问答任务, 步骤包括交替进行的"思考", "行动"和"观察".
 - "思考"用于基于现在的情况推理下一步, 注意你只需要思考下一步.
@@ -8,7 +11,6 @@ REACT_INSTRUCTION = """解决一个问答任务, 步骤包括交替进行的"思
 {tools}
 其中相关的数据表格及其包含的字段包括(只要在表格中出现的字段可以作为columns参数中的值!):
 {table_used_prompt}
-- "行动"一次只能调用一次工具, 若要多次调用工具, 请拆分成多步分别调用.
 - "行动"一定要按照以下json格式输出, 可以被Python json.loads函数解析:
 ```json
 {{
@@ -16,6 +18,14 @@ REACT_INSTRUCTION = """解决一个问答任务, 步骤包括交替进行的"思
     "action_input": $INPUT
 }}
 ```
+- 若需要同时调用多个互不依赖的工具(例如分别查询几家公司的信息), 可以在一次"行动"中输出由上述对象组成的json列表, 这些调用会同时执行, 观察结果按列表顺序编号返回:
+```json
+[
+    {{"action": $TOOL_NAME, "action_input": $INPUT}},
+    {{"action": $TOOL_NAME, "action_input": $INPUT}}
+]
+```
+- 如果一个调用的输入依赖另一个调用的结果, 请拆分成多步分别调用; "Final Answer"必须单独输出.
 
 以下是一些示例:
 {examples}
@@ -61,7 +71,6 @@ PS_INSTRUCTION_SOLVE = """给定单步计划, 请你按照计划的内容输出
 {tools}
 其中相关的数据表格及其包含的字段包括(只要在表格中出现的字段可以作为columns参数中的值!):
 {table_used_prompt}
-- "行动"一次只能调用一次工具, 若要多次调用工具, 请拆分成多步分别调用.
 - "行动"一定要按照以下json格式输出, 可以被Python json.loads函数解析:
 ```json
 {{
@@ -69,6 +78,14 @@ PS_INSTRUCTION_SOLVE = """给定单步计划, 请你按照计划的内容输出
     "action_input": $INPUT
 }}
 ```
+- 若需要同时调用多个互不依赖的工具(例如分别查询几家公司的信息), 可以在一次"行动"中输出由上述对象组成的json列表, 这些调用会同时执行, 观察结果按列表顺序编号返回:
+```json
+[
+    {{"action": $TOOL_NAME, "action_input": $INPUT}},
+    {{"action": $TOOL_NAME, "action_input": $INPUT}}
+]
+```
+- 如果一个调用的输入依赖另一个调用的结果, 请拆分成多步分别调用; "Final Answer"必须单独输出.
 
 以下是一些示例:
 {examples}
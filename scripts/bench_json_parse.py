@@ -0,0 +1,188 @@
+import sys
+import os
+import json
+import re
+import time
+import sqlite3
+import argparse
+# 添加 src 目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from src.json_scan import loads_tolerant
+from src.judge_cache import DEFAULT_CACHE_PATH
+
+# 对比旧的多策略 parse_json_from_response（正则 + 全局替换 + 重试 json.loads）和 src/json_scan.py 的单遍扫描：
+# 解析成功率、两者都成功时结果是否一致、每次解析耗时 p50/p99（微秒）。
+# 语料：judge 缓存里真实的 judge 原始回答（--judge_cache），可选的 jsonl 语料（每行 {"text": ...} 或一个字符串），
+# 再加上一组内置的典型 judge / agent 输出形态。先跑一组回归用例（期望类型过滤、深度嵌套的线性扫描），失败则退出码 1。
+#
+#   python scripts/bench_json_parse.py
+#   python scripts/bench_json_parse.py --judge_cache output/judge_cache.sqlite --corpus output/agent_steps.jsonl
+
+
+BUILTIN_CORPUS = [
+    '{"signal": "GREEN", "reason": "答案与法条一致", "score": 1}',
+    '```json\n{"signal": "YELLOW", "reason": "缺少引用", "score": 0.6}\n```',
+    'Here is my audit:\n{ "signal": "RED", "reason": "引用了不存在的法条", "score": 0 }\nHope it helps.',
+    '[Query] 已审阅。结论如下: {"signal": "GREEN", "reason": "Correct; the agent didn\'t hallucinate.", "score": 0.9}',
+    "{'signal': 'YELLOW', 'reason': 'partially supported', 'score': 0.5}",
+    '｛"signal"："GREEN"，"reason"："完全正确"，"score"：1｝',
+    '{“signal”: “RED”, “reason”: “与事实矛盾”, “score”: 0}',
+    '{"signal": "GREEN", "reason": "see {法条} in section", "score": 1,}',
+    '{"signal": "YELLOW", "reason": "the answer cites 《民法典》第五百七十七条 but the reasoning is cut',
+    '```json{"action": "get_company_info", "action_input": {"identifier": "上海妙可蓝多食品科技股份有限公司", "columns": ["董秘"]}}```',
+    '```json[{"action": "get_legal_document", "action_input": {"identifier": "(2019)沪0115民初12345号"}}, '
+    '{"action": "get_court_info", "action_input": {"identifier": "上海市浦东新区人民法院"}}]```',
+    '```json{"action": "Final Answer", "action_input": "该公司的注册资本为 5000 万元"}```',
+    '[{"subject": "被告", "predicate": "违反", "object": "合同约定"}, {"subject": "原告", "predicate": "主张", "object": "违约金"}]',
+    'The triples are:\n```\n[["被告", "应支付", "违约金"], ["合同", "成立于", "2019年"]]\n```',
+    '{"signal": "GREEN", "reason": "OK", "score": .8, "valid": True, "note": None}',
+    '{"名称": ["CompanyInfo", "LegalDoc"]}',
+    '根据问题, 需要的表是 ```json\n{"名称": ["CompanyRegister"]}\n```',
+    'No structured output here, sorry.',
+]
+
+
+# 回归用例：(文本, expect, 期望结果)；期望结果为 None 表示应当抛 json.JSONDecodeError
+REGRESSIONS = [
+    # 正文里带方括号的文字在真正的对象之前：按期望类型跳过
+    ('根据《民法典》第[577]条的规定… {"signal": "GREEN", "reason": "ok", "score": 1}', dict,
+     {"signal": "GREEN", "reason": "ok", "score": 1}),
+    ('见第[3]项。```json\n{"signal": "RED", "score": 0}\n```', dict, {"signal": "RED", "score": 0}),
+    ('第[1]条、第[2]条 [{"id": 1, "signal": "GREEN", "score": 1}]', list, [1]),
+    ('只有 [577] 没有对象', dict, None),
+]
+# 深度嵌套 / 大量失败候选：扫描应当是线性的（旧实现每个失败候选都从下一个字符重扫，8k 层约 10 秒）
+DEEP_INPUTS = ["[" * 8000, "[" * 8000 + "x", "{" * 8000, "[1," * 8000, "第[" * 8000 + '{"a": 1}']
+DEEP_BUDGET_S = 1.0
+
+
+def check_regressions() -> bool:
+    ok = True
+    for text, expect, want in REGRESSIONS:
+        try:
+            got = loads_tolerant(text, expect=expect)
+        except json.JSONDecodeError:
+            got = None
+        if want is not None and expect is list and isinstance(got, list):
+            got = [x.get("id") if isinstance(x, dict) else x for x in got]  # 只比 id
+        if got != want:
+            ok = False
+            print(f"REGRESSION {text[:40]!r}: expected {want!r}, got {got!r}")
+    for text in DEEP_INPUTS:
+        t0 = time.perf_counter()
+        for repair in (True, False):
+            try:
+                loads_tolerant(text, repair=repair)
+            except json.JSONDecodeError:
+                pass
+        secs = time.perf_counter() - t0
+        if secs > DEEP_BUDGET_S:
+            ok = False
+            print(f"REGRESSION deep input {text[:10]!r}x{len(text)}: {secs:.2f}s > {DEEP_BUDGET_S}s")
+    print(f"regressions: {'ok' if ok else 'FAILED'} ({len(REGRESSIONS)} cases, {len(DEEP_INPUTS)} deep inputs)")
+    return ok
+
+
+def legacy_parse(rsp: str):
+    """
+    旧版 parse_json_from_response 的解析逻辑（去掉了打印），只用于对比
+    """
+    match = re.search(r"```(?:json|JSON)?(.*?)```", rsp, re.DOTALL)
+    if match:
+        json_str = match.group(1).strip()
+    else:
+        start = rsp.find('{')
+        end = rsp.rfind('}')
+        json_str = rsp[start:end + 1] if start != -1 and end != -1 else rsp.strip()
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        try:
+            return json.loads(json_str.replace('(', '（').replace(')', '）').replace("'", '"'))
+        except json.JSONDecodeError as e:
+            match = re.search(r"\{(.*?)\}", json_str, re.DOTALL)
+            if match:
+                try:
+                    return json.loads("[{" + match.group(1) + "}]")
+                except json.JSONDecodeError:
+                    pass
+            raise e
+
+
+def load_corpus(args) -> list:
+    texts = list(BUILTIN_CORPUS) if not args.no_builtin else []
+    if args.judge_cache and os.path.exists(args.judge_cache):
+        conn = sqlite3.connect(args.judge_cache)
+        try:
+            rows = conn.execute("SELECT value FROM judge_cache LIMIT ?", (args.max_samples,)).fetchall()
+        finally:
+            conn.close()
+        texts.extend(r[0] for r in rows)
+        print(f"judge cache: {len(rows)} responses from {args.judge_cache}")
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                obj = json.loads(line)
+                if isinstance(obj, dict):
+                    obj = obj.get("text") or obj.get("response") or obj.get("raw") or ""
+                texts.append(str(obj))
+    return texts
+
+
+def run(parse, texts, repeat: int):
+    results, lat = [], []
+    for t in texts:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            try:
+                value, ok = parse(t), True
+            except Exception:
+                value, ok = None, False
+        lat.append((time.perf_counter() - t0) * 1e6 / repeat)
+        results.append((ok, value))
+    return results, np.asarray(lat)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--judge_cache", default=DEFAULT_CACHE_PATH, help="read raw judge responses from this cache")
+    parser.add_argument("--corpus", default="", help="jsonl of raw LLM outputs ({\"text\": ...} or a string per line)")
+    parser.add_argument("--max_samples", type=int, default=10000)
+    parser.add_argument("--no_builtin", action="store_true", help="skip the built-in sample outputs")
+    parser.add_argument("--repeat", type=int, default=20, help="parses per sample when timing")
+    parser.add_argument("--show_diffs", action="store_true", help="print samples where the parsers disagree")
+    args = parser.parse_args()
+
+    if not check_regressions():
+        sys.exit(1)
+    texts = load_corpus(args)
+    if not texts:
+        print("Error: 语料为空")
+        return
+    old, old_lat = run(legacy_parse, texts, args.repeat)
+    new, new_lat = run(loads_tolerant, texts, args.repeat)
+
+    both = [(o, n) for o, n in zip(old, new) if o[0] and n[0]]
+    agree = sum(1 for o, n in both if o[1] == n[1])
+    print(f"samples: {len(texts)}")
+    print(f"{'parser':<8} {'parsed':>8} {'p50 us':>9} {'p99 us':>9}")
+    for name, res, lat in (("legacy", old, old_lat), ("scan", new, new_lat)):
+        print(f"{name:<8} {sum(ok for ok, _ in res):>8} {np.percentile(lat, 50):>9.1f} {np.percentile(lat, 99):>9.1f}")
+    print(f"both parsed: {len(both)}, identical: {agree}")
+    if args.show_diffs:
+        for t, o, n in zip(texts, old, new):
+            if o != n:
+                print("-" * 40)
+                print(t[:300])
+                print(f"  legacy: {o[1] if o[0] else 'FAIL'}")
+                print(f"  scan:   {n[1] if n[0] else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+# 添加 src 目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from src.green_rag_engine import DEFAULT_INDEX_ROOT
+from src.vector_index import VectorIndex
+
+# 对比单阶段精确检索 vs Matryoshka 两阶段检索（截断维度粗排 + 全维精排）：
+# recall@k 以单阶段精确结果为基准，延迟统计 p50/p99（毫秒）。
+#
+#   python scripts/bench_retrieval.py --synthetic 200000 --dim 1024
+#   python scripts/bench_retrieval.py --collection legal_benchmark_v1 --dims 128,256,512 --candidates 50,100,400
+
+
+def synthetic_index(path: str, n: int, dim: int, seed: int = 0) -> VectorIndex:
+    """
+    随机语料：前几维能量更大（模拟 Matryoshka 训练出的向量），分块写入避免一次占满内存。
+    """
+    rng = np.random.default_rng(seed)
+    scale = 1.0 / np.sqrt(1.0 + np.arange(dim) / 64.0)
+    index = VectorIndex(path)
+    index.clear()
+    step = 50_000
+    for i in range(0, n, step):
+        m = min(step, n - i)
+        vecs = rng.standard_normal((m, dim)).astype(np.float32) * scale
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        index.append(vecs, [str(i + j) for j in range(m)], [""] * m, embedder="synthetic")
+    return index
+
+
+def make_queries(index: VectorIndex, n: int, noise: float, seed: int = 1) -> np.ndarray:
+    # 取库里的向量加噪声当查询，保证查询分布与语料一致
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(index), size=n)
+    q = np.array(index.vectors[rows], dtype=np.float32)
+    q += rng.standard_normal(q.shape).astype(np.float32) * noise / np.sqrt(index.dim)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def timed(fn, queries):
+    out, lat = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        rows, _ = fn(q)
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        out.append(rows)
+    return out, np.asarray(lat)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index_root", default=DEFAULT_INDEX_ROOT)
+    parser.add_argument("--collection", default="legal_benchmark_v1")
+    parser.add_argument("--synthetic", type=int, default=0, help="build a random index of this many rows instead")
+    parser.add_argument("--dim", type=int, default=1024, help="dim of the synthetic index")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="query noise relative to a unit vector")
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--dims", default="128,256,512", help="prefilter dims to try")
+    parser.add_argument("--candidates", default="50,100,400", help="prefilter candidate counts to try")
+    parser.add_argument("--out", default="", help="also write the results as json")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.synthetic:
+        tmp = tempfile.TemporaryDirectory()
+        index = synthetic_index(tmp.name, args.synthetic, args.dim)
+    else:
+        index = VectorIndex(os.path.join(args.index_root, args.collection))
+        if not len(index):
+            print(f"Error: 索引为空: {index.path}（先运行 scripts/ingest_data.py，或用 --synthetic）")
+            return
+    queries = make_queries(index, args.queries, args.noise)
+    k = args.top_k
+    print(f"index: n={len(index)} dim={index.dim} embedder={index.embedder}; queries={len(queries)} top_k={k}")
+
+    # 预热：mmap 缺页、prefix sidecar 的首次构建不计入延迟
+    index.search(queries[0], k)
+    dims_grid = [int(d) for d in args.dims.split(",") if d]
+    for d in dims_grid:
+        if d < index.dim:
+            index.search(queries[0], k, prefilter_dims=d, candidates=len(index) - 1)
+
+    truth, lat = timed(lambda q: index.search(q, k), queries)
+    results = [{
+        "mode": "exact",
+        "dims": index.dim,
+        "candidates": len(index),
+        "recall_at_k": 1.0,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }]
+    for d in dims_grid:
+        if d >= index.dim:
+            continue
+        for c in [int(c) for c in args.candidates.split(",") if c]:
+            got, lat = timed(lambda q: index.search(q, k, prefilter_dims=d, candidates=c), queries)
+            recall = np.mean([len(set(a.tolist()) & set(b.tolist())) / len(b) for a, b in zip(got, truth)])
+            results.append({
+                "mode": "two_stage",
+                "dims": d,
+                "candidates": c,
+                "recall_at_k": float(recall),
+                "p50_ms": float(np.percentile(lat, 50)),
+                "p99_ms": float(np.percentile(lat, 99)),
+            })
+
+    print(f"{'mode':<10} {'dims':>6} {'cand':>8} {'recall@' + str(k):>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['dims']:>6} {r['candidates']:>8} {r['recall_at_k']:>10.3f} "
+              f"{r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
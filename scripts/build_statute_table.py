@@ -0,0 +1,80 @@
+import sys
+import os
+import json
+import time
+import argparse
+# 添加 src 目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.citations import DEFAULT_STATUTE_PATH, StatuteTable, extract_citations, validate_citations
+from src.dataset_reader import JsonArrayReader
+
+# 从语料建法条表（法律名 -> 语料里出现过的条号），供 src/citations.py 校验回答里的法条引用。
+# 语料来源可以叠加：数据集（问题 + 标准答案）、已 ingest 的向量索引里的文档、以及现成的法条清单 jsonl
+# （每行 {"title": "民法典", "article": 577} 或 {"title": ..., "articles": [...]}）。
+# 建完用同一份语料测一遍抽取 / 校验吞吐（条 / 秒）。
+#
+#   python scripts/build_statute_table.py --dataset data/dataset.json
+#   python scripts/build_statute_table.py --index_root ./green_agent_db --statutes data/statutes.jsonl
+
+
+def iter_texts(args):
+    if args.dataset and os.path.exists(args.dataset):
+        for item in JsonArrayReader(args.dataset, keys=("items", "data")):
+            # （dataset.json 用 question/key，dataset_test.json 用 input/output）
+            yield str(item.get("question") or item.get("input") or "")
+            yield str(item.get("key") or item.get("output") or "")
+    if args.index_root:
+        from src.vector_index import VectorIndex
+        index = VectorIndex(os.path.join(args.index_root, args.collection))
+        for rec in index.iter_records():
+            yield str(rec.get("document") or "")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default="data/dataset.json")
+    parser.add_argument("--index_root", default="", help="also scan the documents of an ingested index")
+    parser.add_argument("--collection", default="legal_benchmark_v1")
+    parser.add_argument("--statutes", default="", help="jsonl of {title, article(s)} to add as-is")
+    parser.add_argument("--out", default=DEFAULT_STATUTE_PATH)
+    parser.add_argument("--no_bench", action="store_true", help="skip the throughput check")
+    args = parser.parse_args()
+
+    texts = [t for t in iter_texts(args) if t]
+    table = StatuteTable.from_texts(texts)
+    if args.statutes:
+        with open(args.statutes, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                rec = json.loads(line)
+                nums = rec.get("articles") or ([rec["article"]] if rec.get("article") is not None else [])
+                table.add(rec["title"], None)
+                for n in nums:
+                    table.add(rec["title"], int(n))
+    if not len(table):
+        print("Error: 语料里没有找到任何《法律名》第X条 引用")
+        return
+    table.save(args.out)
+    print(f"法条表: {table.stats()} -> {args.out}")
+
+    if args.no_bench or not texts:
+        return
+    n_cites = 0
+    t0 = time.perf_counter()
+    for t in texts:
+        n_cites += len(extract_citations(t, table))
+    extract_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for t in texts:
+        validate_citations(t, (), table)
+    validate_s = time.perf_counter() - t0
+    print(f"texts: {len(texts)}, citations: {n_cites}")
+    print(f"extract:  {len(texts) / max(extract_s, 1e-9):,.0f} texts/s")
+    print(f"validate: {len(texts) / max(validate_s, 1e-9):,.0f} texts/s")
+
+
+if __name__ == "__main__":
+    main()
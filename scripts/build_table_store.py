@@ -0,0 +1,48 @@
+import sys
+import os
+import time
+import argparse
+# 添加 src 目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.table_store import DEFAULT_STORE_DIR, TableStore
+from src.tool_backend import DEFAULT_TABLES_DIR, find_table_file, index_specs, iter_table_rows
+
+try:
+    from schema import table_map
+except ImportError:
+    table_map = {}
+
+# 把原始表（<tables_dir>/<Model>.jsonl 或 .json）转成列式存储，并在工具的查询键上建二级索引：
+#
+#   python scripts/build_table_store.py --tables_dir data/tables --store_dir data/table_store
+#   python scripts/build_table_store.py --tables LegalDoc,RestrictionCase
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables_dir", default=DEFAULT_TABLES_DIR)
+    parser.add_argument("--store_dir", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--tables", default="", help="comma-separated table names; default all schema.py tables")
+    args = parser.parse_args()
+
+    names = [t for t in args.tables.split(",") if t] or list(table_map)
+    if not names:
+        print("Error: 没有指定 --tables，且无法导入 schema.py")
+        return
+    store = TableStore(args.store_dir)
+    for name in names:
+        path = find_table_file(args.tables_dir, name)
+        if path is None:
+            print(f"skip {name}: 未找到 {os.path.join(args.tables_dir, name)}.jsonl / .json")
+            continue
+        # schema.py 里的字段顺序就是列顺序；原始数据多出来的字段不入库
+        columns = [e.value for e in table_map[name]] if name in table_map else None
+        t0 = time.perf_counter()
+        table = store.build_table(name, iter_table_rows(path), columns=columns, indexes=index_specs(name))
+        print(f"{name}: {len(table)} rows, {len(table.columns)} columns, "
+              f"indexes={[f for f, _ in index_specs(name)]} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
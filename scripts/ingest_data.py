@@ -1,39 +1,61 @@
 import sys
 import os
-import json
+import argparse
 # 添加 src 目录到路径
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.green_rag_engine import GreenRAGEngine
+from src.dataset_reader import JsonArrayReader
+from src.embedding_cache import DEFAULT_CACHE_PATH, EmbeddingCache
+from src.embeddings import get_embedder
+from src.green_rag_engine import DEFAULT_INDEX_ROOT, GreenRAGEngine
 
 def ingest():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default="./data/dataset.json")
+    parser.add_argument("--collection", default="legal_benchmark_v1")
+    parser.add_argument("--index_root", default=DEFAULT_INDEX_ROOT)
+    parser.add_argument("--embedder", default=None, help="hashing-1024 (offline, default) or voyage-3-large")
+    parser.add_argument("--batch_size", type=int, default=0, help="0 means the embedder's max batch")
+    parser.add_argument("--embed_cache", default=DEFAULT_CACHE_PATH, help="sqlite embedding cache")
+    parser.add_argument("--no_embed_cache", action="store_true", help="always call the embedder")
+    args = parser.parse_args()
+
     # 1. 加载主办方数据集
-    data_path = './data/dataset.json'
+    data_path = args.dataset
     if not os.path.exists(data_path):
-        print("Error: data/dataset.json 未找到。请先放入数据文件。")
+        print(f"Error: {data_path} 未找到。请先放入数据文件。")
         return
 
-    with open(data_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    # 2. 准备数据
+    # 2. 准备数据（流式读取）
     documents = []
     ids = []
     metadatas = []
 
     print("正在处理数据...")
-    for idx, item in enumerate(data):
-        # 假设 dataset.json 有 question 和 key (答案) 字段
+    for idx, item in enumerate(JsonArrayReader(data_path, keys=("items", "data"))):
         # 我们把问题和标准答案作为 Ground Truth 存入
-        content = f"Question: {item.get('question', '')}\nAnswer: {item.get('key', '')}"
+        # （dataset.json 用 question/key，dataset_test.json 用 input/output）
+        question = item.get('question') or item.get('input', '')
+        answer = item.get('key') or item.get('output', '')
+        content = f"Question: {question}\nAnswer: {answer}"
         documents.append(content)
-        ids.append(str(idx))
+        ids.append(str(item.get('id', idx)))
         metadatas.append({"source": "LegalAgentBench", "id": idx})
 
-    # 3. 存入向量库
-    rag = GreenRAGEngine()
-    rag.add_documents(documents, metadatas, ids)
-    print("数据入库完成！Green Agent 已准备就绪。")
+    # 3. 批量 embedding 并写入本地 mmap 索引（重复 ingest 会先清空旧索引）
+    embedder = get_embedder(args.embedder)
+    cache = None
+    if embedder.cacheable and not args.no_embed_cache:
+        cache = EmbeddingCache(args.embed_cache)
+    rag = GreenRAGEngine(collection_name=args.collection, index_root=args.index_root,
+                         embedder=embedder, cache=cache, use_cache=cache is not None)
+    rag.reset()
+    rag.add_documents(documents, metadatas, ids, batch_size=args.batch_size or None)
+    rag.build_lexical_index()  # BM25 倒排索引，和向量索引放在同一目录
+    print(f"数据入库完成！共 {len(rag.index)} 条，索引位于 {rag.index.path}。Green Agent 已准备就绪。")
+    if cache is not None:
+        print(f"embedding 缓存: {cache.stats()}")
+    rag.close()
 
 if __name__ == "__main__":
-    ingest()
\ No newline at end of file
+    ingest()
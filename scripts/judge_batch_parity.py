@@ -0,0 +1,127 @@
+import sys
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+# 添加 src 目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.executor import _judge_inputs
+from src.judge_cache import JudgeCache
+from src.llm_usage import UsageAccumulator, llm_caller, usage_scope
+from src.traffic_light_eval import SIGNALS, TrafficLightAuditor
+
+# 批量打分 vs 逐条打分的一致性对比：同一批数据分别逐条打分、按 K 条一批打分，
+# 报告 signal 一致率、score 平均绝对差、混淆矩阵，以及两种方式的 LLM 调用次数 / token / 耗时。
+# 默认按 run_assessment 的方式从数据项取 query / 回答 / 依据；--responses 给出参评答案时，
+# 以数据集的 output 作为依据给这些答案打分。
+#
+#   python scripts/judge_batch_parity.py --dataset data/dataset_test.json --batch_sizes 4,8
+#   python scripts/judge_batch_parity.py --responses output/purple_answers.jsonl --batch_sizes 4
+
+
+def load_items(args) -> list:
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data = data.get("items", data) if isinstance(data, dict) else data
+    data = data[:args.limit] if args.limit > 0 else data
+    if not args.responses:
+        return data
+    answers = {}
+    with open(args.responses, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rec = json.loads(line)
+                answers[str(rec.get("id"))] = rec.get("answer") or rec.get("agent_response") or ""
+    return [
+        {"query": d.get("input") or d.get("question") or "", "agent_response": answers[str(d.get("id"))],
+         "ground_truth": d.get("output") or ""}
+        for d in data if str(d.get("id")) in answers
+    ]
+
+
+def judge_all(auditor: TrafficLightAuditor, inputs: list, batch_size: int, concurrency: int):
+    usage = UsageAccumulator(keep_latencies=True)
+    batches = [inputs[i:i + batch_size] for i in range(0, len(inputs), batch_size)]
+
+    def one(batch):
+        with usage_scope(usage), llm_caller("auditor"):
+            if batch_size == 1:
+                return [auditor.evaluate_signal(*batch[0])]
+            return auditor.evaluate_batch(batch)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = [r for rs in pool.map(one, batches) for r in rs]
+    return results, usage.summary(), time.perf_counter() - t0
+
+
+def signal_of(audit) -> str:
+    s = str((audit or {}).get("signal") or "RED").upper() if isinstance(audit, dict) else "RED"
+    return s if s in SIGNALS else "YELLOW"
+
+
+def score_of(audit) -> float:
+    try:
+        return float(audit.get("score", 0)) if isinstance(audit, dict) else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default="data/dataset_test.json")
+    parser.add_argument("--responses", default="", help="jsonl of {id, answer} to judge against the dataset output")
+    parser.add_argument("--limit", type=int, default=0, help="0 means all")
+    parser.add_argument("--batch_sizes", default="4,8")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--model", default=os.getenv("JUDGE_MODEL", "glm-4-flash"))
+    parser.add_argument("--judge_cache", default="", help="optional sqlite judge cache (off by default so token counts are real)")
+    parser.add_argument("--out", default="", help="also write the results as json")
+    args = parser.parse_args()
+
+    items = load_items(args)
+    if not items:
+        print("Error: 数据为空")
+        return
+    inputs = [_judge_inputs(item) for item in items]
+    cache = JudgeCache(args.judge_cache) if args.judge_cache else None
+
+    base_auditor = TrafficLightAuditor(model_name=args.model, cache=cache)
+    base, base_usage, base_s = judge_all(base_auditor, inputs, 1, args.concurrency)
+    report = {"items": len(inputs), "unbatched": {"llm_usage": base_usage, "seconds": round(base_s, 3)}, "batched": []}
+    print(f"items: {len(inputs)}")
+    print(f"{'K':>3} {'agree':>7} {'|dscore|':>9} {'calls':>6} {'tokens':>8} {'fallbacks':>9} {'seconds':>8}")
+    print(f"{1:>3} {1.0:>7.3f} {0.0:>9.3f} {base_usage['calls']:>6} {base_usage['total_tokens']:>8} {0:>9} {base_s:>8.1f}")
+
+    for k in [int(x) for x in args.batch_sizes.split(",") if x]:
+        auditor = TrafficLightAuditor(model_name=args.model, cache=cache)
+        got, usage, secs = judge_all(auditor, inputs, k, args.concurrency)
+        agree = sum(signal_of(a) == signal_of(b) for a, b in zip(base, got)) / len(inputs)
+        dscore = sum(abs(score_of(a) - score_of(b)) for a, b in zip(base, got)) / len(inputs)
+        confusion = {s: {t: 0 for t in SIGNALS} for s in SIGNALS}  # unbatched -> batched
+        for a, b in zip(base, got):
+            confusion[signal_of(a)][signal_of(b)] += 1
+        report["batched"].append({
+            "batch_size": k,
+            "signal_agreement": agree,
+            "mean_abs_score_diff": dscore,
+            "confusion": confusion,
+            "batch_stats": auditor.batch_stats,
+            "llm_usage": usage,
+            "seconds": round(secs, 3),
+        })
+        print(f"{k:>3} {agree:>7.3f} {dscore:>9.3f} {usage['calls']:>6} {usage['total_tokens']:>8} "
+              f"{auditor.batch_stats['fallbacks']:>9} {secs:>8.1f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if cache is not None:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import requests
 import os
 import sys
 
@@ -10,14 +9,23 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import argparse
-import json
+import queue
+import threading
 import time
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Set
 
 from tqdm import tqdm
 
 from src.green_rag_engine import GreenRAGEngine
 from src.traffic_light_eval import TrafficLightAuditor
+from src.dataset_reader import JsonArrayReader
+from src.judge_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, JudgeCache
+from src.results_log import ReportAggregator, ResultsLog, write_json_atomic
+from src.participant_client import DEFAULT_RETRIES, BlockingParticipantClient
+from src.llm_usage import UsageAccumulator, llm_caller, summarize_items, usage_scope
+from src.citations import citation_summary, fold_citations, new_citation_stats, validate_citations
+from src.precheck import (DEFAULT_SHADOW_RATE, fold_precheck, new_precheck_stats, precheck, precheck_summary,
+                          shadowed)
 # scripts/run_audit_resume.py
 def _unwrap_raw_audit(obj, max_depth=10):
     depth = 0
@@ -39,40 +47,6 @@ def _sanitize_record(rec: dict) -> dict:
             rec["raw_audit"].pop(k, None)
     return rec
 
-def load_json(path: str) -> Any:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def append_jsonl(path: str, obj: Dict[str, Any]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-
-    # 🔒 FINAL SAFETY NET: flatten raw_audit before writing
-    obj = _sanitize_record(obj)
-
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-
-
-
-def read_done_ids(jsonl_path: str) -> Set[str]:
-    done: Set[str] = set()
-    if not os.path.exists(jsonl_path):
-        return done
-    with open(jsonl_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-                _id = str(obj.get("id", ""))
-                if _id:
-                    done.add(_id)
-            except Exception:
-                continue
-    return done
-
 
 def normalize_item(item: Dict[str, Any], idx: int) -> Dict[str, Any]:
     """
@@ -108,15 +82,168 @@ def normalize_item(item: Dict[str, Any], idx: int) -> Dict[str, Any]:
     }
 
 
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶：每秒补充 rate 个令牌，最多攒 burst 个；rate <= 0 表示不限速。
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst if burst is not None else self.rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# 流水线结束标记：每个 worker 收到一个就退出
+_DONE = object()
+
+
+def start_stage(
+    fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+    inbox: "queue.Queue",
+    outbox: "queue.Queue",
+    out_q: "queue.Queue",
+    workers: int,
+    stop: Optional[threading.Event] = None,
+) -> List[threading.Thread]:
+    """
+    起一个阶段的 worker 池：从 inbox 取任务交给 fn；
+    fn 在任务上写了 "record" 就直接交给 writer（失败 / 最后一个阶段），否则进入下一阶段。
+    队列都有上限，下游慢时上游自然阻塞（backpressure）。stop 置位后只丢弃任务、不再处理。
+    """
+    def loop() -> None:
+        while True:
+            task = inbox.get()
+            if task is _DONE:
+                return
+            if stop is not None and stop.is_set():
+                continue
+            try:
+                task = fn(task)
+            except Exception as e:
+                task["record"] = {
+                    "id": task["id"],
+                    "error": f"{type(e).__name__}: {e}",
+                    "fact": task["fact"],
+                    "answer": task.get("answer", ""),
+                }
+            (out_q if "record" in task else outbox).put(task)
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(max(1, workers))]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def start_batch_stage(
+    fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+    inbox: "queue.Queue",
+    out_q: "queue.Queue",
+    workers: int,
+    batch_size: int,
+    stop: Optional[threading.Event] = None,
+) -> List[threading.Thread]:
+    """
+    最后一个阶段的批量版本：每个 worker 阻塞取一条，再把 inbox 里已经在等的（最多凑满 batch_size 条）一起交给 fn，
+    不为凑批等待；fn 给每个任务写上 "record"。stop 置位后只丢弃任务、不再处理。
+    """
+    def loop() -> None:
+        stop = False
+        while not stop:
+            task = inbox.get()
+            if task is _DONE:
+                return
+            batch = [task]
+            while len(batch) < batch_size:
+                try:
+                    nxt = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _DONE:
+                    stop = True
+                    break
+                batch.append(nxt)
+            if stop is not None and stop.is_set():
+                continue
+            try:
+                batch = fn(batch)
+            except Exception as e:
+                for t in batch:
+                    t["record"] = {
+                        "id": t["id"],
+                        "error": f"{type(e).__name__}: {e}",
+                        "fact": t["fact"],
+                        "answer": t.get("answer", ""),
+                    }
+            for t in batch:
+                out_q.put(t)
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(max(1, workers))]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def close_stage(threads: List[threading.Thread], inbox: "queue.Queue") -> None:
+    # 上游已经全部入队：每个 worker 一个结束标记，等它们处理完手上的任务
+    for _ in threads:
+        inbox.put(_DONE)
+    for t in threads:
+        t.join()
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--dataset", default="data/dataset.json")
     parser.add_argument("--out_jsonl", default="output/audit_results.jsonl")
     parser.add_argument("--report", default="output/final_audit_report.json")
+    parser.add_argument("--report_every", type=int, default=200, help="refresh the report every N records")
     parser.add_argument("--limit", type=int, default=0, help="0 means all")
     parser.add_argument("--start", type=int, default=0, help="start index in dataset")
-    parser.add_argument("--sleep", type=float, default=0.0, help="sleep seconds per item")
+    parser.add_argument("--sleep", type=float, default=0.0,
+                        help="deprecated: seconds between Purple Agent calls, same as --purple_rps 1/sleep")
     parser.add_argument("--retries", type=int, default=2, help="retries per item on API error")
+    parser.add_argument("--judge_cache", default=DEFAULT_CACHE_PATH, help="sqlite judge-response cache")
+    parser.add_argument("--judge_cache_max_entries", type=int, default=DEFAULT_MAX_ENTRIES)
+    parser.add_argument("--no_judge_cache", action="store_true", help="always call the judge LLM")
+    # 流水线：每个阶段自己的线程池 + 令牌桶限速，阶段之间是有界队列
+    parser.add_argument("--purple_concurrency", "--purple-concurrency", type=int, default=4)
+    parser.add_argument("--purple_rps", "--purple-rps", type=float, default=0.0, help="0 means unlimited")
+    parser.add_argument("--purple_protocol", default="json", choices=["json", "a2a"],
+                        help='json: POST {"query": ...}; a2a: JSON-RPC message/send')
+    parser.add_argument("--purple_timeout", type=float, default=60.0)
+    parser.add_argument("--purple_retries", type=int, default=DEFAULT_RETRIES,
+                        help="retries on 5xx / timeouts, with jittered exponential backoff")
+    parser.add_argument("--retrieve_concurrency", "--retrieve-concurrency", type=int, default=2)
+    parser.add_argument("--judge_concurrency", "--judge-concurrency", type=int, default=4)
+    parser.add_argument("--judge_rps", "--judge-rps", type=float, default=0.0, help="0 means unlimited")
+    parser.add_argument("--judge_batch_size", "--judge-batch-size", type=int,
+                        default=int(os.getenv("JUDGE_BATCH_SIZE", "1")),
+                        help="items judged per LLM prompt; 1 means one call per item")
+    parser.add_argument("--no_precheck", "--no-precheck", action="store_true",
+                        default=os.getenv("JUDGE_PRECHECK", "1") == "0",
+                        help="send every item to the LLM judge instead of deciding clear-cut ones by rule")
+    parser.add_argument("--precheck_shadow_rate", "--precheck-shadow-rate", type=float, default=DEFAULT_SHADOW_RATE,
+                        help="share of rule-decided items also judged by the LLM to measure agreement")
+    parser.add_argument("--queue_size", "--queue-size", type=int, default=0,
+                        help="max items waiting between stages; 0 means 2x the largest pool")
     args = parser.parse_args()
 
     # 1. 【新增】从环境变量获取 Purple Agent 的地址
@@ -126,29 +253,38 @@ def main():
     if not purple_url:
         print("Warning: PURPLE_AGENT_URL not set. Make sure to set it via -e or assume local.")
 
-    dataset = load_json(args.dataset)
-    
-
-    # dataset 可能是 dict 包一层，也可能直接是 list
-    if isinstance(dataset, dict):
-        # 常见 key：data / items / samples
-        for k in ["data", "items", "samples", "dataset"]:
-            if k in dataset and isinstance(dataset[k], list):
-                dataset = dataset[k]
-                break
-
-    if not isinstance(dataset, list):
-        raise RuntimeError(f"dataset format unexpected: {type(dataset)}")
+    # dataset 可能是 dict 包一层（常见 key：data / items / samples），也可能直接是 list；
+    # 流式读取 + 偏移索引：--start / --limit 不需要解析前面的数据
+    try:
+        dataset = JsonArrayReader(args.dataset, keys=("data", "items", "samples", "dataset"))
+        total_n = len(dataset)
+    except ValueError as e:
+        raise RuntimeError(f"dataset format unexpected: {e}")
 
-    total_n = len(dataset)
     start = max(0, args.start)
     end = total_n if args.limit <= 0 else min(total_n, start + args.limit)
 
-    done_ids = read_done_ids(args.out_jsonl)
+    # 结果文件旁的 .idx 索引：mmap 打开即可判断哪些 id 已经审过，不再逐行解析整个 out_jsonl
+    results = ResultsLog(args.out_jsonl)
+    # 跨续跑的累计统计：从 checkpoint 恢复，checkpoint 过期时从上面的索引重建
+    agg = ReportAggregator(results)
+    queued: Set[str] = set()  # 本次运行已入队的 id
 
     rag = GreenRAGEngine()
-    auditor = TrafficLightAuditor()  # 会优先读取环境变量 JUDGE_MODEL
+    judge_cache = None if args.no_judge_cache else JudgeCache(args.judge_cache, args.judge_cache_max_entries)
+    auditor = TrafficLightAuditor(cache=judge_cache)  # 会优先读取环境变量 JUDGE_MODEL
+
+    purple_rps = args.purple_rps or ((1.0 / args.sleep) if args.sleep > 0 else 0.0)
+    purple_bucket = TokenBucket(purple_rps)
+    judge_bucket = TokenBucket(args.judge_rps)
+
+    # 本次运行所有 judge 调用的 token / 耗时；每条记录另有自己的 llm_usage
+    llm_usage = UsageAccumulator(keep_latencies=True)
+    item_usage: List[Dict[str, Any]] = []  # 本次运行每条记录的用量摘要（只留汇总需要的字段）
+    precheck_stats = new_precheck_stats()  # 本次运行规则预判的覆盖率 / 与 LLM 的一致率
+    citation_stats = new_citation_stats()  # 本次运行回答里法条引用的命中 / 未命中
 
+    # 本次运行的计数；报告顶层是整个 out_jsonl 的累计值（agg）
     stats = {
         "total": 0,
         "skipped_done": 0,
@@ -158,107 +294,186 @@ def main():
         "errors": 0,
         "avg_score_sum": 0.0,
         "avg_score_count": 0,
+    }
+    meta = {
         "model": os.getenv("JUDGE_MODEL", ""),
         "dataset": args.dataset,
         "out_jsonl": args.out_jsonl,
         "start": start,
         "end": end,
+        "pipeline": {
+            "purple_concurrency": args.purple_concurrency,
+            "purple_rps": purple_rps,
+            "retrieve_concurrency": args.retrieve_concurrency,
+            "judge_concurrency": args.judge_concurrency,
+            "judge_rps": args.judge_rps,
+            "judge_batch_size": args.judge_batch_size,
+            "precheck": not args.no_precheck,
+            "precheck_shadow_rate": args.precheck_shadow_rate,
+        },
     }
 
-    pbar = tqdm(range(start, end), total=(end - start))
-    for idx in pbar:
-        item = dataset[idx]
-        if not isinstance(item, dict):
-            item = {"value": item}
-
-        norm = normalize_item(item, idx)
-        _id = norm["id"]
-
-        if _id in done_ids:
-            stats["skipped_done"] += 1
-            continue
-
-        fact = str(norm["fact"])
-        # answer = str(norm["answer"])
-        # 新代码（实时调用 Purple Agent）：
-        answer = ""
+    def write_report() -> None:
+        # 先落 checkpoint 再写报告，两者都是 temp + rename，崩溃时不会留下半个文件
+        agg.checkpoint()
+        report = agg.summary()
+        report["skipped_done"] = stats["skipped_done"]
+        report.update(meta)
+        this_run = dict(stats)
+        this_run["avg_score"] = (stats["avg_score_sum"] / stats["avg_score_count"]) if stats["avg_score_count"] else 0.0
+        report["this_run"] = this_run
+        report["judge_cache"] = judge_cache.stats() if judge_cache else {"enabled": False}
+        report["embed_cache"] = rag.cache.stats() if rag.cache else {"enabled": False}
+        report["purple_latency"] = purple.stats() if purple else {"enabled": False}
+        report["llm_usage"] = llm_usage.summary()
+        report["llm_usage"]["per_item"] = summarize_items(item_usage)
+        report["judge_batch"] = {"batch_size": args.judge_batch_size, **auditor.batch_stats}
+        report["precheck"] = precheck_summary(precheck_stats)
+        report["citations"] = citation_summary(citation_stats)
+        write_json_atomic(args.report, report)
+
+    # -----------------------------
+    # stage 1: Purple Agent
+    # -----------------------------
+    # 所有 worker 共用一个 keep-alive 连接池（httpx，可用时 HTTP/2）；按 host 限并发，5xx / 超时自动重试
+    purple = None
+    if purple_url:
+        purple = BlockingParticipantClient(
+            {"purple": purple_url},
+            protocol=args.purple_protocol,
+            timeout=args.purple_timeout,
+            max_per_host=args.purple_concurrency,
+            retries=args.purple_retries,
+        )
+
+    def fetch_answer(task: Dict[str, Any]) -> Dict[str, Any]:
         fetch_error = None
-        
+        answer = ""
         # 只有在设置了 URL 时才去请求，否则 fallback 到文件里的答案（方便本地调试）
-        if purple_url:
+        if purple is not None:
+            purple_bucket.acquire()
             try:
-                # 构造请求体：这取决于你的 Purple Agent 期望什么格式
-                # 常见格式 1: {"query": "问题..."}
-                # 常见格式 2: {"messages": [{"role": "user", "content": "问题..."}]}
-                payload = {"query": fact} 
-                
-                # 发送 POST 请求
-                resp = requests.post(purple_url, json=payload, timeout=60)
-                resp.raise_for_status()
-                
-                # 解析返回结果：同样取决于 Purple Agent 返回什么格式
-                resp_json = resp.json()
-                answer = resp_json.get("answer") or resp_json.get("response") or resp_json.get("output") or str(resp_json)
-                
+                # 请求体由 --purple_protocol 决定：
+                # json: {"query": "问题..."}，从 answer / response / output 取答案
+                # a2a:  JSON-RPC message/send，从返回的 Message / Task 里取文本
+                answer = purple.ask("purple", task["fact"])
             except Exception as e:
                 fetch_error = f"PurpleAgentCallError: {str(e)}"
-                print(f"\n[Error] Failed to call Purple Agent for id={_id}: {e}")
+                tqdm.write(f"[Error] Failed to call Purple Agent for id={task['id']}: {e}")
         else:
             # 如果没配 URL，兼容旧模式，读文件里的答案
-            answer = str(norm["answer"])
+            answer = str(task["file_answer"])
 
         # 如果请求失败或没拿到答案，记录错误并跳过后续打分
         if fetch_error or not answer:
-            stats["errors"] += 1
-            append_jsonl(args.out_jsonl, {
-                "id": _id,
+            task["record"] = {
+                "id": task["id"],
                 "error": fetch_error or "Empty answer from Purple Agent",
-                "fact": fact,
-                "answer": ""
-            })
-            continue
-
+                "fact": task["fact"],
+                "answer": "",
+            }
+        task["answer"] = answer
+        return task
+
+    # -----------------------------
+    # stage 2: ground truth retrieval
+    # -----------------------------
+    def retrieve(task: Dict[str, Any]) -> Dict[str, Any]:
         # 你的原脚本里是 rag.retrieve_ground_truth(original_fact)
-        verified_context = rag.retrieve_ground_truth(fact)
-
+        task["verified_context"] = rag.retrieve_ground_truth(task["fact"])
+        return task
+
+    # -----------------------------
+    # stage 3: judge
+    # -----------------------------
+    def precheck_task(task: Dict[str, Any]):
+        # 规则能直接定的条目不调 LLM；按 --precheck_shadow_rate 抽样的仍然调，用来统计一致率。
+        # 只有答案来自 Purple Agent 时，文件里的答案才能当参考答案
+        if args.no_precheck:
+            return None, False
+        reference = str(task["file_answer"] or "") if purple is not None else None
+        pre = precheck(task["answer"], task["verified_context"], reference)
+        if pre is None:
+            return None, False
+        return pre, shadowed(task["id"], args.precheck_shadow_rate)
+
+    def judge(task: Dict[str, Any]) -> Dict[str, Any]:
+        fact, answer, verified_context = task["fact"], task["answer"], task["verified_context"]
         last_err: Optional[str] = None
         audit: Optional[Dict[str, Any]] = None
+        usage = UsageAccumulator(parent=llm_usage)
+        pre, shadow = precheck_task(task)
+        if pre is not None and not shadow:
+            task["record"] = judge_record(task, pre, None, usage.summary())
+            return task
+
+        for attempt in range(args.retries + 1):
+            judge_bucket.acquire()
+            try:
+                with usage_scope(usage), llm_caller("auditor"):
+                    audit = auditor.evaluate_signal(fact, answer, verified_context)
+                last_err = None
+                break
+            except Exception as e:
+                last_err = f"{type(e).__name__}: {e}"
+                time.sleep(1.5 * (attempt + 1))
+
+        if pre is not None:
+            # shadow 调用失败不影响规则的结论
+            task["record"] = judge_record(task, pre, None, usage.summary(), shadow_audit=audit)
+        else:
+            task["record"] = judge_record(task, audit, last_err, usage.summary())
+        return task
+
+    def judge_batch(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # 一次 LLM 调用给整批打分；批内缺失 / 格式不对的条目由 evaluate_batch 自己退回逐条打分
+        prechecks = [precheck_task(t) for t in tasks]
+        for t, (pre, shadow) in zip(tasks, prechecks):
+            if pre is not None and not shadow:
+                t["record"] = judge_record(t, pre, None, UsageAccumulator().summary())
+        pending = [(t, pre) for t, (pre, shadow) in zip(tasks, prechecks) if pre is None or shadow]
+        if not pending:
+            return tasks
+        if len(pending) == 1:
+            judge(pending[0][0])
+            return tasks
+        last_err: Optional[str] = None
+        audits: Optional[List[Dict[str, Any]]] = None
+        usage = UsageAccumulator(parent=llm_usage)
+        items = [(t["fact"], t["answer"], t["verified_context"]) for t, _ in pending]
 
         for attempt in range(args.retries + 1):
+            judge_bucket.acquire()
             try:
-                audit = auditor.evaluate_signal(fact, verified_context, answer)
+                with usage_scope(usage), llm_caller("auditor"):
+                    audits = auditor.evaluate_batch(items)
                 last_err = None
                 break
             except Exception as e:
                 last_err = f"{type(e).__name__}: {e}"
                 time.sleep(1.5 * (attempt + 1))
 
+        summary = usage.summary()
+        summary["shared_by"] = len(pending)
+        for i, (task, pre) in enumerate(pending):
+            audit = audits[i] if audits else None
+            if pre is not None:
+                task["record"] = judge_record(task, pre, None, summary, shadow_audit=audit)
+            else:
+                task["record"] = judge_record(task, audit, last_err, summary)
+        return tasks
+
+    def judge_record(task: Dict[str, Any], audit: Optional[Dict[str, Any]], last_err: Optional[str],
+                     usage_summary: Dict[str, Any], shadow_audit: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        fact, answer, verified_context = task["fact"], task["answer"], task["verified_context"]
         if audit is None:
-            stats["errors"] += 1
-            append_jsonl(args.out_jsonl, {
-                "id": _id,
-                "error": last_err,
-                "fact": fact,
-                "answer": answer,
-            })
-            continue
+            return {"id": task["id"], "error": last_err, "fact": fact, "answer": answer,
+                    "llm_usage": usage_summary}
 
         signal = str(audit.get("signal") or audit.get("verdict") or "YELLOW").upper()
         score = float(audit.get("score", 0.5))
-
-        stats["total"] += 1
-        stats["avg_score_sum"] += score
-        stats["avg_score_count"] += 1
-
-        if signal == "GREEN":
-            stats["green"] += 1
-        elif signal == "RED":
-            stats["red"] += 1
-        else:
-            stats["yellow"] += 1
-
-        append_jsonl(args.out_jsonl, {
-            "id": _id,
+        rec = {
+            "id": task["id"],
             "signal": signal,
             "score": score,
             "reason": audit.get("reason", ""),
@@ -266,37 +481,135 @@ def main():
             "fact": fact,
             "answer": answer,
             "verified_context": verified_context,
+            "llm_usage": usage_summary,
+            "decided_by": audit.get("decided_by") or "llm",
+            "citations": validate_citations(answer, verified_context),
+        }
+        if shadow_audit is not None:
+            rec["shadow_audit"] = shadow_audit
+        return rec
+
+    # -----------------------------
+    # writer: 唯一写 out_jsonl（及其 .idx 索引）的线程，append-only + 断点续跑语义不变
+    # -----------------------------
+    pbar = tqdm(total=(end - start))
+
+    # writer 出错时置位：reader 停止入队，各阶段丢弃手上的任务，writer 只排空队列让 worker 能退出，主线程 join 之后抛出
+    failed = threading.Event()
+    writer_errors: List[BaseException] = []
+
+    def write_record(task: Dict[str, Any]) -> None:
+        # 🔒 FINAL SAFETY NET: flatten raw_audit before writing
+        rec = _sanitize_record(task["record"])
+        prev = results.entry(rec["id"])
+        results.append(rec)
+        agg.fold(rec, prev)
+        if rec.get("llm_usage"):
+            u = rec["llm_usage"]
+            item_usage.append({k: u[k] for k in ("calls", "total_tokens", "latency_ms", "shared_by") if k in u})
+        pbar.update(1)
+        written = stats["total"] + stats["errors"] + 1
+
+        if "error" in rec:
+            stats["errors"] += 1
+        else:
+            shadow = rec.get("shadow_audit")
+            llm_signal = str(shadow.get("signal") or "").upper() if isinstance(shadow, dict) else None
+            fold_precheck(precheck_stats, rec.get("decided_by"), llm_signal, rec["signal"])
+            fold_citations(citation_stats, rec.get("citations"))
+            stats["total"] += 1
+            stats["avg_score_sum"] += rec["score"]
+            stats["avg_score_count"] += 1
+            if rec["signal"] == "GREEN":
+                stats["green"] += 1
+            elif rec["signal"] == "RED":
+                stats["red"] += 1
+            else:
+                stats["yellow"] += 1
+
+        # 进度条显示（累计值）
+        cum = agg.summary()
+        pbar.set_postfix({
+            "G": cum["green"],
+            "Y": cum["yellow"],
+            "R": cum["red"],
+            "err": cum["errors"],
+            "avg": f"{cum['avg_score']:.3f}",
         })
 
-        done_ids.add(_id)
+        # 定期刷新报告（防崩）；增量汇总，刷新代价与结果文件大小无关
+        if args.report_every > 0 and written % args.report_every == 0:
+            write_report()
 
-        # 进度条显示
-        avg = (stats["avg_score_sum"] / stats["avg_score_count"]) if stats["avg_score_count"] else 0.0
-        pbar.set_postfix({
-            "G": stats["green"],
-            "Y": stats["yellow"],
-            "R": stats["red"],
-            "err": stats["errors"],
-            "avg": f"{avg:.3f}",
-        })
+    def writer(out_q: "queue.Queue") -> None:
+        while True:
+            task = out_q.get()
+            if task is _DONE:
+                return
+            if failed.is_set():
+                continue
+            try:
+                write_record(task)
+            except Exception as e:
+                writer_errors.append(e)
+                failed.set()
+                tqdm.write(f"[Error] writer failed on id={task.get('record', {}).get('id')}: {type(e).__name__}: {e}")
+
+    qsize = args.queue_size or 2 * max(args.purple_concurrency, args.retrieve_concurrency, args.judge_concurrency)
+    purple_q: "queue.Queue" = queue.Queue(maxsize=qsize)
+    retrieve_q: "queue.Queue" = queue.Queue(maxsize=qsize)
+    judge_q: "queue.Queue" = queue.Queue(maxsize=qsize)
+    out_q: "queue.Queue" = queue.Queue(maxsize=qsize)
+
+    writer_thread = threading.Thread(target=writer, args=(out_q,), daemon=True)
+    writer_thread.start()
+    purple_workers = start_stage(fetch_answer, purple_q, retrieve_q, out_q, args.purple_concurrency, failed)
+    retrieve_workers = start_stage(retrieve, retrieve_q, judge_q, out_q, args.retrieve_concurrency, failed)
+    if args.judge_batch_size > 1:
+        judge_workers = start_batch_stage(judge_batch, judge_q, out_q, args.judge_concurrency, args.judge_batch_size,
+                                          failed)
+    else:
+        judge_workers = start_stage(judge, judge_q, out_q, out_q, args.judge_concurrency, failed)
+
+    # reader：主线程按顺序入队，队列满时阻塞
+    for idx, item in zip(range(start, end), dataset.iter_range(start, end)):
+        if failed.is_set():
+            break
+        if not isinstance(item, dict):
+            item = {"value": item}
 
-        if args.sleep > 0:
-            time.sleep(args.sleep)
+        norm = normalize_item(item, idx)
+        if norm["id"] in queued or results.is_done(norm["id"]):
+            stats["skipped_done"] += 1
+            pbar.update(1)
+            continue
+        queued.add(norm["id"])  # 同一 id 在本次运行里只入队一次
+
+        purple_q.put({
+            "idx": idx,
+            "id": norm["id"],
+            "fact": str(norm["fact"]),
+            "file_answer": norm["answer"],
+        })
 
-        # 每 200 条顺手更新一次报告（防崩）
-        if stats["total"] % 200 == 0:
-            avg = (stats["avg_score_sum"] / stats["avg_score_count"]) if stats["avg_score_count"] else 0.0
-            report = dict(stats)
-            report["avg_score"] = avg
-            with open(args.report, "w", encoding="utf-8") as f:
-                json.dump(report, f, ensure_ascii=False, indent=2)
+    close_stage(purple_workers, purple_q)
+    close_stage(retrieve_workers, retrieve_q)
+    close_stage(judge_workers, judge_q)
+    out_q.put(_DONE)
+    writer_thread.join()
+    pbar.close()
+    if writer_errors:
+        # 已写入的结果都在 out_jsonl 里，修好问题后重跑即可续上
+        raise RuntimeError(f"result writer failed; {args.out_jsonl} is incomplete") from writer_errors[0]
 
     # 最终报告
-    avg = (stats["avg_score_sum"] / stats["avg_score_count"]) if stats["avg_score_count"] else 0.0
-    report = dict(stats)
-    report["avg_score"] = avg
-    with open(args.report, "w", encoding="utf-8") as f:
-        json.dump(report, f, ensure_ascii=False, indent=2)
+    write_report()
+    results.close()
+    if judge_cache is not None:
+        judge_cache.close()
+    rag.close()
+    if purple is not None:
+        purple.close()
 
     print(f"\nDone. Results appended to: {args.out_jsonl}")
     print(f"Report written to: {args.report}")
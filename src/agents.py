@@ -1,15 +1,52 @@
+import ast
 import re
 from enum import Enum
 
-from langchain.prompts import PromptTemplate
+try:
+    from langchain_core.prompts import PromptTemplate
+except ImportError:
+    from langchain.prompts import PromptTemplate
 from prompts import *
 from fewshots import *
+import os
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
 from src.utils import *
 
 base_url = "https://comm.chatglm.cn/law_api"
+headers = {
+    "Content-Type": "application/json",
+    "Authorization": f"Bearer {os.getenv('LAW_API_TOKEN', '')}",
+}
 from src.generated_tools import *
+import contextvars
+import functools
+from src.tool_backend import BAD_COLUMNS, BAD_INPUT, NO_DATA, get_local_backend
+from src.tool_cache import DEFAULT_CACHE_PATH as TOOL_CACHE_PATH, ToolCache, ToolResultStore, new_question_stats, question_scope
+from src.llm_usage import UsageAccumulator, llm_caller, usage_scope
+from src.json_scan import fenced_blocks, find_json
+
+# local: 优先用进程内工具后端（本地表格 + 哈希索引，见 src/tool_backend.py），本地没有的表 / 检索工具再走远程；
+# remote: 全部请求 law_api
+TOOL_BACKEND = os.getenv("TOOL_BACKEND", "local")
+
+# 一次"行动"里最多并发执行的工具调用数（json 列表形式的批量行动）
+MAX_TOOL_BATCH = int(os.getenv("MAX_TOOL_BATCH", "8"))
+_TOOL_POOL = ThreadPoolExecutor(max_workers=MAX_TOOL_BATCH, thread_name_prefix="tool")
+
+INVALID_ACTION_HINT = """行动格式非法, 行动必须按照以下json格式输出, 可以被Python json.loads函数解析: ```json{"action": $TOOL_NAME,"action_input": $INPUT}```, 若要同时调用多个互不依赖的工具, 可以输出由这样的对象组成的json列表, 请你反思并尝试纠正."""
+TOOL_ERROR_HINT = '原因可能是: 一, 调用的工具不合适, 尝试使用其他工具; 二, 调用工具时传入的参数可能存在非法值, 例如identifier的值非法(与工具的输入要求不符), 或者columns列表中包含了要查询的表格中未出现的字段.请你反思并尝试纠正.'
+BAD_COLUMNS_HINT = '原因可能是: 调用工具时传入的columns列表中包含了要查询的表格中未出现的字段.请你反思并尝试纠正.'
+
+# 工具结果记忆化(src/tool_cache.py): TOOL_CACHE=0 关闭; TOOL_CACHE_PERSIST=1 时额外落盘到 TOOL_CACHE_PATH, 跨次运行复用
+# 远程调用失败返回的 BAD_INPUT 可能是网络问题, 不缓存
+TOOL_CACHE = None
+if os.getenv("TOOL_CACHE", "1") != "0":
+    TOOL_CACHE = ToolCache(
+        store=ToolResultStore(TOOL_CACHE_PATH) if os.getenv("TOOL_CACHE_PERSIST", "0") == "1" else None,
+        cacheable=lambda result: result != BAD_INPUT,
+    )
 
 def format_input(name, input):
     """
@@ -29,12 +66,20 @@ def format_input(name, input):
     elif name == "get_rank":
         if isinstance(input, list):
             return {"identifier": input, "is_desc": 'False'}
-    else:
-        return input
+    return input
 
 def post_request(name, input):
     print("调用工具中...", name, input)
-    input = format_input(input)
+    input = format_input(name, input)
+    if TOOL_CACHE is not None:
+        return TOOL_CACHE.call(name, input, _dispatch_tool)
+    return _dispatch_tool(name, input)
+
+def _dispatch_tool(name, input):
+    if TOOL_BACKEND == "local":
+        backend = get_local_backend()
+        if backend.supports(name):
+            return backend.call(name, input)
 
     response = requests.post(f"{base_url}/{name}", headers=headers, json=input)
     if response.status_code == 200:
@@ -45,6 +90,131 @@ def post_request(name, input):
         print(response.status_code, response.text)
         return "工具调用发生错误, 请检查传入工具的参数是否正确!"
 
+def call_tool(name, input) -> str:
+    """
+    调用一个工具, 返回写进 scratchpad 的观察文本(结果 + 纠错提示)
+    """
+    try:
+        result = post_request(name, input)
+    except Exception as e:
+        return TOOL_ERROR_HINT
+    text = str(result)
+    if result == NO_DATA:
+        text += TOOL_ERROR_HINT
+    elif result == BAD_COLUMNS:
+        text += BAD_COLUMNS_HINT
+    return text
+
+def run_actions(actions) -> str:
+    """
+    执行一次行动里的全部工具调用: 单个调用的观察文本与原来一致;
+    多个调用并发执行, 观察结果按行动列表的顺序编号拼接, 与完成先后无关
+    """
+    if len(actions) == 1:
+        return call_tool(*actions[0])
+    calls = actions[:MAX_TOOL_BATCH]
+    local = get_local_backend() if TOOL_BACKEND == "local" else None
+    if local is not None and all(local.supports(name) for name, _ in calls):
+        # 本地后端一次调用是微秒级, 直接顺序执行比线程切换更快
+        observations = [call_tool(name, input) for name, input in calls]
+    else:
+        # 每个调用带上当前 context 的拷贝, 工具缓存的命中仍记在当前题目上
+        futures = [_TOOL_POOL.submit(contextvars.copy_context().run, call_tool, name, input) for name, input in calls]
+        observations = [f.result() for f in futures]
+    parts = [f"[{i}] {name}: {obs}" for i, ((name, _), obs) in enumerate(zip(calls, observations), 1)]
+    if len(actions) > len(calls):
+        parts.append(f"(一次行动最多执行{MAX_TOOL_BATCH}个工具调用, 其余{len(actions) - len(calls)}个未执行, 请在下一步继续调用)")
+    return ' '.join(parts)
+
+# -----------------------------
+# incremental prompts
+# -----------------------------
+_SLOT = re.compile(r"\x00(\d+)\x00")
+
+class CompiledPrompt:
+    """
+    A PromptTemplate rendered once with its per-question constants (examples,
+    tools, tables); only the dynamic slots (question, plan, scratchpad) are
+    filled per step. `prefix` is the literal text before the first slot: it
+    is identical across steps, so it is sent as its own message for provider
+    prefix caching.
+    """
+    def __init__(self, template: str, input_variables, static):
+        dynamic = [v for v in input_variables if v not in static]
+        marks = {v: f"\x00{i}\x00" for i, v in enumerate(dynamic)}
+        parts = _SLOT.split(template.format(**static, **marks))
+        self.prefix = parts[0]
+        self._literals = parts[2::2]
+        self._slots = [dynamic[int(i)] for i in parts[1::2]]
+
+    def render(self, **values):
+        """(prefix, body); prefix + body is exactly template.format(**static, **values)."""
+        body = []
+        for slot, literal in zip(self._slots, self._literals):
+            body.append(str(values[slot]))
+            body.append(literal)
+        return self.prefix, ''.join(body)
+
+@functools.lru_cache(maxsize=64)
+def _compile_prompt(template: str, input_variables, static_items) -> CompiledPrompt:
+    return CompiledPrompt(template, input_variables, dict(static_items))
+
+def compile_prompt(prompt: PromptTemplate, **static) -> CompiledPrompt:
+    # 同一组表格 / 工具在不同题目之间复用同一个编译结果；
+    # 按 str(值) 做缓存 key（tools 等是 list，不可哈希），渲染结果与直接 format 相同
+    static = {k: str(v) for k, v in static.items()}
+    return _compile_prompt(prompt.template, tuple(prompt.input_variables), tuple(sorted(static.items())))
+
+def ask_llm(parts, model_name, caller="agent_step") -> str:
+    # caller: 计量时的调用方, 规划 / 重新规划记为 planner, 其余每一步记为 agent_step
+    prefix, body = parts
+    with llm_caller(caller):
+        return LLM(body, model_name, prefix=prefix)
+
+class Scratchpad:
+    """
+    Append-only scratchpad kept as segments. `+=` is O(len(new text)); the
+    joined string is extended incrementally when the prompt is rendered.
+    """
+    def __init__(self, text: str = ''):
+        self._segments = [text] if text else []
+        self._text = text
+        self._joined = len(self._segments)
+
+    def __iadd__(self, text):
+        self._segments.append(str(text))
+        return self
+
+    def __str__(self) -> str:
+        if self._joined < len(self._segments):
+            self._text += ''.join(self._segments[self._joined:])
+            self._joined = len(self._segments)
+        return self._text
+
+    def __len__(self) -> int:
+        return len(str(self))
+
+    def last_line(self) -> str:
+        tail = []
+        for seg in reversed(self._segments):
+            cut = seg.rfind('\n')
+            if cut != -1:
+                tail.append(seg[cut + 1:])
+                break
+            tail.append(seg)
+        return ''.join(reversed(tail))
+
+    def drop_last_line(self) -> None:
+        text = str(self)
+        cut = text.rfind('\n')
+        self.__init__(text[:cut] if cut != -1 else '')
+
+def describe_actions(actions):
+    # 打印用: 单个调用保持 (action, input), 批量时给出列表
+    if len(actions) == 1:
+        return f"{actions[0][0]}: {actions[0][1]}"
+    return "; ".join(f"[{i}] {name}: {input}" for i, (name, input) in enumerate(actions, 1))
+
 class ReactAgent:
     def __init__(self,
                  model_name: str,
@@ -72,8 +242,9 @@ class ReactAgent:
         if reset:
             self.__reset_agent()
         
-        while not self.is_halted() and not self.is_finished():     # 没有达到最大步数, 没有完成
-            self.step()
+        with question_scope(self.tool_cache_stats), usage_scope(self.llm_usage):   # 工具缓存命中 / LLM 用量按题统计
+            while not self.is_halted() and not self.is_finished():     # 没有达到最大步数, 没有完成
+                self.step()
     
     def step(self) -> None:                                        # react的每一步
         # Think
@@ -87,9 +258,10 @@ class ReactAgent:
         action = self.prompt_agent()
         print_colored(f"行动 {self.step_n}: {action}", color='blue')
         self.scratchpad += ' ' + action
-        action_type, action_input = parse_action(action)
+        actions = parse_actions(action)
+        action_type, action_input = actions[0]
 
-        print_colored(f"行动在这里: {action_type}: {action_input}", color="green")
+        print_colored(f"行动在这里: {describe_actions(actions)}", color="green")
 
 
         print("等待行动结果....")
@@ -99,40 +271,32 @@ class ReactAgent:
         # 根据行为分类
 
         if action_type == 'Final Answer':
-            self.scratchpad = '\n'.join(self.scratchpad.split('\n')[:-1]) # 去掉最后拖尾的 观察
+            self.scratchpad.drop_last_line() # 去掉最后拖尾的 观察
             self.answer = action_input
             self.finished = True
             self.step_n += 1
             return
         elif action_type == "":
-            self.scratchpad += f"""行动格式非法, 行动一次只能调用一次工具, 行动必须按照以下json格式输出, 可以被Python json.loads函数解析: ```json{{"action": $TOOL_NAME,"action_input": $INPUT}}```, 请你反思并尝试纠正."""
+            self.scratchpad += INVALID_ACTION_HINT
         else:
-            try:
-                result = post_request(action_type, action_input)
-                self.scratchpad += str(result)
+            self.scratchpad += run_actions(actions)
 
-                if result == "No data found for the specified identifier.":
-                    self.scratchpad += '原因可能是: 一, 调用的工具不合适, 尝试使用其他工具; 二, 调用工具时传入的参数可能存在非法值, 例如identifier的值非法(与工具的输入要求不符), 或者columns列表中包含了要查询的表格中未出现的字段.请你反思并尝试纠正.'
-                elif result == "One or more specified columns do not exist.":
-                    self.scratchpad += '原因可能是: 调用工具时传入的columns列表中包含了要查询的表格中未出现的字段.请你反思并尝试纠正.'
-
-            except Exception as e:
-                self.scratchpad += '原因可能是: 一, 调用的工具不合适, 尝试使用其他工具;  二, 调用工具时传入的参数可能存在非法值, 例如identifier的值非法(与工具的输入要求不符), 或者columns列表中包含了要查询的表格中未出现的字段.请你反思并尝试纠正.'
-
-        print_colored(self.scratchpad.split('\n')[-1], color="yellow")
+        print_colored(self.scratchpad.last_line(), color="yellow")
 
         # 下一步
         self.step_n += 1
 
     def prompt_agent(self) -> str:
-        return format_step(LLM(self._build_agent_prompt(), self.model_name))
+        return format_step(ask_llm(self._build_agent_prompt(), self.model_name))
     
-    def _build_agent_prompt(self) -> str:
-        return self.agent_prompt.format(
+    def _build_agent_prompt(self):
+        # 示例 / 工具 / 表格只在第一次编译, 之后每步只拼接 问题 + 过程记录
+        compiled = compile_prompt(self.agent_prompt,
                             examples = self.react_examples,
                             table_used_prompt = self.table_used_prompt,
                             tools = self.tools,
-                            tool_names = self.tool_names,
+                            tool_names = self.tool_names)
+        return compiled.render(
                             question = self.question,              # 问题
                             scratchpad = self.scratchpad)          # 过程记录
     
@@ -148,7 +312,9 @@ class ReactAgent:
     def __reset_agent(self) -> None:
         self.step_n = 1             # 当前步
         self.finished = False       # 是否完成
-        self.scratchpad: str = ''   # 过程
+        self.scratchpad = Scratchpad()   # 过程
+        self.tool_cache_stats = new_question_stats()   # 本题的工具缓存命中
+        self.llm_usage = UsageAccumulator()            # 本题的 LLM 调用 token / 耗时
 
     def set_qa(self, question: str, key: str) -> None:
         self.question = question
@@ -180,7 +346,11 @@ class PSAgent:
         if reset:
             self.__reset_agent()
         
-        plan = format_step(LLM(self._build_plan_prompt(), self.model_name)).replace("：", ": ")
+        with question_scope(self.tool_cache_stats), usage_scope(self.llm_usage):   # 工具缓存命中 / LLM 用量按题统计
+            self._run()
+
+    def _run(self) -> None:
+        plan = format_step(ask_llm(self._build_plan_prompt(), self.model_name, caller="planner")).replace("：", ": ")
         print_colored(f"{plan}", color='red')
 
         plan = parse_plan(plan)
@@ -189,11 +359,12 @@ class PSAgent:
         print(plan)
 
         for step, p in enumerate(plan):
-            action = format_step(LLM(self._build_solve_prompt(p), self.model_name))
+            action = format_step(ask_llm(self._build_solve_prompt(p), self.model_name))
             print_colored(f"步骤{step + 1}: {action}", color='blue')
 
-            action_type, action_input = parse_action(action)
-            print_colored(f"行动在这里: {action_type}: {action_input}", color="green")
+            actions = parse_actions(action)
+            action_type, action_input = actions[0]
+            print_colored(f"行动在这里: {describe_actions(actions)}", color="green")
             print("等待行动结果....")
 
             self.scratchpad += f"\n第{step + 1}步计划: {p} 执行结果: "
@@ -204,39 +375,29 @@ class PSAgent:
                 self.finished = True
                 return
             elif action_type == "":
-                self.scratchpad += f"""行动格式非法, 行动一次只能调用一次工具, 行动必须按照以下json格式输出, 可以被Python json.loads函数解析: ```json{{"action": $TOOL_NAME,"action_input": $INPUT}}```, 请你反思并尝试纠正."""
+                self.scratchpad += INVALID_ACTION_HINT
             else:
-                try:
-                    result = post_request(action_type, action_input)
-                    self.scratchpad += str(result)
-
-                    if result == "No data found for the specified identifier.":
-                        self.scratchpad += '原因可能是: 一, 调用的工具不合适, 尝试使用其他工具; 二, 调用工具时传入的参数可能存在非法值, 例如identifier的值非法(与工具的输入要求不符), 或者columns列表中包含了要查询的表格中未出现的字段.请你反思并尝试纠正.'
-                    elif result == "One or more specified columns do not exist.":
-                        self.scratchpad += '原因可能是: 调用工具时传入的columns列表中包含了要查询的表格中未出现的字段., 请你反思并尝试纠正.'
-                except Exception as e:
-                    self.scratchpad += '原因可能是: 一, 调用的工具不合适, 尝试使用其他工具; 二, 调用工具时传入的参数可能存在非法值, 例如identifier的值非法(与工具的输入要求不符), 或者columns列表中包含了要查询的表格中未出现的字段.请你反思并尝试纠正.'
+                self.scratchpad += run_actions(actions)
 
-            print_colored(self.scratchpad.split('\n')[-1], color="yellow")
+            print_colored(self.scratchpad.last_line(), color="yellow")
 
     def prompt_agent(self) -> str:
         return format_step(LLM(self._build_agent_prompt(), self.model_name))
     
-    def _build_plan_prompt(self) -> str:
-        return self.plan_prompt.format(
+    def _build_plan_prompt(self):
+        return compile_prompt(self.plan_prompt,
                             examples = PLAN_SOLVE_plan_EXAMPLE,       
                             table_used_prompt = self.table_used_prompt,
                             tools = self.tools,
-                            question = self.question,              # 问题
-                )
+                ).render(question = self.question)              # 问题
 
-    def _build_solve_prompt(self, plan) -> str:
-        return self.solve_prompt.format(
+    def _build_solve_prompt(self, plan):
+        return compile_prompt(self.solve_prompt,
                             examples = PLAN_SOLVE_solve_EXAMPLE,        
                             table_used_prompt = self.table_used_prompt,
                             tools = self.tools,
                             tool_names = self.tool_names,
-                            plan = plan,              # 问题
+                ).render(plan = plan,              # 问题
                             scratchpad = self.scratchpad)          # 过程记录
     
     def is_finished(self) -> bool:
@@ -251,7 +412,9 @@ class PSAgent:
     def __reset_agent(self) -> None:
         self.step_n = 1             # 当前步
         self.finished = False       # 是否完成
-        self.scratchpad: str = ''   # 过程
+        self.scratchpad = Scratchpad()   # 过程
+        self.tool_cache_stats = new_question_stats()   # 本题的工具缓存命中
+        self.llm_usage = UsageAccumulator()            # 本题的 LLM 调用 token / 耗时
 
     def set_qa(self, question: str, key: str) -> None:
         self.question = question
@@ -285,7 +448,11 @@ class PEAgent:
         if reset:
             self.__reset_agent()
         
-        plan = format_step(LLM(self._build_plan_prompt(), self.model_name)).replace("：", ": ")
+        with question_scope(self.tool_cache_stats), usage_scope(self.llm_usage):   # 工具缓存命中 / LLM 用量按题统计
+            self._run()
+
+    def _run(self) -> None:
+        plan = format_step(ask_llm(self._build_plan_prompt(), self.model_name, caller="planner")).replace("：", ": ")
         print_colored(f"原始计划输出: {plan}", color='red')
 
         old_plan = plan
@@ -299,11 +466,12 @@ class PEAgent:
 
             print_colored(f"当前执行到的步骤: 第{step}步: {p}", color='red')
             
-            action = format_step(LLM(self._build_solve_prompt(p), self.model_name))
+            action = format_step(ask_llm(self._build_solve_prompt(p), self.model_name))
             print_colored(f"步骤{step}: {action}", color='blue')
 
-            action_type, action_input = parse_action(action)
-            print_colored(f"行动在这里: {action_type}: {action_input}", color="green")
+            actions = parse_actions(action)
+            action_type, action_input = actions[0]
+            print_colored(f"行动在这里: {describe_actions(actions)}", color="green")
             print("等待行动结果....")
 
             self.scratchpad += f"\n第{step}步计划: {p} 执行结果: "
@@ -314,23 +482,14 @@ class PEAgent:
                 self.finished = True
                 return
             elif action_type == "":
-                self.scratchpad += f"""行动格式非法, 行动一次只能调用一次工具, 行动必须按照以下json格式输出, 可以被Python json.loads函数解析: ```json{{"action": $TOOL_NAME,"action_input": $INPUT}}```, 请你反思并尝试纠正."""
+                self.scratchpad += INVALID_ACTION_HINT
             else:
-                try:
-                    result = post_request(action_type, action_input)
-                    self.scratchpad += str(result)
+                self.scratchpad += run_actions(actions)
 
-                    if result == "No data found for the specified identifier.":
-                        self.scratchpad += '原因可能是: 一, 调用的工具不合适, 尝试使用其他工具; 二, 调用工具时传入的参数可能存在非法值, 例如identifier的值非法(与工具的输入要求不符), 或者columns列表中包含了要查询的表格中未出现的字段.请你反思并尝试纠正.'
-                    elif result == "One or more specified columns do not exist.":
-                        self.scratchpad += '原因可能是: 调用工具时传入的columns列表中包含了要查询的表格中未出现的字段., 请你反思并尝试纠正.'
-                except Exception as e:
-                    self.scratchpad += '原因可能是: 一, 调用的工具不合适, 尝试使用其他工具; 二, 调用工具时传入的参数可能存在非法值, 例如identifier的值非法(与工具的输入要求不符), 或者columns列表中包含了要查询的表格中未出现的字段.请你反思并尝试纠正.'
-
-            print_colored(self.scratchpad.split('\n')[-1], color="yellow")
+            print_colored(self.scratchpad.last_line(), color="yellow")
 
             print("重新规划...")
-            plan = format_step(LLM(self._build_replan_prompt(old_plan), self.model_name))
+            plan = format_step(ask_llm(self._build_replan_prompt(old_plan), self.model_name, caller="planner"))
 
             print_colored(f"重新规划的计划: {plan}", color='red')
 
@@ -341,29 +500,28 @@ class PEAgent:
     def prompt_agent(self) -> str:
         return format_step(LLM(self._build_agent_prompt(), self.model_name))
     
-    def _build_plan_prompt(self) -> str:
-        return self.plan_prompt.format(
+    def _build_plan_prompt(self):
+        return compile_prompt(self.plan_prompt,
                             examples = PLAN_SOLVE_plan_EXAMPLE,       
                             table_used_prompt = self.table_used_prompt,
                             tools = self.tools,
-                            question = self.question,              # 问题
-                )
+                ).render(question = self.question)              # 问题
 
-    def _build_solve_prompt(self, plan) -> str:
-        return self.solve_prompt.format(
+    def _build_solve_prompt(self, plan):
+        return compile_prompt(self.solve_prompt,
                             examples = PLAN_SOLVE_solve_EXAMPLE,        
                             table_used_prompt = self.table_used_prompt,
                             tools = self.tools,
                             tool_names = self.tool_names,
-                            plan = plan,              # 问题
+                ).render(plan = plan,              # 问题
                             scratchpad = self.scratchpad)          # 过程记录
     
-    def _build_replan_prompt(self, plan) -> str:
-        return self.replan_prompt.format(
+    def _build_replan_prompt(self, plan):
+        return compile_prompt(self.replan_prompt,
                             examples = PLAN_SOLVE_replan_EXAMPLE,        
                             table_used_prompt = self.table_used_prompt,
                             tools = self.tools,
-                            plan = plan,              # 问题
+                ).render(plan = plan,              # 问题
                             scratchpad = self.scratchpad,
                             question = self.question)          # 过程记录
     
@@ -379,7 +537,9 @@ class PEAgent:
     def __reset_agent(self) -> None:
         self.step_n = 1             # 当前步
         self.finished = False       # 是否完成
-        self.scratchpad: str = ''   # 过程
+        self.scratchpad = Scratchpad()   # 过程
+        self.tool_cache_stats = new_question_stats()   # 本题的工具缓存命中
+        self.llm_usage = UsageAccumulator()            # 本题的 LLM 调用 token / 耗时
 
     def set_qa(self, question: str, key: str) -> None:
         self.question = question
@@ -400,27 +560,48 @@ def parse_plan(rsp: str):
             rsp = rsp.split(f'第{step}步: ')[1]
             step += 1
 
-def parse_action(rsp: str):
-    json_pattern = r"```json(.*?)```"
-    rsp_json = None
-    matches = re.findall(json_pattern, rsp, re.DOTALL)
-    if len(matches) != 0:
-        for match in matches:
-            try:
-                match = match.replace('\'', '\"').replace('(', '（').replace(')', '）')     
-                rsp_json = json.loads(match)    
-                if isinstance(rsp_json['action_input'], dict):
-                    if rsp_json['action'] == 'get_rank' or rsp_json['action'] == 'get_sum' or rsp_json['action'] == 'get_subtraction' or \
-                        rsp_json['action'] == 'get_multiplication' or rsp_json['action'] == 'get_division':
-                        return rsp_json['action'], rsp_json['action_input']
-                    if 'columns' in rsp_json['action_input'].keys():
-                        if len(rsp_json['action_input']['columns']) > 5:
-                            rsp_json['action_input']['columns'] = []
-                    elif 'identifier' in rsp_json['action_input'].keys() or 'prov' in rsp_json['action_input'].keys():
-                        rsp_json['action_input']['columns'] = []
-                return rsp_json['action'], rsp_json['action_input']
-            except Exception as e:
-                return "", ""
+def _normalize_action(rsp_json):
+    action_input = rsp_json['action_input']
+    if isinstance(action_input, dict):
+        if rsp_json['action'] == 'get_rank' or rsp_json['action'] == 'get_sum' or rsp_json['action'] == 'get_subtraction' or \
+            rsp_json['action'] == 'get_multiplication' or rsp_json['action'] == 'get_division':
+            return rsp_json['action'], action_input
+        if 'columns' in action_input.keys():
+            if len(action_input['columns']) > 5:
+                action_input['columns'] = []
+        elif 'identifier' in action_input.keys() or 'prov' in action_input.keys():
+            action_input['columns'] = []
+    return rsp_json['action'], action_input
+
+def _parse_call_kwargs(call: str) -> dict:
+    """
+    identifier='xxx', columns=[] -> {"identifier": "xxx", "columns": []}; 只接受字面量参数
+    """
+    node = ast.parse(f"f({call})", mode="eval").body
+    if node.args:
+        raise ValueError("positional arguments are not supported")
+    return {kw.arg: ast.literal_eval(kw.value) for kw in node.keywords if kw.arg}
+
+def parse_actions(rsp: str):
+    """
+    解析一次行动: 一个 {"action", "action_input"} 对象, 或由多个这样的对象组成的 json 列表(批量调用).
+    返回 [(action, action_input), ...], 格式非法时返回 [("", "")].
+    只看第一个 json 代码块, 后面的块多半是模型自己续写的后续步骤.
+    批量里混入的 "Final Answer" 会被忽略, 只有单独输出时才算作答.
+    """
+    blocks = [body for lang, body in fenced_blocks(rsp) if lang == "json"]
+    if len(blocks) != 0:
+        try:
+            # 数据里的公司名 / 案号用的是全角括号
+            found = find_json(blocks[0].replace('(', '（').replace(')', '）'))
+            rsp_json = found[0]
+            items = rsp_json if isinstance(rsp_json, list) else [rsp_json]
+            actions = [_normalize_action(item) for item in items]
+        except Exception as e:
+            return [("", "")]
+        if len(actions) > 1:
+            actions = [a for a in actions if a[0] != 'Final Answer'] or actions[-1:]
+        return actions or [("", "")]
     else:
         # 尝试匹配 xxx```pythontool_call(identifier='xxx', columns=[])```
         try :
@@ -429,10 +610,13 @@ def parse_action(rsp: str):
             suffix = ")"
             if tool_call.startswith(prefix) and tool_call.endswith(suffix):
                 tool_call = tool_call[len(prefix):-len(suffix)]
-            tool_call_dict = eval(f"dict({tool_call})")
-            return action, tool_call_dict
+            tool_call_dict = _parse_call_kwargs(tool_call)
+            return [(action, tool_call_dict)]
         except Exception as e:
-            return "", ""
+            return [("", "")]
+
+def parse_action(rsp: str):
+    return parse_actions(rsp)[0]
 
 def format_step(step: str) -> str:
     return step.strip('\n').strip().replace('\n', '')
\ No newline at end of file
@@ -0,0 +1,318 @@
+# src/citations.py
+# 法条引用的抽取与校验（citation_score 的实现，不调用 LLM）：
+#   - 抽取：一个预编译正则定位 “第X条”（可带 之一 / 第X款 / 第X项），条号中文数字转整数；
+#     法律名取紧挨着的《…》，没有书名号时用法律名的反向 trie 从 “第” 往前做最长匹配（“依民法典第577条”），
+#     “、第X条” 这类连写继承上一条的法律名，“本法 / 该法 / 同法” 指向上文最近的法律名。
+#   - 校验：对照从语料建的法条表（法律名 -> 出现过的条号）和本题依据文档里的引用，逐条给出 hit / miss。
+# 法律名统一规范化：NFKC、去空白、去 “中华人民共和国” 前缀、去末尾的 （2018修正） 之类版本注记。
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+DEFAULT_STATUTE_PATH = os.getenv(
+    "STATUTE_TABLE", os.path.join(os.getenv("GREEN_INDEX_ROOT", "./green_agent_db"), "statutes.json"))
+
+_NUM = r"[零〇一二两三四五六七八九十百千\d０-９]+"
+_CITATION = re.compile(
+    r"(?:《([^《》\n]{1,60})》\s*)?第(" + _NUM + r")条(?:之([一二三四五六七八九十]+))?"
+    r"(?:\s*第" + _NUM + r"款)?(?:\s*第" + _NUM + r"项)?"
+)
+# 两条引用之间只有这些字符时，后一条沿用前一条的法律名
+_CONNECTOR = re.compile(r"[\s、，,;；和及与或以至到]*")
+_SAME_LAW = ("本法", "该法", "同法", "此法")
+_PREFIX = "中华人民共和国"
+_VERSION = re.compile(r"[（(][^（()）]*[）)]$")
+_SPACE = re.compile(r"\s+")
+
+_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_UNITS = {"十": 10, "百": 100, "千": 1000}
+
+HIT = "hit"
+UNKNOWN_LAW = "unknown_law"          # 法律名既不在法条表里也不在依据里：疑似编造
+UNKNOWN_ARTICLE = "unknown_article"  # 法律已知，但这一条没出现过
+UNRESOLVED = "unresolved"            # 没写法律名 / 没有法条表，且依据里没有这一条：无从判断（不计分）
+STATUSES = (HIT, UNKNOWN_LAW, UNKNOWN_ARTICLE, UNRESOLVED)
+
+
+def cn_to_int(s: str) -> Optional[int]:
+    """
+    条号转整数：'577' / '５７７' / '五百七十七' / '十' / '一百零五' -> int；无法解析返回 None
+    """
+    s = unicodedata.normalize("NFKC", s)
+    if s.isdigit():
+        return int(s)
+    total, num = 0, 0
+    for ch in s:
+        if ch in _DIGITS:
+            num = _DIGITS[ch]
+        elif ch in _UNITS:
+            total += (num or 1) * _UNITS[ch]
+            num = 0
+        else:
+            return None
+    return total + num
+
+
+def normalize_title(title: str) -> str:
+    title = _SPACE.sub("", unicodedata.normalize("NFKC", title or ""))
+    # NFKC 把全角括号折成半角；版本注记可能有多段
+    while True:
+        stripped = _VERSION.sub("", title)
+        if stripped == title:
+            break
+        title = stripped
+    if title.startswith(_PREFIX) and len(title) > len(_PREFIX):
+        title = title[len(_PREFIX):]
+    return title
+
+
+class Citation(NamedTuple):
+    law: str         # 规范化的法律名；没写也推不出来时为 ""
+    article: int
+    sub: int         # “第X条之一” 的 1；没有为 0
+    start: int
+    end: int
+    text: str
+
+
+class StatuteTable:
+    """
+    In-memory statute table: normalized law title -> article numbers seen in
+    the corpus. Also holds the reversed-title trie used to spot law names
+    written without 《》.
+    """
+
+    def __init__(self, articles: Optional[Dict[str, Iterable[int]]] = None):
+        self.articles: Dict[str, Set[int]] = {}
+        self._trie: Dict[str, Any] = {}
+        self._depth = 0
+        self._lock = threading.Lock()
+        for law, nums in (articles or {}).items():
+            for n in nums:
+                self.add(law, n)
+
+    def __len__(self) -> int:
+        return len(self.articles)
+
+    def add(self, law: str, article: Optional[int] = None) -> None:
+        law = normalize_title(law)
+        if not law:
+            return
+        with self._lock:
+            if law not in self.articles:
+                self.articles[law] = set()
+                self._insert(law, law)
+                self._insert(_PREFIX + law, law)
+            if article is not None:
+                self.articles[law].add(int(article))
+
+    def _insert(self, name: str, law: str) -> None:
+        node = self._trie
+        for ch in reversed(name):
+            node = node.setdefault(ch, {})
+        node[""] = law
+        self._depth = max(self._depth, len(name))
+
+    def law_before(self, text: str, end: int) -> Optional[Tuple[str, int]]:
+        """
+        Longest known law title ending at `end` in `text`: (law, start), or None.
+        """
+        node, best = self._trie, None
+        i, stop = end - 1, max(-1, end - 1 - self._depth)
+        while i > stop:
+            node = node.get(text[i])
+            if node is None:
+                break
+            if "" in node:
+                best = (node[""], i)
+            i -= 1
+        return best
+
+    def knows(self, law: str, article: Optional[int] = None) -> bool:
+        nums = self.articles.get(law)
+        if nums is None:
+            return False
+        return article is None or article in nums
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> "StatuteTable":
+        """
+        Table of every titled citation found in `texts` (corpus documents).
+        """
+        table = cls()
+        for text in texts:
+            for c in extract_citations(text, table):
+                if c.law:
+                    table.add(c.law, c.article)
+        return table
+
+    @classmethod
+    def load(cls, path: str) -> "StatuteTable":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f).get("articles", {}))
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"articles": {law: sorted(nums) for law, nums in sorted(self.articles.items())}},
+                      f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"laws": len(self.articles), "articles": sum(len(v) for v in self.articles.values())}
+
+
+def extract_citations(text: str, table: Optional[StatuteTable] = None) -> List[Citation]:
+    """
+    Statute citations in `text`, in order. Without 《》 a law name is only
+    recognized if `table` knows it.
+    """
+    text = str(text or "")
+    if "条" not in text:
+        return []
+    out: List[Citation] = []
+    last_law, last_end = "", -1
+    for m in _CITATION.finditer(text):
+        article = cn_to_int(m.group(2))
+        if article is None:
+            continue
+        start = m.start()
+        if m.group(1):
+            law = normalize_title(m.group(1))
+        else:
+            law = ""
+            anchor = m.start(2) - 1  # “第” 的位置
+            j = anchor
+            while j > 0 and text[j - 1].isspace():
+                j -= 1
+            found = table.law_before(text, j) if table is not None else None
+            if found is not None:
+                law, start = found
+            elif text[max(0, j - 2):j] in _SAME_LAW:
+                law, start = last_law, j - 2
+            elif last_law and _CONNECTOR.fullmatch(text, last_end, anchor):
+                law = last_law
+        sub = cn_to_int(m.group(3)) if m.group(3) else 0
+        out.append(Citation(law, article, sub or 0, start, m.end(), text[start:m.end()]))
+        if law:
+            last_law = law
+        last_end = m.end()
+    return out
+
+
+def citation_keys(text: str, table: Optional[StatuteTable] = None) -> Set[Tuple[str, int]]:
+    """
+    {(law or "", article)} cited in `text`.
+    """
+    return {(c.law, c.article) for c in extract_citations(text, table)}
+
+
+def cited_in(law: str, article: int, known: Set[Tuple[str, int]]) -> bool:
+    """
+    Whether (law, article) is among `known`; a missing law name on either
+    side matches on the article number alone.
+    """
+    return any(article == k_n and (not law or not k_law or law == k_law) for k_law, k_n in known)
+
+
+def validate_citations(response: str, ground_truth_docs: Sequence[str] = (),
+                       table: Optional[StatuteTable] = None) -> Dict[str, Any]:
+    """
+    Check each statute cited in `response` against the statute table and the
+    citations in `ground_truth_docs`. Always returns a dict of per-citation
+    records, total, hits, misses and `score` = hits / (hits + misses); `score`
+    is None when no citation could be checked (none cited, or all
+    unresolved). Misses are only reported against a non-empty table; without
+    one, citations absent from the ground truth are unresolved.
+    """
+    table = table if table is not None else get_statute_table()
+    known: Set[Tuple[str, int]] = set()
+    for doc in ground_truth_docs or ():
+        known |= citation_keys(doc, table)
+    known_laws = {law for law, _ in known if law}
+
+    records: List[Dict[str, Any]] = []
+    hits = misses = 0
+    for c in extract_citations(response, table):
+        if cited_in(c.law, c.article, known) or (c.law and table.knows(c.law, c.article)):
+            status = HIT
+        elif not c.law or not len(table):
+            # 没有法条表时，依据里没出现的引用无法判定真假（不能当成编造）
+            status = UNRESOLVED
+        elif c.law in known_laws or table.knows(c.law):
+            status = UNKNOWN_ARTICLE
+        else:
+            status = UNKNOWN_LAW
+        if status == HIT:
+            hits += 1
+        elif status != UNRESOLVED:
+            misses += 1
+        records.append({"text": c.text, "law": c.law, "article": c.article, "sub": c.sub,
+                        "start": c.start, "end": c.end, "status": status})
+    checked = hits + misses
+    return {
+        "citations": records,
+        "total": len(records),
+        "hits": hits,
+        "misses": misses,
+        "score": hits / checked if checked else None,
+    }
+
+
+# -----------------------------
+# 进程内共享的法条表
+# -----------------------------
+_TABLE: Optional[StatuteTable] = None
+_TABLE_LOCK = threading.Lock()
+
+
+def get_statute_table(path: str = DEFAULT_STATUTE_PATH) -> StatuteTable:
+    """
+    Statute table built by scripts/build_statute_table.py, loaded once; an
+    empty table (citations checked against the ground truth only) when the
+    file does not exist.
+    """
+    global _TABLE
+    if _TABLE is None:
+        with _TABLE_LOCK:
+            if _TABLE is None:
+                _TABLE = StatuteTable.load(path) if os.path.exists(path) else StatuteTable()
+    return _TABLE
+
+
+# -----------------------------
+# 汇总
+# -----------------------------
+def new_citation_stats() -> Dict[str, Any]:
+    return {"responses": 0, "with_citations": 0, "citations": 0, "hits": 0, "misses": 0,
+            "by_status": {s: 0 for s in STATUSES}}
+
+
+def fold_citations(stats: Dict[str, Any], report: Optional[Dict[str, Any]]) -> None:
+    """
+    Add one validate_citations() result (or its trimmed form without the
+    per-citation records) to the run totals.
+    """
+    if not report:
+        return
+    stats["responses"] += 1
+    if report.get("total"):
+        stats["with_citations"] += 1
+    stats["citations"] += report.get("total", 0)
+    stats["hits"] += report.get("hits", 0)
+    stats["misses"] += report.get("misses", 0)
+    for rec in report.get("citations", ()):
+        stats["by_status"][rec["status"]] = stats["by_status"].get(rec["status"], 0) + 1
+
+
+def citation_summary(stats: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(stats)
+    checked = stats["hits"] + stats["misses"]
+    out["hit_rate"] = stats["hits"] / checked if checked else None
+    return out
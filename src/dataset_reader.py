@@ -0,0 +1,240 @@
+# src/dataset_reader.py
+# 流式读取 .json 数据集：顶层数组或 {"items": [...]} 包装，边读边产出，不把整个文件读进内存；
+# 另外维护一个轻量的偏移索引（每条记录的字节偏移 + 长度），支持按下标随机读取。
+from __future__ import annotations
+
+import json
+import os
+import re
+from array import array
+from typing import Any, Iterator, Optional, Sequence, Tuple
+
+DEFAULT_KEYS = ("items",)
+CHUNK_SIZE = 1 << 20
+
+# Structural bytes outside strings.
+# UTF-8 continuation bytes are >= 0x80, so multi-byte characters never match.
+_STRUCT = re.compile(rb'["\[\]{},]')
+_NON_WS = re.compile(rb"[^ \t\r\n]")
+
+_BACKSLASH = ord("\\")
+_QUOTE = ord('"')
+_OPEN = (ord("["), ord("{"))
+_CLOSE = (ord("]"), ord("}"))
+_COMMA = ord(",")
+
+
+def _scan(f, keys: Sequence[str], chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (byte_offset, raw_bytes) for each element of the dataset array.
+
+    The array is either the top-level value or the value of the first key in
+    `keys` of a top-level object. Only one element is buffered at a time.
+    """
+    depth = 0
+    top: Optional[int] = None
+    target: Optional[int] = None  # depth at which the wanted array's elements live
+    in_str = False
+    esc = False
+    key_buf: Optional[bytearray] = None  # current depth-1 string of a wrapper object
+    last_key: Optional[str] = None
+    want_start = False  # the next non-blank byte starts an element
+    item_start: Optional[int] = None
+    carry = bytearray()  # bytes of the current element from earlier chunks
+    base = 0  # absolute offset of `chunk`
+
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        n = len(chunk)
+        pos = 0
+        seg = 0  # where the open element's bytes start in this chunk
+
+        while pos < n:
+            if in_str:
+                # Jump to the next quote; it closes the string unless preceded by an
+                # odd run of backslashes (`esc` carries an odd run across chunks).
+                j = chunk.find(b'"', pos)
+                end = n if j == -1 else j
+                k = end
+                while k > pos and chunk[k - 1] == _BACKSLASH:
+                    k -= 1
+                odd = (end - k) % 2 == 1
+                if k == pos and esc:
+                    odd = not odd
+                esc = False
+                if j == -1:
+                    if key_buf is not None:
+                        key_buf += chunk[pos:]
+                    esc = odd
+                    pos = n
+                    break
+                if odd:  # escaped quote, still inside the string
+                    if key_buf is not None:
+                        key_buf += chunk[pos:j + 1]
+                    pos = j + 1
+                    continue
+                if key_buf is not None:
+                    key_buf += chunk[pos:j]
+                    last_key = json.loads(b'"' + bytes(key_buf) + b'"')
+                    key_buf = None
+                in_str = False
+                pos = j + 1
+                continue
+
+            if want_start:
+                m = _NON_WS.search(chunk, pos)
+                if m is None:
+                    pos = n
+                    break
+                pos = m.start()
+                want_start = False
+                if chunk[pos] not in _CLOSE:
+                    item_start = base + pos
+                    seg = pos
+                continue
+
+            m = _STRUCT.search(chunk, pos)
+            if m is None:
+                pos = n
+                break
+            j = m.start()
+            c = chunk[j]
+            pos = j + 1
+
+            if c == _QUOTE:
+                in_str = True
+                if target is None and depth == 1 and top == _OPEN[1]:
+                    key_buf = bytearray()
+            elif c in _OPEN:
+                if depth == 0:
+                    top = c
+                depth += 1
+                if target is None and c == _OPEN[0]:
+                    if depth == 1 or (depth == 2 and top == _OPEN[1] and last_key in keys):
+                        target = depth
+                        want_start = True
+            elif c in _CLOSE:
+                if target is not None and depth == target:
+                    if item_start is not None:
+                        yield item_start, bytes(carry) + chunk[seg:j]
+                    return
+                depth -= 1
+            elif c == _COMMA:
+                if target is not None and depth == target:
+                    if item_start is not None:
+                        yield item_start, bytes(carry) + chunk[seg:j]
+                        item_start = None
+                        carry = bytearray()
+                    want_start = True
+        if item_start is not None:
+            carry += chunk[seg:]
+        base += n
+
+    if target is None:
+        raise ValueError(f"dataset json must be a list, or a dict with one of {list(keys)} as list")
+    raise ValueError("dataset json ended before the item array was closed")
+
+
+class JsonArrayReader:
+    """
+    Incremental reader over a JSON dataset file.
+
+    Iteration parses items as they are scanned. `len()`, indexing and
+    `iter_range()` use an offset index (int64 offsets + lengths) that is built
+    on first use with a scan that does not parse items, and cached next to the
+    dataset as `<path>.idx` when the directory is writable.
+    """
+
+    def __init__(self, path: str, keys: Sequence[str] = DEFAULT_KEYS, chunk_size: int = CHUNK_SIZE):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"dataset not found: {path}")
+        self.path = path
+        self.keys = tuple(keys)
+        self.chunk_size = chunk_size
+        self._offsets: Optional[array] = None
+        self._lengths: Optional[array] = None
+
+    def __iter__(self) -> Iterator[Any]:
+        with open(self.path, "rb") as f:
+            for _, raw in _scan(f, self.keys, self.chunk_size):
+                yield json.loads(raw)
+
+    def __len__(self) -> int:
+        self._ensure_index()
+        return len(self._offsets)
+
+    def __getitem__(self, i: int) -> Any:
+        self._ensure_index()
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[i])
+            return json.loads(f.read(self._lengths[i]))
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Any]:
+        """Items [start, stop) without parsing the prefix."""
+        if start <= 0 and self._offsets is None:
+            for i, item in enumerate(self):
+                if stop is not None and i >= stop:
+                    return
+                yield item
+            return
+        self._ensure_index()
+        stop = len(self._offsets) if stop is None else min(stop, len(self._offsets))
+        if start >= stop:
+            return
+        with open(self.path, "rb") as f:
+            for i in range(start, stop):
+                f.seek(self._offsets[i])
+                yield json.loads(f.read(self._lengths[i]))
+
+    # -----------------------------
+    # offset index
+    # -----------------------------
+    def _index_path(self) -> str:
+        return self.path + ".idx"
+
+    def _signature(self) -> array:
+        st = os.stat(self.path)
+        return array("q", [st.st_size, st.st_mtime_ns])
+
+    def _ensure_index(self) -> None:
+        if self._offsets is not None:
+            return
+        if not self._load_index():
+            self._build_index()
+
+    def _load_index(self) -> bool:
+        # layout: [size, mtime_ns, n] then n offsets then n lengths, all int64
+        try:
+            with open(self._index_path(), "rb") as f:
+                head = array("q")
+                head.fromfile(f, 3)
+                if head[:2] != self._signature():
+                    return False
+                offsets, lengths = array("q"), array("q")
+                offsets.fromfile(f, head[2])
+                lengths.fromfile(f, head[2])
+        except (OSError, EOFError):
+            return False
+        self._offsets, self._lengths = offsets, lengths
+        return True
+
+    def _build_index(self) -> None:
+        offsets, lengths = array("q"), array("q")
+        with open(self.path, "rb") as f:
+            for off, raw in _scan(f, self.keys, self.chunk_size):
+                offsets.append(off)
+                lengths.append(len(raw))
+        self._offsets, self._lengths = offsets, lengths
+        try:
+            tmp = self._index_path() + ".tmp"
+            with open(tmp, "wb") as f:
+                head = self._signature()
+                head.append(len(offsets))
+                head.tofile(f)
+                offsets.tofile(f)
+                lengths.tofile(f)
+            os.replace(tmp, self._index_path())
+        except OSError:
+            pass  # read-only dataset dir: keep the index in memory only
@@ -0,0 +1,154 @@
+# src/embedding_cache.py
+# embedding 向量的持久化缓存：同一段文本 + 同一模型 + 同一 input_type 的向量是确定的，
+# 重新 ingest 语料、重复审计同一批问题时直接命中，不再为 embedding API 付费和等网络。
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "output/embed_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 500_000
+DEFAULT_DTYPE = os.getenv("EMBED_CACHE_DTYPE", "float16")
+
+# SQLite caps host parameters per statement (999 on older builds).
+_SQL_BATCH = 500
+
+
+def make_key(model_name: str, input_type: str, text: str) -> bytes:
+    """
+    Content address of one embedding: sha256 over model + input_type + text.
+    """
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(input_type.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(text.encode("utf-8"))
+    return h.digest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed vector store with size-bounded LRU eviction.
+
+    Vectors are stored as raw float16 (default) or float32 blobs; float16
+    halves the file and costs ~1e-3 relative error on normalized vectors,
+    far below what moves a retrieval ranking. Lookups and inserts are
+    batched so one ingest batch is one round trip.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 dtype: str = DEFAULT_DTYPE):
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"unsupported embedding cache dtype: {dtype}")
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            " key BLOB PRIMARY KEY,"
+            " dtype TEXT NOT NULL,"
+            " vec BLOB NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embedding_cache_lru ON embedding_cache(last_used)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        float32 vectors in `keys` order; None for misses.
+        """
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                part = list(keys[i:i + _SQL_BATCH])
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, dtype, vec FROM embedding_cache WHERE key IN ({marks})", part
+                ).fetchall()
+                for key, dtype, blob in rows:
+                    found[bytes(key)] = np.frombuffer(blob, dtype=dtype).astype(np.float32)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embedding_cache SET last_used = ? WHERE key IN ({marks})",
+                        [time.time_ns()] + part,
+                    )
+            out = [found.get(k) for k in keys]
+            hits = sum(v is not None for v in out)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return out
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        now = time.time_ns()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                added = 0
+                for key, vec in zip(keys, vectors):
+                    cur = self._conn.execute(
+                        "INSERT OR IGNORE INTO embedding_cache (key, dtype, vec, last_used) VALUES (?, ?, ?, ?)",
+                        (key, self.dtype, vec.tobytes(), now),
+                    )
+                    if cur.rowcount == 1:
+                        added += 1
+                    else:
+                        self._conn.execute(
+                            "UPDATE embedding_cache SET dtype = ?, vec = ?, last_used = ? WHERE key = ?",
+                            (self.dtype, vec.tobytes(), now, key),
+                        )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._count += added
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Evict down to 90% of capacity so we don't pay a DELETE on every insert once full.
+        target = int(self.max_entries * 0.9)
+        n = self._count - target
+        self._conn.execute(
+            "DELETE FROM embedding_cache WHERE key IN "
+            "(SELECT key FROM embedding_cache ORDER BY last_used ASC LIMIT ?)",
+            (n,),
+        )
+        self.evictions += n
+        self._count = target
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "path": self.path,
+            "dtype": self.dtype,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
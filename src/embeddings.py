@@ -0,0 +1,101 @@
+# src/embeddings.py
+# 可插拔的 embedding 后端：默认用本地 hashed n-gram 向量（无需网络、完全确定），
+# 需要更高质量时切换到 Voyage（GREEN_EMBEDDER=voyage-3-large）。
+from __future__ import annotations
+
+import os
+import zlib
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_EMBEDDER = os.getenv("GREEN_EMBEDDER", "hashing-1024")
+
+
+class Embedder:
+    """
+    Backend interface: `embed` returns an (n, dim) float32 matrix of
+    L2-normalized rows. `max_batch` is the provider's max inputs per call;
+    `cacheable` marks backends worth putting behind an EmbeddingCache
+    (paid / networked ones, not ones that are cheaper to recompute).
+    """
+
+    name: str = ""
+    dim: int = 0
+    max_batch: int = 128
+    cacheable: bool = False
+
+    def embed(self, texts: List[str], input_type: str = "document") -> np.ndarray:
+        raise NotImplementedError
+
+
+def _l2_normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+class HashingEmbedder(Embedder):
+    """
+    Signed feature hashing of character n-grams (bigrams by default), which
+    suits unsegmented Chinese text. Counts are sublinear (1 + log tf) so that
+    frequent function characters do not dominate. crc32 keeps it stable across
+    processes.
+    """
+
+    def __init__(self, dim: int = 1024, ngram_range=(2, 2)):
+        self.dim = int(dim)
+        self.ngram_range = ngram_range
+        self.name = f"hashing-{self.dim}"
+        self.max_batch = 4096
+
+    def _grams(self, text: str) -> List[str]:
+        text = "".join(text.lower().split())
+        lo, hi = self.ngram_range
+        lo = min(lo, len(text))  # very short texts fall back to shorter grams
+        return [text[i:i + n] for n in range(max(lo, 1), hi + 1) for i in range(len(text) - n + 1)]
+
+    def embed(self, texts: List[str], input_type: str = "document") -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(self._grams(text or ""))
+            if not counts:
+                continue
+            tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            h = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in counts), dtype=np.uint32, count=len(counts))
+            sign = np.where(h >> 31, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], (h % self.dim).astype(np.intp), sign * (1.0 + np.log(tf)))
+        return _l2_normalize(out)
+
+
+class VoyageEmbedder(Embedder):
+    """
+    Voyage AI API (needs VOYAGE_API_KEY and network).
+    """
+
+    def __init__(self, model: str = "voyage-3-large", dim: int = 1024):
+        import voyageai  # optional: only needed when this backend is selected
+
+        self.client = voyageai.Client()
+        self.name = model
+        self.dim = int(dim)
+        self.max_batch = 128
+        self.cacheable = True
+
+    def embed(self, texts: List[str], input_type: str = "document") -> np.ndarray:
+        vecs = self.client.embed(texts, model=self.name, input_type=input_type).embeddings
+        return _l2_normalize(np.asarray(vecs, dtype=np.float32))
+
+
+def get_embedder(name: Optional[str] = None) -> Embedder:
+    """
+    "hashing" / "hashing-<dim>" -> HashingEmbedder; "voyage-*" -> VoyageEmbedder.
+    """
+    name = name or DEFAULT_EMBEDDER
+    if name.startswith("hashing"):
+        _, _, dim = name.partition("-")
+        return HashingEmbedder(dim=int(dim) if dim else 1024)
+    if name.startswith("voyage"):
+        return VoyageEmbedder(model=name)
+    raise ValueError(f"unknown embedder: {name}")
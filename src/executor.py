@@ -1,12 +1,30 @@
 # src/executor.py
 from __future__ import annotations
 
+import asyncio
+import itertools
 import json
 import os
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .dataset_reader import JsonArrayReader
+from .judge_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, JudgeCache
+from .llm_usage import UsageAccumulator, llm_caller, summarize_items, usage_scope
+from .citations import citation_summary, fold_citations, new_citation_stats, validate_citations
+from .precheck import (DEFAULT_SHADOW_RATE, RULES, fold_precheck, new_precheck_stats, precheck,
+                       precheck_summary, shadowed)
+from .participant_client import (
+    DEFAULT_MAX_PER_HOST,
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT,
+    ParticipantClient,
+    ParticipantError,
+    pick_participant,
+)
 
 
 # -----------------------------
@@ -36,9 +54,69 @@ def _artifact(name: str, data: Any, mime: str = "application/json") -> Dict[str,
 # -----------------------------
 # Traffic Light adapter (YOUR IMPLEMENTATION)
 # -----------------------------
-def _score_with_traffic_light(item: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+def _make_judge_cache(config: Dict[str, Any]) -> Optional[JudgeCache]:
+    """
+    Persistent judge-response cache; disabled with config.judge_cache = false.
+    """
+    if not config.get("judge_cache", True):
+        return None
+    return JudgeCache(
+        path=config.get("judge_cache_path") or DEFAULT_CACHE_PATH,
+        max_entries=config.get("judge_cache_max_entries") or DEFAULT_MAX_ENTRIES,
+    )
+
+
+def _make_auditor(config: Dict[str, Any], cache: Optional[JudgeCache] = None):
+    """
+    Build one TrafficLightAuditor for a whole assessment.
+    The auditor is stateless, so it is safe to share across scoring threads.
+    """
+    from .traffic_light_eval import TrafficLightAuditor  # this matches your file/class
+
+    # Optional: model name override
+    model_name = config.get("audit_model") or config.get("model_name") or "glm-4-flash"
+    return TrafficLightAuditor(model_name=model_name, cache=cache)
+
+
+def _make_participant_client(participants: Dict[str, Any], config: Dict[str, Any]):
+    """
+    Pooled client for the participant under test, or None when no participant
+    is an http(s) endpoint (or config.query_participants = false); items are
+    then scored on the answers already in the dataset.
+    """
+    if not config.get("query_participants", True):
+        return None, None
+    picked = pick_participant(participants, config.get("participant_role"))
+    if picked is None:
+        return None, None
+    # timeout x (1 + retries) + backoff would outlast item_timeout, which then kills the retries and
+    # reports a slow participant as a timeout; give the participant a share of the item's time instead
+    item_timeout = config.get("item_timeout", DEFAULT_ITEM_TIMEOUT)
+    budget = float(item_timeout) * PARTICIPANT_BUDGET_SHARE if item_timeout else None
+    timeout = float(config.get("participant_timeout") or DEFAULT_TIMEOUT)
+    client = ParticipantClient(
+        participants,
+        protocol=config.get("participant_protocol") or "a2a",
+        timeout=min(timeout, budget) if budget else timeout,
+        max_per_host=int(config.get("participant_max_per_host") or DEFAULT_MAX_PER_HOST),
+        retries=int(config.get("participant_retries", DEFAULT_RETRIES)),
+        budget=budget,
+    )
+    return client, picked[0]
+
+
+def _item_query(item: Dict[str, Any]) -> str:
+    return item.get("query") or item.get("question") or item.get("prompt") or item.get("input") or ""
+
+
+def _score_with_traffic_light(
+    item: Dict[str, Any],
+    config: Dict[str, Any],
+    auditor: Any = None,
+) -> Dict[str, Any]:
     """
     Uses your src/traffic_light_eval.py TrafficLightAuditor.
+    Pass a shared `auditor` (see _make_auditor); one is built on demand otherwise.
 
     Returns normalized record:
     {
@@ -50,18 +128,93 @@ def _score_with_traffic_light(item: Dict[str, Any], config: Dict[str, Any]) -> D
       "notes": str,
       "raw_audit": {...},
       "triples": [...] (optional),
+      "citations": {...} (per-citation hit/miss, see src/citations.py),
       "query": str,
       "agent_response": str
     }
     """
-    # ---- 1) Extract fields robustly (dataset schema may vary) ----
-    query = (
-        item.get("query")
-        or item.get("question")
-        or item.get("prompt")
-        or item.get("input")
-        or ""
+    query, agent_response, ground_truth_docs = _judge_inputs(item)
+
+    # ---- 2) Rule-based pre-check; only undecided (or shadowed) items reach the LLM ----
+    pre, shadow = _precheck_item(item, query, agent_response, ground_truth_docs, config)
+    if pre is not None and not shadow:
+        return _scored_record(pre, query, agent_response, ground_truth_docs, config, auditor)
+
+    # ---- 3) Call your auditor ----
+    if auditor is None:
+        auditor = _make_auditor(config)
+
+    raw = auditor.evaluate_signal(
+        query=query,
+        agent_response=agent_response,
+        ground_truth_docs=ground_truth_docs,
     )
+    if pre is not None:
+        return _scored_record(pre, query, agent_response, ground_truth_docs, config, auditor, shadow_audit=raw)
+    return _scored_record(raw, query, agent_response, ground_truth_docs, config, auditor)
+
+
+def _score_batch_with_traffic_light(
+    items: List[Dict[str, Any]],
+    config: Dict[str, Any],
+    auditor: Any = None,
+) -> List[Dict[str, Any]]:
+    """
+    Like _score_with_traffic_light for several items judged in one prompt
+    (TrafficLightAuditor.evaluate_batch); records come back in item order.
+    """
+    if auditor is None:
+        auditor = _make_auditor(config)
+    inputs = [_judge_inputs(item) for item in items]
+    prechecks = [_precheck_item(item, *inp, config) for item, inp in zip(items, inputs)]
+    # rule-decided items stay out of the batch unless shadowed
+    to_judge = [i for i, (pre, shadow) in enumerate(prechecks) if pre is None or shadow]
+    raws = dict(zip(to_judge, auditor.evaluate_batch([inputs[i] for i in to_judge]) if to_judge else []))
+
+    out = []
+    for i, ((query, agent_response, docs), (pre, _)) in enumerate(zip(inputs, prechecks)):
+        if pre is None:
+            out.append(_scored_record(raws[i], query, agent_response, docs, config, auditor))
+        else:
+            out.append(_scored_record(pre, query, agent_response, docs, config, auditor, shadow_audit=raws.get(i)))
+    return out
+
+
+def _reference_answer(item: Dict[str, Any]) -> Optional[str]:
+    """
+    Expected answer to compare a response with. The dataset `output` only
+    counts when the response being judged came from elsewhere (otherwise
+    _judge_inputs is scoring `output` itself).
+    """
+    if not any(item.get(k) for k in ("agent_response", "response", "answer")):
+        return None
+    ref = item.get("reference_answer") or item.get("expected_output") or item.get("output")
+    return ref if isinstance(ref, str) else None
+
+
+def _precheck_item(item: Dict[str, Any], query: str, agent_response: str, ground_truth_docs: List[str],
+                   config: Dict[str, Any]):
+    """
+    (rule verdict or None, shadow): shadow = also ask the LLM, to measure
+    the rules' agreement with it. Disabled with config.precheck = false.
+    """
+    if not config.get("precheck", DEFAULT_PRECHECK):
+        return None, False
+    pre = precheck(agent_response, ground_truth_docs, _reference_answer(item),
+                   rules=config.get("precheck_rules") or RULES)
+    if pre is None:
+        return None, False
+    rate = config.get("precheck_shadow_rate")
+    rate = DEFAULT_SHADOW_RATE if rate is None else float(rate)
+    return pre, shadowed(str(item.get("id") or query), rate)
+
+
+def _judge_inputs(item: Dict[str, Any]):
+    """
+    (query, agent_response, ground_truth_docs) of an item, whatever its schema.
+    """
+    # ---- 1) Extract fields robustly (dataset schema may vary) ----
+    query = _item_query(item)
 
     agent_response = (
         item.get("agent_response")
@@ -90,21 +243,14 @@ def _score_with_traffic_light(item: Dict[str, Any], config: Dict[str, Any]) -> D
         ground_truth_docs = [json.dumps(gt, ensure_ascii=False)]
     else:
         ground_truth_docs = [str(gt)]
+    return query, agent_response, ground_truth_docs
 
-    # Optional: model name override
-    model_name = config.get("audit_model") or config.get("model_name") or "glm-4-flash"
-    enable_triples = bool(config.get("enable_triples", False))
 
-    # ---- 2) Call your auditor ----
-    from .traffic_light_eval import TrafficLightAuditor  # this matches your file/class
-
-    auditor = TrafficLightAuditor(model_name=model_name)
-
-    raw = auditor.evaluate_signal(
-        query=query,
-        agent_response=agent_response,
-        ground_truth_docs=ground_truth_docs,
-    )
+def _scored_record(raw: Any, query: str, agent_response: str, ground_truth_docs: List[str], config: Dict[str, Any],
+                   auditor: Any, shadow_audit: Any = None) -> Dict[str, Any]:
+    enable_triples = bool(config.get("enable_triples", False))
+    if enable_triples and auditor is None:
+        auditor = _make_auditor(config)
 
     # raw expected: {"signal": "GREEN/YELLOW/RED", "reason": "...", "score": 0-1}
     signal = (raw.get("signal") or "RED").upper()
@@ -123,8 +269,14 @@ def _score_with_traffic_light(item: Dict[str, Any], config: Dict[str, Any]) -> D
     # process_score: green>yellow>red
     process_score = {"GREEN": 1.0, "YELLOW": 0.6, "RED": 0.0}[signal]
 
-    # citation_score: if YELLOW often indicates missing/vague support => lower
+    # citation_score: share of cited statutes found in the statute table / ground truth;
+    # when nothing checkable is cited, fall back to the signal (YELLOW often means missing/vague support)
+    citations = None
     citation_score = {"GREEN": 1.0, "YELLOW": 0.3, "RED": 0.0}[signal]
+    if config.get("citation_check", DEFAULT_CITATION_CHECK):
+        citations = validate_citations(agent_response, ground_truth_docs)
+        if citations["score"] is not None:
+            citation_score = citations["score"]
 
     # safety_score: default 1.0 (can add rules later)
     safety_score = 1.0
@@ -148,7 +300,12 @@ def _score_with_traffic_light(item: Dict[str, Any], config: Dict[str, Any]) -> D
         "raw_audit": raw,
         "query": query,
         "agent_response": agent_response,
+        "decided_by": raw.get("decided_by") or "llm",
     }
+    if citations is not None:
+        out["citations"] = citations
+    if shadow_audit is not None:
+        out["shadow_audit"] = shadow_audit  # the LLM's verdict on a rule-decided item
     if enable_triples:
         out["triples"] = triples
 
@@ -172,32 +329,258 @@ def _iter_dataset(dataset_path: str, max_items: Optional[int]) -> Iterable[Dict[
                     continue
                 yield json.loads(line)
     else:
-        with open(dataset_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        # incremental: items are parsed as the file is scanned, never the whole list at once
+        reader = JsonArrayReader(dataset_path, keys=("items",))
+        for item in reader.iter_range(0, max_items):
+            if isinstance(item, dict):
+                yield item
 
-        if isinstance(data, dict) and "items" in data and isinstance(data["items"], list):
-            data = data["items"]
 
-        if not isinstance(data, list):
-            raise ValueError("dataset json must be a list, or a dict with key 'items' as list")
+# -----------------------------
+# Concurrent scoring
+# -----------------------------
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_ITEM_TIMEOUT = 120.0  # seconds per item; None/0 disables
+PARTICIPANT_BUDGET_SHARE = 0.75  # of item_timeout for the participant call incl. retries; the rest is for judging
+DEFAULT_JUDGE_BATCH_SIZE = int(os.getenv("JUDGE_BATCH_SIZE", "1"))  # items per judge prompt; 1 = one call per item
+DEFAULT_PRECHECK = os.getenv("JUDGE_PRECHECK", "1") != "0"  # rule-based pre-check before the LLM judge
+DEFAULT_CITATION_CHECK = os.getenv("CITATION_CHECK", "1") != "0"  # citation_score from src/citations.py
 
-        for i, item in enumerate(data):
-            if max_items is not None and i >= max_items:
-                break
-            if isinstance(item, dict):
-                yield item
+
+def _failed_record(item: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    """
+    Record for an item whose scoring timed out or raised.
+    Shaped like a normal scored record (RED, zero scores) so aggregation stays uniform.
+    """
+    raw = {"signal": "RED", "reason": reason, "score": 0}
+    return {
+        "traffic_light": "RED",
+        "success_score": 0.0,
+        "process_score": 0.0,
+        "citation_score": 0.0,
+        "safety_score": 1.0,
+        "notes": reason,
+        "raw_audit": raw,
+        "query": _item_query(item),
+        "agent_response": "",
+        "error": reason,
+    }
+
+
+async def _score_items(
+    items: Iterable[Dict[str, Any]],
+    config: Dict[str, Any],
+    emit,
+    auditor: Any = None,
+    on_scored: Optional[Callable[[Dict[str, Any]], None]] = None,
+    prepare: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None,
+    usage: Optional[UsageAccumulator] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Score items with at most `max_concurrency` judge calls in flight.
+
+    The auditor is synchronous (blocking HTTP), so each call runs in a dedicated
+    thread pool; the event loop stays free to answer /health and agent-card probes.
+    Returns records sorted by `index`, independent of completion order;
+    `on_scored` sees each record as soon as it completes. `prepare` (e.g.
+    asking the participant for its answer) runs first, inside the same
+    per-item timeout.
+
+    Every record gets `latency_ms` (wall time of the item) and `llm_usage`
+    (the judge's LLM calls for that item); those calls also roll up into
+    `usage` when given. With config.judge_batch_size > 1, items are judged
+    in batches; their records share the batch's latency and llm_usage
+    (marked with `shared_by`).
+    """
+    max_concurrency = max(1, int(config.get("max_concurrency") or DEFAULT_MAX_CONCURRENCY))
+    item_timeout = config.get("item_timeout", DEFAULT_ITEM_TIMEOUT)
+    item_timeout = float(item_timeout) if item_timeout else None
+    batch_size = max(1, int(config.get("judge_batch_size") or DEFAULT_JUDGE_BATCH_SIZE))
+    if auditor is None:
+        auditor = _make_auditor(config)
+
+    loop = asyncio.get_running_loop()
+    it = iter(enumerate(items))
+    results: List[Dict[str, Any]] = []
+
+    async def worker(pool: ThreadPoolExecutor) -> None:
+        # Workers pull from a shared iterator, so at most `max_concurrency`
+        # items are materialized at a time.
+        for idx, item in it:
+            emit("progress", "scoring_item", {"index": idx})
+
+            item_usage = UsageAccumulator(parent=usage)
+
+            def judge(item: Dict[str, Any]) -> Dict[str, Any]:
+                # runs in the pool thread: run_in_executor doesn't carry contextvars over
+                with usage_scope(item_usage), llm_caller("auditor"):
+                    return _score_with_traffic_light(item, config, auditor)
+
+            async def one(item: Dict[str, Any]) -> Dict[str, Any]:
+                if prepare is not None:
+                    item = await prepare(item)
+                return await loop.run_in_executor(pool, judge, item)
+
+            t0 = time.perf_counter()
+            try:
+                scored = await asyncio.wait_for(one(item), timeout=item_timeout)
+            except asyncio.TimeoutError:
+                emit("warning", "item_timeout", {"index": idx, "timeout": item_timeout})
+                scored = _failed_record(item, f"Timeout after {item_timeout}s")
+            except Exception as e:
+                emit("warning", "item_failed", {"index": idx, "error": str(e)})
+                scored = _failed_record(item, f"{type(e).__name__}: {e}")
+            scored["index"] = idx
+            scored["latency_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+            scored["llm_usage"] = item_usage.summary()
+            results.append(scored)
+            if on_scored is not None:
+                on_scored(scored)
+
+    async def batch_worker(pool: ThreadPoolExecutor) -> None:
+        # Same as worker, but `batch_size` items share one judge prompt. Each
+        # item is prepared under its own timeout; the judge call gets
+        # item_timeout per item in the batch (fallbacks are judged one by one).
+        while True:
+            batch = list(itertools.islice(it, batch_size))
+            if not batch:
+                return
+            t0 = time.perf_counter()
+            done: Dict[int, Dict[str, Any]] = {}
+            ready: List[Any] = []
+            for idx, item in batch:
+                emit("progress", "scoring_item", {"index": idx})
+            if prepare is not None:
+                prepared = await asyncio.gather(
+                    *(asyncio.wait_for(prepare(item), timeout=item_timeout) for _, item in batch),
+                    return_exceptions=True,
+                )
+            else:
+                prepared = [item for _, item in batch]
+            for (idx, item), p in zip(batch, prepared):
+                if isinstance(p, asyncio.TimeoutError):
+                    emit("warning", "item_timeout", {"index": idx, "timeout": item_timeout})
+                    done[idx] = _failed_record(item, f"Timeout after {item_timeout}s")
+                elif isinstance(p, BaseException):
+                    emit("warning", "item_failed", {"index": idx, "error": str(p)})
+                    done[idx] = _failed_record(item, f"{type(p).__name__}: {p}")
+                else:
+                    ready.append((idx, p))
+
+            batch_usage = UsageAccumulator(parent=usage)
+
+            def judge(ready_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+                with usage_scope(batch_usage), llm_caller("auditor"):
+                    return _score_batch_with_traffic_light(ready_items, config, auditor)
+
+            if ready:
+                timeout = item_timeout * len(ready) if item_timeout else None
+                try:
+                    scored_list = await asyncio.wait_for(
+                        loop.run_in_executor(pool, judge, [item for _, item in ready]), timeout=timeout)
+                    for (idx, _), scored in zip(ready, scored_list):
+                        done[idx] = scored
+                except asyncio.TimeoutError:
+                    for idx, item in ready:
+                        emit("warning", "item_timeout", {"index": idx, "timeout": item_timeout})
+                        done[idx] = _failed_record(item, f"Timeout after {timeout}s")
+                except Exception as e:
+                    for idx, item in ready:
+                        emit("warning", "item_failed", {"index": idx, "error": str(e)})
+                        done[idx] = _failed_record(item, f"{type(e).__name__}: {e}")
+
+            latency_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+            usage_summary = batch_usage.summary()
+            usage_summary["shared_by"] = max(1, len(ready))  # one batch's calls, shared by its items
+            for idx, _ in batch:
+                scored = done[idx]
+                scored["index"] = idx
+                scored["latency_ms"] = latency_ms
+                scored["llm_usage"] = usage_summary
+                results.append(scored)
+                if on_scored is not None:
+                    on_scored(scored)
+
+    # A timed-out call keeps its thread until the HTTP request returns; don't block on it.
+    pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="score")
+    try:
+        run_worker = batch_worker if batch_size > 1 else worker
+        await asyncio.gather(*(run_worker(pool) for _ in range(max_concurrency)))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    results.sort(key=lambda r: r["index"])
+    return results
+
+
+# -----------------------------
+# Aggregation
+# -----------------------------
+DEFAULT_SNAPSHOT_EVERY = 10  # items between aggregate_snapshot updates
+
+
+def _new_totals() -> Dict[str, Any]:
+    return {
+        "n": 0,
+        "counts": {"GREEN": 0, "YELLOW": 0, "RED": 0},
+        "sums": {"success": 0.0, "process": 0.0, "citation": 0.0, "safety": 0.0},
+    }
+
+
+def _fold(totals: Dict[str, Any], scored: Dict[str, Any]) -> None:
+    counts, sums = totals["counts"], totals["sums"]
+    tl = scored["traffic_light"]
+    counts[tl] = counts.get(tl, 0) + 1
+    sums["success"] += float(scored.get("success_score", 0.0))
+    sums["process"] += float(scored.get("process_score", 0.0))
+    sums["citation"] += float(scored.get("citation_score", 0.0))
+    sums["safety"] += float(scored.get("safety_score", 0.0))
+    totals["n"] += 1
+
+
+def _summarize(totals: Dict[str, Any]) -> Dict[str, Any]:
+    counts, sums = totals["counts"], totals["sums"]
+    n = max(totals["n"], 1)
+    total_lights = counts.get("GREEN", 0) + counts.get("YELLOW", 0) + counts.get("RED", 0)
+    den = total_lights if total_lights > 0 else 1  # avoid division by zero
+    traffic_light_ratios = {
+        "GREEN": counts.get("GREEN", 0) / den,
+        "YELLOW": counts.get("YELLOW", 0) / den,
+        "RED": counts.get("RED", 0) / den,
+    }
+    return {
+        "n": totals["n"],
+        "avg_success": sums["success"] / n,
+        "avg_process": sums["process"] / n,
+        "avg_citation": sums["citation"] / n,
+        "avg_safety": sums["safety"] / n,
+
+        # original
+        "traffic_light_counts": dict(counts),
+        # new
+        "traffic_light_total": total_lights,
+        "traffic_light_ratios": traffic_light_ratios,          # 0~1
+        "traffic_light_green_pct": round(traffic_light_ratios["GREEN"] * 100.0, 2),  # 0~100
+    }
 
 
 # -----------------------------
 # Core assessment runner
 # -----------------------------
-async def run_assessment(payload: Dict[str, Any]) -> Dict[str, Any]:
+async def run_assessment(
+    payload: Dict[str, Any],
+    on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
     """
     Aligns with tutorial:
     {
       "participants": { "<role>": "<endpoint_url>" },
       "config": { ... }
     }
+
+    `on_update` is called (on the event loop) with every TaskUpdate as it is
+    emitted, including one "item_scored" per item and periodic
+    "aggregate_snapshot" partial summaries; used for SSE streaming.
     """
     task_id = payload.get("task_id") or _make_task_id()
     participants = payload.get("participants")
@@ -209,59 +592,91 @@ async def run_assessment(payload: Dict[str, Any]) -> Dict[str, Any]:
     dataset_path = config.get("dataset_path", "data/dataset.json")
     max_items = config.get("max_items", 50)
     emit_updates = bool(config.get("emit_updates", True))
+    snapshot_every = max(1, int(config.get("snapshot_every") or DEFAULT_SNAPSHOT_EVERY))
 
     updates: List[Dict[str, Any]] = []
 
     def emit(t: str, msg: str, data: Optional[Dict[str, Any]] = None):
-        if not emit_updates:
+        if not emit_updates and on_update is None:
             return
-        updates.append(TaskUpdate(task_id, t, msg, data, _now()).__dict__)
+        update = TaskUpdate(task_id, t, msg, data, _now()).__dict__
+        if emit_updates:
+            updates.append(update)
+        if on_update is not None:
+            on_update(update)
 
     emit("log", "assessment_started", {"participants": list(participants.keys())})
     emit("log", "loading_dataset", {"dataset_path": dataset_path, "max_items": max_items})
 
     per_item: List[Dict[str, Any]] = []
-    counts = {"GREEN": 0, "YELLOW": 0, "RED": 0}
-    sums = {"success": 0.0, "process": 0.0, "citation": 0.0, "safety": 0.0}
+    judge_cache: Optional[JudgeCache] = None
+    participant_client: Optional[ParticipantClient] = None
+    running = _new_totals()  # in completion order, for partial snapshots only
+    llm_usage = UsageAccumulator(keep_latencies=True)  # every judge call of the run
+
+    def on_scored(scored: Dict[str, Any]) -> None:
+        _fold(running, scored)
+        emit("progress", "item_scored", {
+            "index": scored["index"],
+            "traffic_light": scored["traffic_light"],
+            "success_score": scored.get("success_score", 0.0),
+            "notes": scored.get("notes", ""),
+        })
+        if running["n"] % snapshot_every == 0:
+            emit("progress", "aggregate_snapshot", _summarize(running))
 
     try:
-        for idx, item in enumerate(_iter_dataset(dataset_path, max_items)):
-            emit("progress", "scoring_item", {"index": idx})
-
-            scored = _score_with_traffic_light(item, config)
-            scored["index"] = idx
-            per_item.append(scored)
-
-            tl = scored["traffic_light"]
-            counts[tl] = counts.get(tl, 0) + 1
-            sums["success"] += float(scored.get("success_score", 0.0))
-            sums["process"] += float(scored.get("process_score", 0.0))
-            sums["citation"] += float(scored.get("citation_score", 0.0))
-            sums["safety"] += float(scored.get("safety_score", 0.0))
-
-        n = max(len(per_item), 1)
-        total_lights = counts.get("GREEN", 0) + counts.get("YELLOW", 0) + counts.get("RED", 0)
-        den = total_lights if total_lights > 0 else 1  # avoid division by zero
-        traffic_light_ratios = {
-            "GREEN": counts.get("GREEN", 0) / den,
-            "YELLOW": counts.get("YELLOW", 0) / den,
-            "RED": counts.get("RED", 0) / den,
-        }
-        summary = {
-             "n": len(per_item),
-             "avg_success": sums["success"] / n,
-             "avg_process": sums["process"] / n,
-             "avg_citation": sums["citation"] / n,
-             "avg_safety": sums["safety"] / n,
-
-             # original
-            "traffic_light_counts": counts,
-            # new
-            "traffic_light_total": total_lights,
-            "traffic_light_ratios": traffic_light_ratios,          # 0~1
-            "traffic_light_green_pct": round(traffic_light_ratios["GREEN"] * 100.0, 2),  # 0~100
+        emit("log", "scoring_started", {
+            "max_concurrency": config.get("max_concurrency") or DEFAULT_MAX_CONCURRENCY,
+            "item_timeout": config.get("item_timeout", DEFAULT_ITEM_TIMEOUT),
+        })
+        # one auditor (and hence one pooled LLM client) for the whole run
+        judge_cache = _make_judge_cache(config)
+        auditor = _make_auditor(config, judge_cache)
+
+        prepare = None
+        participant_client, role = _make_participant_client(participants, config)
+        if participant_client is not None:
+            emit("log", "querying_participant", {"role": role, "protocol": participant_client.protocol})
+
+            async def prepare(item: Dict[str, Any]) -> Dict[str, Any]:
+                # score the participant's live answer instead of the one stored in the dataset
+                answer = await participant_client.ask(role, _item_query(item))
+                if not str(answer or "").strip():
+                    # an empty answer must not fall through to the dataset's gold output in _judge_inputs
+                    raise ParticipantError(f"{role}: empty answer")
+                return {**item, "agent_response": answer}
+
+        per_item = await _score_items(
+            _iter_dataset(dataset_path, max_items), config, emit, auditor, on_scored, prepare, llm_usage
+        )
+
+        # Final summary folds in index order so float sums are run-to-run stable.
+        totals = _new_totals()
+        for scored in per_item:
+            _fold(totals, scored)
+        summary = _summarize(totals)
+        summary["judge_cache"] = judge_cache.stats() if judge_cache else {"enabled": False}
+        precheck_stats = new_precheck_stats()
+        citation_stats = new_citation_stats()
+        for scored in per_item:
+            fold_citations(citation_stats, scored.get("citations"))
+            shadow = scored.get("shadow_audit")
+            llm_signal = str(shadow.get("signal") or "").upper() if isinstance(shadow, dict) else None
+            fold_precheck(precheck_stats, scored.get("decided_by"), llm_signal, scored.get("traffic_light"))
+        summary["precheck"] = precheck_summary(precheck_stats)
+        summary["citations"] = citation_summary(citation_stats)
+        summary["judge_batch"] = {
+            "batch_size": max(1, int(config.get("judge_batch_size") or DEFAULT_JUDGE_BATCH_SIZE)),
+            **getattr(auditor, "batch_stats", {}),
         }
-        
+        if participant_client is not None:
+            summary["participant_latency"] = participant_client.stats()
+        summary["llm_usage"] = llm_usage.summary()
+        summary["llm_usage"]["per_item"] = summarize_items(
+            [scored.get("llm_usage") for scored in per_item],
+            [scored["latency_ms"] for scored in per_item if "latency_ms" in scored],
+        )
 
         emit("log", "assessment_complete", summary)
 
@@ -291,3 +706,8 @@ async def run_assessment(payload: Dict[str, Any]) -> Dict[str, Any]:
                 _artifact("error.json", {"error": str(e)}),
             ],
         }
+    finally:
+        if judge_cache is not None:
+            judge_cache.close()
+        if participant_client is not None:
+            await participant_client.aclose()
@@ -1,23 +1,119 @@
-# brain 实现 Voyage 3 Embedding 和 HyDE 逻辑，用于生成 "Ground Truth" 上下文。
+# brain 实现 Embedding 和 HyDE 逻辑，用于生成 "Ground Truth" 上下文。
+# 语料向量预先算好存成本地 mmap 索引（scripts/ingest_data.py），检索时不需要网络：
+# 默认用本地 hashed n-gram embedding；设置 GREEN_EMBEDDER=voyage-3-large 可切回 Voyage。
+# 远程 embedder 的结果经过 EmbeddingCache 落盘，重复 ingest / 重复审计同一问题时不再付费调用。
 import os
-import voyageai
-import chromadb
-from typing import List, Dict
+from typing import Any, Dict, List, Optional
 
-# 假设你已经有了 Voyage API Key
+import numpy as np
+
+from .embedding_cache import EmbeddingCache, make_key
+from .embeddings import Embedder, get_embedder
+from .lexical_index import LexicalIndex, rrf_fuse
+from .vector_index import VectorIndex
+
+# 如果使用 Voyage，需要 API Key
 # os.environ["VOYAGE_API_KEY"] = "your_key_here"
 
+DEFAULT_INDEX_ROOT = os.getenv("GREEN_INDEX_ROOT", "./green_agent_db")
+# Matryoshka 两阶段检索：前 256 维粗排全库，top-100 候选用全维精排；设为 0 则单阶段精确检索
+DEFAULT_PREFILTER_DIMS = int(os.getenv("GREEN_PREFILTER_DIMS", "256"))
+DEFAULT_PREFILTER_CANDIDATES = int(os.getenv("GREEN_PREFILTER_CANDIDATES", "100"))
+# hybrid = BM25 + 向量做 RRF 融合（词法索引不存在时自动退回 dense）；也可设为 dense / lexical
+DEFAULT_RETRIEVAL_MODE = os.getenv("GREEN_RETRIEVAL", "hybrid")
+DEFAULT_FUSION_DEPTH = int(os.getenv("GREEN_FUSION_DEPTH", "50"))
+
+
 class GreenRAGEngine:
-    def __init__(self, collection_name="legal_benchmark_v1"):
-        self.vo_client = voyageai.Client()
-        self.db_client = chromadb.PersistentClient(path="./green_agent_db")
-        self.collection = self.db_client.get_or_create_collection(name=collection_name)
-        
-    def embed_query(self, text: str, model="voyage-3-large") -> List[float]:
+    def __init__(self, collection_name="legal_benchmark_v1", index_root: str = DEFAULT_INDEX_ROOT,
+                 embedder: Optional[Embedder] = None, cache: Optional[EmbeddingCache] = None,
+                 use_cache: Optional[bool] = None, prefilter_dims: int = DEFAULT_PREFILTER_DIMS,
+                 prefilter_candidates: int = DEFAULT_PREFILTER_CANDIDATES,
+                 retrieval_mode: str = DEFAULT_RETRIEVAL_MODE, fusion_depth: int = DEFAULT_FUSION_DEPTH):
+        if retrieval_mode not in ("hybrid", "dense", "lexical"):
+            raise ValueError(f"unknown retrieval mode: {retrieval_mode}")
+        self.index = VectorIndex(os.path.join(index_root, collection_name))
+        self.lexical = LexicalIndex(self.index.path)
+        # 查询必须和建索引时用同一个 embedder
+        self.embedder = embedder or get_embedder(self.index.embedder)
+        # 默认只给远程 embedder 开缓存；本地 hashing 重算比查 sqlite 还快
+        if use_cache is None:
+            use_cache = os.getenv("EMBED_CACHE", "1") != "0" and self.embedder.cacheable
+        self.cache = cache if cache is not None else (EmbeddingCache() if use_cache else None)
+        self.prefilter_dims = prefilter_dims
+        self.prefilter_candidates = prefilter_candidates
+        self.retrieval_mode = retrieval_mode
+        self.fusion_depth = fusion_depth
+
+    def embed_many(self, texts: List[str], input_type: str = "document",
+                   batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        批量 embedding：先查缓存，未命中的文本去重后按 provider 上限分批调用，结果写回缓存
+        """
+        out = np.zeros((len(texts), self.embedder.dim), dtype=np.float32)
+        if not texts:
+            return out
+        batch_size = min(batch_size or self.embedder.max_batch, self.embedder.max_batch)
+
+        keys = [make_key(self.embedder.name, input_type, t) for t in texts]
+        cached = self.cache.get_many(keys) if self.cache is not None else [None] * len(texts)
+
+        # 同一批里的重复文本只算一次
+        pending: Dict[bytes, List[int]] = {}
+        for i, (key, vec) in enumerate(zip(keys, cached)):
+            if vec is None:
+                pending.setdefault(key, []).append(i)
+            else:
+                out[i] = vec
+
+        todo = list(pending)
+        for i in range(0, len(todo), batch_size):
+            batch_keys = todo[i:i + batch_size]
+            vecs = self.embedder.embed([texts[pending[k][0]] for k in batch_keys], input_type=input_type)
+            for key, vec in zip(batch_keys, vecs):
+                out[pending[key]] = vec
+            if self.cache is not None:
+                self.cache.put_many(batch_keys, vecs)
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        生成查询向量（默认本地 embedder，不走网络）
+        """
+        return self.embed_many([text], input_type="query")[0].tolist()
+
+    def add_documents(self, documents: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+                      ids: Optional[List[str]] = None, batch_size: Optional[int] = None) -> None:
         """
-        使用 Voyage-3-Large 生成高质量 Embedding
+        分批 embedding 后追加写入本地索引
         """
-        return self.vo_client.embed([text], model=model, input_type="query").embeddings[0]
+        ids = ids or [str(len(self.index) + i) for i in range(len(documents))]
+        metadatas = metadatas or [{} for _ in documents]
+        batch_size = batch_size or self.embedder.max_batch
+        for i in range(0, len(documents), batch_size):
+            docs = documents[i:i + batch_size]
+            vecs = self.embed_many(docs, input_type="document", batch_size=batch_size)
+            self.index.append(vecs, ids[i:i + batch_size], docs, metadatas[i:i + batch_size],
+                              embedder=self.embedder.name)
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
+
+    def build_lexical_index(self) -> LexicalIndex:
+        """
+        基于当前向量索引里的全部文档一次性构建 BM25 倒排索引（ingest 完成后调用）
+        """
+        self.lexical = LexicalIndex.build(self.index.path, (r["document"] for r in self.index.iter_records()))
+        return self.lexical
+
+    def reset(self) -> None:
+        """
+        清空索引（重新 ingest 前调用）
+        """
+        self.index.clear()
+        LexicalIndex.remove(self.index.path)
+        self.lexical = LexicalIndex(self.index.path)
 
     def hyde_query_expansion(self, query: str, llm_response_snippet: str = "") -> str:
         """
@@ -27,25 +123,37 @@ class GreenRAGEngine:
         """
         prompt = f"Based on the legal query: '{query}', generate a hypothetical legal clause that would answer this."
         # 这里可以使用简单的 LLM 调用生成假设性文档
-        # hypothetical_doc = call_llm(prompt) 
+        # hypothetical_doc = call_llm(prompt)
         # return hypothetical_doc
         return query + " " + llm_response_snippet # 简化版：Query + 初步上下文
 
-    def retrieve_ground_truth(self, query: str, top_k=5) -> List[Dict]:
+    def retrieve_ground_truth(self, query: str, top_k=5) -> List[str]:
         """
         [Evaluation Standard]
         Green Agent 检索出 '标准答案上下文'，用于对比 Purple Agent 是否产生幻觉。
         """
         # 1. 动态查询扩展
         expanded_query = self.hyde_query_expansion(query)
-        
-        # 2. Embedding
-        query_vec = self.embed_query(expanded_query)
-        
-        # 3. Retrieval
-        results = self.collection.query(
-            query_embeddings=[query_vec],
-            n_results=top_k
-        )
-        
-        return results['documents'][0] # 返回检索到的真实法条文本
\ No newline at end of file
+
+        # 词法索引和向量索引行号一一对应；不一致（比如之后又 append 过）就不用它
+        lexical_ok = len(self.lexical) > 0 and len(self.lexical) == len(self.index)
+        mode = self.retrieval_mode if lexical_ok else "dense"
+        depth = max(top_k, self.fusion_depth) if mode == "hybrid" else top_k
+
+        # 2. 词法检索：案号、法条号等精确字符串走 BM25
+        lexical_rows = self.lexical.search(expanded_query, top_k=depth)[0] if mode != "dense" else []
+
+        # 3. Embedding + 向量检索（截断维度粗排 + 全维精排，都是 mmap 矩阵上的向量化运算）
+        dense_rows = []
+        if mode != "lexical":
+            query_vec = self.embed_many([expanded_query], input_type="query")[0]
+            dense_rows, _ = self.index.search(query_vec, top_k=depth, prefilter_dims=self.prefilter_dims,
+                                              candidates=max(self.prefilter_candidates, depth))
+
+        # 4. RRF 融合
+        if mode == "hybrid":
+            rows = rrf_fuse([lexical_rows, dense_rows], top_k=top_k)
+        else:
+            rows = lexical_rows if mode == "lexical" else dense_rows
+
+        return [r["document"] for r in self.index.records(rows)] # 返回检索到的真实法条文本
@@ -0,0 +1,247 @@
+# src/json_scan.py
+# 容错的 JSON 抽取：一遍扫描找到第一个括号配平的对象 / 数组，扫描时识别字符串和转义（字符串里的 { } 不算括号），
+# 顺手把模型常见的“不规范 JSON”改写成合法 JSON 再交给 json.loads 一次解析：
+#   - 字符串外的全角标点 ｛｝［］：， 以及 “…” ‘…’ '…' 引号
+#   - Python 字面量 True / False / None，对象 / 数组末尾多余的逗号
+#   - 输出被 max_tokens 截断时补齐未闭合的字符串和括号
+# 不做任何全局字符替换，所以字符串内容（don't、引号、括号）原样保留。
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+_OPENERS = {"{": "}", "[": "]", "｛": "}", "［": "]"}
+_CLOSERS = {"}": "}", "]": "]", "｝": "}", "］": "]"}
+# 字符串外的全角结构符号
+_PUNCT = {"：": ":", "，": ","}
+# 字符串起始引号 -> 结束引号
+_QUOTES = {'"': '"', "'": "'", "“": "”", "‘": "’"}
+_LITERALS = {"True": "true", "False": "false", "None": "null", "true": "true", "false": "false", "null": "null"}
+
+_FENCE = re.compile(r"```[ \t]*([A-Za-z]*)[ \t]*\r?\n?(.*?)```", re.DOTALL)
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_NUMBER = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+# 字符串内部：一次跳到下一个需要处理的字符（反斜杠、换行、双引号、结束引号），中间整段照抄
+_STRING_STOP = {q: re.compile("[\\\\\n\"" + re.escape(q) + "]") for q in set(_QUOTES.values())}
+
+
+def fenced_blocks(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    (language tag, body) of each ``` fenced block, in order.
+    """
+    for m in _FENCE.finditer(text):
+        yield m.group(1).lower(), m.group(2)
+
+
+def _close_truncated(out: List[str], stack: List[str], string_at: Optional[int]) -> Optional[str]:
+    # 截断的输出：闭合字符串（截断在 key 里时整个丢掉）, 去掉悬空的 "key": / 逗号, 再补齐括号
+    text = "".join(out)
+    if string_at is not None:
+        before = "".join(out[:string_at]).rstrip()
+        if stack[-1] == "}" and before[-1:] in "{,":
+            text = before
+        else:
+            text += '"'
+    text = text.rstrip()
+    while text and text[-1] in ",:":
+        if text[-1] == ":":
+            # 去掉没有值的 key
+            text = text[:-1].rstrip()
+            if text.endswith('"'):
+                j = len(text) - 2
+                while j >= 0 and not (text[j] == '"' and (j == 0 or text[j - 1] != "\\")):
+                    j -= 1
+                text = text[:max(j, 0)].rstrip()
+        else:
+            text = text[:-1].rstrip()
+    if len(text) <= 1:
+        return None  # 只剩一个左括号
+    return text + "".join(reversed(stack))
+
+
+def _scan_from(text: str, start: int, repair: bool) -> Tuple[Optional[str], int]:
+    """
+    Normalized JSON text of the balanced value opening at `start`, and the
+    index just past it; (None, index where scanning stopped) when the
+    candidate is not a well-formed structure.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    i, n = start, len(text)
+    quote: Optional[str] = None  # expected closing quote while inside a string
+    string_at = 0  # len(out) where the current string started
+    while i < n:
+        if quote is not None:
+            m = _STRING_STOP[quote].search(text, i)
+            if m is None:
+                out.append(text[i:])
+                i = n
+                break
+            if m.start() > i:
+                out.append(text[i:m.start()])
+                i = m.start()
+            c = text[i]
+            if c == "\\" and i + 1 < n:
+                nxt = text[i + 1]
+                if quote == "'" and nxt == "'":
+                    out.append("'")
+                else:
+                    out.append(c + nxt)
+                i += 2
+                continue
+            if c == quote:
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')  # 单引号 / 中文引号字符串里的双引号
+            elif c == "\n":
+                out.append("\\n")
+            else:
+                out.append(c)
+            i += 1
+            continue
+
+        c = text[i]
+        if c in _QUOTES:
+            quote = _QUOTES[c]
+            string_at = len(out)
+            out.append('"')
+        elif c in _OPENERS:
+            stack.append(_OPENERS[c])
+            out.append("{" if _OPENERS[c] == "}" else "[")
+        elif c in _CLOSERS:
+            closer = _CLOSERS[c]
+            if not stack or stack[-1] != closer:
+                return None, i
+            stack.pop()
+            # 去掉末尾多余的逗号
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(closer)
+            if not stack:
+                return "".join(out), i + 1
+        elif c in _PUNCT:
+            out.append(_PUNCT[c])
+        elif c.isalpha() or c == "_":
+            m = _WORD.match(text, i)
+            if m is None:
+                # 字符串外的非 ASCII 文字（说明性废话）: 不是 JSON
+                return None, i
+            word = m.group(0)
+            lit = _LITERALS.get(word)
+            if lit is None:
+                return None, i
+            out.append(lit)
+            i = m.end()
+            continue
+        elif c == "-" or c == "." or c.isdigit():
+            m = _NUMBER.match(text, i)
+            if m is None:
+                return None, i
+            num = m.group(0)
+            if num.lstrip("-").startswith("."):
+                num = num.replace(".", "0.", 1)
+            if num.endswith("."):
+                num += "0"
+            out.append(num)
+            i = m.end()
+            continue
+        elif c in ",:" or c.isspace():
+            out.append(c)
+        else:
+            return None, i
+        i += 1
+
+    if repair and stack:
+        return _close_truncated(out, stack, string_at if quote is not None else None), n
+    return None, n
+
+
+def _openers(expect: Optional[type]) -> Tuple[str, ...]:
+    if expect is None:
+        return tuple(_OPENERS)
+    if expect is dict:
+        return ("{", "｛")
+    if expect is list:
+        return ("[", "［")
+    raise ValueError(f"expect must be dict, list or None, not {expect!r}")
+
+
+def find_json(text: str, start: int = 0, repair: bool = True, expect: Optional[type] = None,
+              accept: Optional[Callable[[Any], bool]] = None) -> Optional[Tuple[Any, int, int]]:
+    """
+    First balanced JSON object or array in `text` at or after `start`:
+    (value, start, end), or None. With `expect` (dict or list) only values of
+    that type are candidates, so bracketed prose like "第[577]条" before the
+    real object is skipped; `accept` can reject parsed candidates further.
+    Candidates that fail to parse are skipped and the scan resumes where the
+    failed one stopped, so the text is read once.
+    With `repair`, a value cut off at the end of the text is closed.
+    """
+    openers = _openers(expect)
+    n = len(text)
+    i = start
+    while i < n:
+        # 下一个可能的起点
+        j = -1
+        for opener in openers:
+            k = text.find(opener, i)
+            if k != -1 and (j == -1 or k < j):
+                j = k
+        if j == -1:
+            return None
+        candidate, end = _scan_from(text, j, repair)
+        if candidate is not None:
+            try:
+                value = json.loads(candidate, strict=False)
+            except (json.JSONDecodeError, RecursionError):
+                pass
+            else:
+                if accept is None or accept(value):
+                    return value, j, end
+        # 失败的候选已经扫过的部分不再重扫（否则嵌套很深的输入是平方复杂度）
+        i = max(end, j + 1)
+    return None
+
+
+def _find(text: str, repair: bool, expect: Optional[type],
+          accept: Optional[Callable[[Any], bool]]) -> Optional[Tuple[Any, int, int]]:
+    # 快路径：整段本身就是合法的 JSON 对象 / 数组（最常见的情况）时直接交给 json.loads
+    stripped = text.strip()
+    if stripped[:1] in "{[" and stripped[-1:] in "}]":
+        try:
+            value = json.loads(stripped)
+        except (json.JSONDecodeError, RecursionError):
+            pass
+        else:
+            if (expect is None or isinstance(value, expect)) and (accept is None or accept(value)):
+                return value, 0, len(text)
+    return find_json(text, repair=repair, expect=expect, accept=accept)
+
+
+def loads_tolerant(text: str, repair: bool = True, expect: Optional[type] = None,
+                   accept: Optional[Callable[[Any], bool]] = None) -> Any:
+    """
+    Parse the structured part of an LLM response: the first JSON value in a
+    fenced block if there is one, else the first in the whole text, else the
+    whole text as a bare JSON scalar. With `expect` (dict or list) / `accept`
+    only a value of that type / passing the check is returned.
+    Raises json.JSONDecodeError.
+    """
+    text = text or ""
+    for _, body in fenced_blocks(text):
+        found = _find(body, repair, expect, accept)
+        if found is not None:
+            return found[0]
+    found = _find(text, repair, expect, accept)
+    if found is not None:
+        return found[0]
+    if expect is not None or accept is not None:
+        raise json.JSONDecodeError("no matching JSON value found", text, 0)
+    try:
+        return json.loads(text.strip())
+    except RecursionError:
+        raise json.JSONDecodeError("nesting too deep", text, 0) from None
@@ -0,0 +1,113 @@
+# src/judge_cache.py
+# 审计 LLM（judge）结果的持久化缓存：temperature=0 + do_sample=False，同一 prompt 的判决是确定的，
+# 重跑 leaderboard / 续跑审计时直接命中，不再消耗 judge token。
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_PATH = os.getenv("JUDGE_CACHE_PATH", "output/judge_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def make_key(model_name: str, prompt: str) -> str:
+    """
+    Content address of a judge call: sha256 over model + fully rendered prompt.
+    """
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class JudgeCache:
+    """
+    SQLite-backed key/value store with size-bounded LRU eviction.
+
+    One connection is shared by all scoring threads and guarded by a lock;
+    WAL mode lets an offline audit and the server read the same file.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS judge_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS judge_cache_lru ON judge_cache(last_used)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM judge_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM judge_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE judge_cache SET last_used = ? WHERE key = ?", (time.time_ns(), key))
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            now = time.time_ns()
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO judge_cache (key, value, last_used) VALUES (?, ?, ?)",
+                (key, value, now),
+            )
+            if cur.rowcount == 1:
+                self._count += 1
+            else:
+                self._conn.execute(
+                    "UPDATE judge_cache SET value = ?, last_used = ? WHERE key = ?",
+                    (value, now, key),
+                )
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Evict down to 90% of capacity so we don't pay a DELETE on every insert once full.
+        target = int(self.max_entries * 0.9)
+        n = self._count - target
+        self._conn.execute(
+            "DELETE FROM judge_cache WHERE key IN "
+            "(SELECT key FROM judge_cache ORDER BY last_used ASC LIMIT ?)",
+            (n,),
+        )
+        self.evictions += n
+        self._count = target
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
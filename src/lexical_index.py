@@ -0,0 +1,250 @@
+# src/lexical_index.py
+# BM25 词法检索：中文按字二元组切分，数字/字母串整体成词，所以案号（“（2017）粤0306民初3474号”）、
+# 法条号（“第二百六十四条”）这类精确字符串能直接命中，不依赖语义向量。
+# 倒排表一次性构建，落盘后用 mmap 打开；posting list 用 delta + varint 压缩。
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+HEADER = "lex.json"
+TERMS = "lex_terms.bin"  # 按 utf-8 字节序排好的词表，首尾相接
+TERM_OFF = "lex_term_off.npy"  # int64 (V+1)：每个词在 TERMS 中的起点
+POST_OFF = "lex_post_off.npy"  # int64 (V+1)：每个词的 posting 在 POSTINGS 中的起点
+DF = "lex_df.npy"  # int32 (V)
+DOC_LEN = "lex_doc_len.npy"  # int32 (N)：每篇文档的词数
+POSTINGS = "lex_postings.bin"  # varint(doc delta) * df，接着 varint(tf) * df
+
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+
+# CJK 连续段切二元组；数字 / 字母串保留整体
+_RUNS = re.compile(r"[㐀-鿿豈-﫿]+|[0-9a-z]+")
+_CJK = re.compile(r"[㐀-鿿豈-﫿]")
+# 全角数字 / 字母 -> 半角（数据里 “２０１７” 和 “2017” 混用）
+_FULLWIDTH = {c: c - 0xFEE0 for c in range(0xFF10, 0xFF5B) if chr(c - 0xFEE0).isalnum()}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Character bigrams over CJK runs (a single-char run is kept as a unigram),
+    whole tokens for ASCII letter/digit runs. Full-width forms are folded first.
+    """
+    text = (text or "").translate(_FULLWIDTH).lower()
+    out: List[str] = []
+    for m in _RUNS.finditer(text):
+        run = m.group()
+        if _CJK.match(run):
+            if len(run) == 1:
+                out.append(run)
+            else:
+                out.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            out.append(run)
+    return out
+
+
+# -----------------------------
+# varint codec
+# -----------------------------
+def _encode_varints(values: Sequence[int]) -> bytes:
+    out = bytearray()
+    for v in values:
+        while v >= 0x80:
+            out.append((v & 0x7F) | 0x80)
+            v >>= 7
+        out.append(v)
+    return bytes(out)
+
+
+def _decode_varints(buf) -> np.ndarray:
+    """
+    Vectorized LEB128 decode of a whole posting block.
+    """
+    arr = np.frombuffer(buf, dtype=np.uint8)
+    if not len(arr):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(arr < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts + 1
+    if lengths.max() == 1:
+        return arr[ends].astype(np.int64)
+    # bit shift of every byte inside its own varint
+    pos = np.arange(len(arr)) - np.repeat(starts, lengths)
+    payload = (arr & 0x7F).astype(np.int64) << (7 * pos)
+    return np.add.reduceat(payload, starts)
+
+
+class LexicalIndex:
+    """
+    Read-only BM25 index in the same directory as a VectorIndex; doc ids are
+    the vector index's row numbers. Build it with `LexicalIndex.build`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.n = 0
+        self.avgdl = 0.0
+        self.k1 = K1
+        self.b = B
+        self._loaded = False
+        self._load()
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        try:
+            with open(self._file(HEADER), "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self.n = int(header["n"])
+        self.avgdl = float(header["avgdl"])
+        self.k1 = float(header.get("k1", K1))
+        self.b = float(header.get("b", B))
+        self._term_off = np.load(self._file(TERM_OFF), mmap_mode="r")
+        self._post_off = np.load(self._file(POST_OFF), mmap_mode="r")
+        self._df = np.load(self._file(DF), mmap_mode="r")
+        self._doc_len = np.load(self._file(DOC_LEN), mmap_mode="r")
+        self._terms = self._mmap_bytes(TERMS)
+        self._postings = self._mmap_bytes(POSTINGS)
+        # BM25 length normalization per doc, k1 * (1 - b + b * dl / avgdl)
+        dl = np.asarray(self._doc_len, dtype=np.float32)
+        self._norm = self.k1 * (1.0 - self.b + self.b * dl / (self.avgdl or 1.0))
+        self._loaded = True
+
+    def _mmap_bytes(self, name: str) -> np.ndarray:
+        if os.path.getsize(self._file(name)) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(self._file(name), dtype=np.uint8, mode="r")
+
+    @classmethod
+    def build(cls, path: str, documents: Iterable[str], k1: float = K1, b: float = B) -> "LexicalIndex":
+        """
+        Tokenize every document once, write the index files and return it opened.
+        """
+        cls.remove(path)
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_len: List[int] = []
+        for doc_id, text in enumerate(documents):
+            tf = Counter(tokenize(text))
+            doc_len.append(sum(tf.values()))
+            for term, c in tf.items():
+                postings[term].append((doc_id, c))
+
+        os.makedirs(path, exist_ok=True)
+        terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+        term_off = np.zeros(len(terms) + 1, dtype=np.int64)
+        post_off = np.zeros(len(terms) + 1, dtype=np.int64)
+        df = np.zeros(len(terms), dtype=np.int32)
+        with open(os.path.join(path, TERMS), "wb") as ft, open(os.path.join(path, POSTINGS), "wb") as fp:
+            tpos = ppos = 0
+            for i, term in enumerate(terms):
+                raw = term.encode("utf-8")
+                ft.write(raw)
+                tpos += len(raw)
+                plist = postings[term]  # doc ids are already ascending
+                deltas = [plist[0][0]] + [plist[j][0] - plist[j - 1][0] for j in range(1, len(plist))]
+                block = _encode_varints(deltas) + _encode_varints([c for _, c in plist])
+                fp.write(block)
+                ppos += len(block)
+                term_off[i + 1] = tpos
+                post_off[i + 1] = ppos
+                df[i] = len(plist)
+        np.save(os.path.join(path, TERM_OFF), term_off)
+        np.save(os.path.join(path, POST_OFF), post_off)
+        np.save(os.path.join(path, DF), df)
+        np.save(os.path.join(path, DOC_LEN), np.asarray(doc_len, dtype=np.int32))
+
+        header = {
+            "n": len(doc_len),
+            "terms": len(terms),
+            "avgdl": (sum(doc_len) / len(doc_len)) if doc_len else 0.0,
+            "k1": k1,
+            "b": b,
+        }
+        # header 最后写：没有 header 的目录视为没有词法索引
+        tmp = os.path.join(path, HEADER) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp, os.path.join(path, HEADER))
+        return cls(path)
+
+    @classmethod
+    def remove(cls, path: str) -> None:
+        for name in (HEADER, TERMS, TERM_OFF, POST_OFF, DF, DOC_LEN, POSTINGS):
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+    def _term_id(self, term: str) -> Optional[int]:
+        # binary search over the mmapped, byte-sorted vocabulary
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self._df)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = self._terms[self._term_off[mid]:self._term_off[mid + 1]].tobytes()
+            if cur < key:
+                lo = mid + 1
+            elif cur > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def _postings_of(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        vals = _decode_varints(self._postings[self._post_off[tid]:self._post_off[tid + 1]])
+        df = int(self._df[tid])
+        return np.cumsum(vals[:df]), vals[df:]
+
+    def search(self, query: str, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 top-k. Returns (rows, scores), best first; only documents sharing
+        at least one term with the query are returned.
+        """
+        if not self._loaded or not self.n:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = np.zeros(self.n, dtype=np.float32)
+        touched = []
+        for term, qtf in Counter(tokenize(query)).items():
+            tid = self._term_id(term)
+            if tid is None:
+                continue
+            docs, tf = self._postings_of(tid)
+            df = len(docs)
+            idf = math.log(1.0 + (self.n - df + 0.5) / (df + 0.5))
+            tf = tf.astype(np.float32)
+            scores[docs] += qtf * idf * tf * (self.k1 + 1.0) / (tf + self._norm[docs])
+            touched.append(docs)
+        if not touched:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        cand = np.unique(np.concatenate(touched))
+        k = min(top_k, len(cand))
+        # partial selection over matching docs only (O(m) instead of sorting)
+        part = np.argpartition(-scores[cand], k - 1)[:k]
+        rows = cand[part[np.argsort(-scores[cand[part]], kind="stable")]]
+        return rows, scores[rows]
+
+
+def rrf_fuse(rankings: Sequence[Sequence[int]], top_k: int, k: int = RRF_K) -> List[int]:
+    """
+    Reciprocal-rank fusion: score(d) = sum over rankings of 1 / (k + rank).
+    Ties keep the order in which documents were first seen.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)[:top_k]
@@ -0,0 +1,147 @@
+# src/llm_usage.py
+# LLM 调用计量：每次调用的 prompt / completion token、耗时、模型、重试次数和调用方（auditor / agent_step / planner ...）
+# 记进当前 context 的累加器（contextvars，线程和协程各自独立），按题目 / 按运行汇总出 p50 / p95。
+# src/config.py 里的全局计数器是进程级的、不加锁、从不清零，只作为兼容旧代码的累计值保留。
+# 线程池里执行的调用需要用 contextvars.copy_context 或在线程里重新 usage_scope 才能带上累加器。
+from __future__ import annotations
+
+import threading
+from array import array
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+DEFAULT_CALLER = "other"
+
+_USAGE: ContextVar[Optional["UsageAccumulator"]] = ContextVar("llm_usage", default=None)
+_CALLER: ContextVar[str] = ContextVar("llm_caller", default=DEFAULT_CALLER)
+
+
+def _quantiles(values: Iterable[float]) -> Dict[str, float]:
+    arr = np.fromiter(values, dtype=np.float64)
+    if arr.size == 0:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def _new_counts() -> Dict[str, Any]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+            "latency_ms": 0.0, "retries": 0, "errors": 0, "cache_hits": 0}
+
+
+class UsageAccumulator:
+    """
+    Thread-safe totals of LLM calls, overall and per caller / model. Every
+    record is also forwarded to `parent`, so a per-item accumulator can roll
+    up into a per-run one. Per-call latencies are kept only when
+    `keep_latencies` (one float per call) for the run-level percentiles.
+    """
+
+    def __init__(self, parent: Optional["UsageAccumulator"] = None, keep_latencies: bool = False):
+        self.parent = parent
+        self.keep_latencies = keep_latencies
+        self.totals = _new_counts()
+        self.by_caller: Dict[str, Dict[str, Any]] = {}
+        self.by_model: Dict[str, Dict[str, Any]] = {}
+        self._latencies = array("d")
+        self._lock = threading.Lock()
+
+    def record(self, caller: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               latency_ms: float = 0.0, retries: int = 0, error: bool = False) -> None:
+        with self._lock:
+            for counts in (self.totals,
+                           self.by_caller.setdefault(caller, _new_counts()),
+                           self.by_model.setdefault(model, _new_counts())):
+                counts["calls"] += 1
+                counts["prompt_tokens"] += int(prompt_tokens)
+                counts["completion_tokens"] += int(completion_tokens)
+                counts["total_tokens"] += int(prompt_tokens) + int(completion_tokens)
+                counts["latency_ms"] += latency_ms
+                counts["retries"] += int(retries)
+                counts["errors"] += int(bool(error))
+            if self.keep_latencies:
+                self._latencies.append(latency_ms)
+        if self.parent is not None:
+            self.parent.record(caller, model, prompt_tokens, completion_tokens, latency_ms, retries, error)
+
+    def record_cache_hit(self, caller: str) -> None:
+        # a cached judge answer: no tokens spent, counted so hit rates show up next to the calls
+        with self._lock:
+            self.totals["cache_hits"] += 1
+            self.by_caller.setdefault(caller, _new_counts())["cache_hits"] += 1
+        if self.parent is not None:
+            self.parent.record_cache_hit(caller)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.totals)
+            out["latency_ms"] = round(out["latency_ms"], 3)
+            out["by_caller"] = {k: dict(v, latency_ms=round(v["latency_ms"], 3)) for k, v in self.by_caller.items()}
+            if self.keep_latencies:
+                out["by_model"] = {k: dict(v, latency_ms=round(v["latency_ms"], 3)) for k, v in self.by_model.items()}
+                out["call_latency_ms"] = _quantiles(self._latencies)
+        return out
+
+
+def summarize_items(usages: List[Optional[Dict[str, Any]]], item_latency_ms: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Per-item distribution of UsageAccumulator.summary() dicts (one per item):
+    tokens and LLM time per item, plus end-to-end item latency when given.
+    A summary shared by several items (`shared_by`, batched judging) is
+    split evenly between them.
+    """
+    usages = [u for u in usages if u]
+    out: Dict[str, Any] = {
+        "items": len(usages),
+        "tokens_per_item": _quantiles(u["total_tokens"] / u.get("shared_by", 1) for u in usages),
+        "calls_per_item": _quantiles(u["calls"] / u.get("shared_by", 1) for u in usages),
+        "llm_ms_per_item": _quantiles(u["latency_ms"] / u.get("shared_by", 1) for u in usages),
+    }
+    if item_latency_ms is not None:
+        out["item_latency_ms"] = _quantiles(item_latency_ms)
+    return out
+
+
+@contextmanager
+def usage_scope(acc: Optional[UsageAccumulator] = None) -> Iterator[UsageAccumulator]:
+    """
+    Record LLM calls made inside the block into `acc` (a new one by default).
+    """
+    acc = acc if acc is not None else UsageAccumulator()
+    token = _USAGE.set(acc)
+    try:
+        yield acc
+    finally:
+        _USAGE.reset(token)
+
+
+@contextmanager
+def llm_caller(name: str) -> Iterator[None]:
+    """
+    Attribute LLM calls made inside the block to `name`.
+    """
+    token = _CALLER.set(name)
+    try:
+        yield
+    finally:
+        _CALLER.reset(token)
+
+
+def record_llm_call(model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                    latency_ms: float = 0.0, retries: int = 0, error: bool = False) -> None:
+    acc = _USAGE.get()
+    if acc is not None:
+        acc.record(_CALLER.get(), model, prompt_tokens, completion_tokens, latency_ms, retries, error)
+
+
+def note_cache_hit() -> None:
+    acc = _USAGE.get()
+    if acc is not None:
+        acc.record_cache_hit(_CALLER.get())
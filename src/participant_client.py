@@ -0,0 +1,317 @@
+# src/participant_client.py
+# 访问 participant（Purple Agent）的共享异步 HTTP 客户端：keep-alive 连接池、可用时走 HTTP/2、
+# 按 host 限制并发、5xx / 超时按带抖动的指数退避重试，并按 participant 记录延迟直方图。
+# run_assessment 直接 await；离线审计脚本是线程模型，用 BlockingParticipantClient 包一层。
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+DEFAULT_TIMEOUT = float(os.getenv("PARTICIPANT_TIMEOUT", "60"))
+DEFAULT_MAX_PER_HOST = int(os.getenv("PARTICIPANT_MAX_PER_HOST", "8"))
+DEFAULT_RETRIES = int(os.getenv("PARTICIPANT_RETRIES", "3"))
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 10.0
+MIN_ATTEMPT_SECONDS = 1.0  # with a budget, don't start an attempt that gets less time than this
+
+# upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class ParticipantError(RuntimeError):
+    pass
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  # optional: httpx only speaks HTTP/2 with it installed
+    except ImportError:
+        return False
+    return True
+
+
+def is_endpoint(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+
+class LatencyHistogram:
+    """
+    Fixed log-spaced buckets; quantiles are reported as the bucket's upper bound.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.n = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.retries = 0
+        self.errors = 0
+
+    def observe(self, ms: float) -> None:
+        i = 0
+        while i < len(LATENCY_BUCKETS_MS) and ms > LATENCY_BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> float:
+        if not self.n:
+            return 0.0
+        rank = q * self.n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.n,
+            "retries": self.retries,
+            "errors": self.errors,
+            "mean_ms": (self.total_ms / self.n) if self.n else 0.0,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": self.max_ms,
+            "buckets_ms": list(LATENCY_BUCKETS_MS) + ["inf"],
+            "counts": list(self.counts),
+        }
+
+
+def _a2a_text(result: Any) -> str:
+    """
+    Text of an A2A message/send result: a Message, or a Task whose answer is in
+    artifacts, status.message or the last agent turn of history.
+    """
+    if not isinstance(result, dict):
+        return str(result or "")
+
+    def parts_text(parts: Any) -> str:
+        out: List[str] = []
+        for p in parts or []:
+            if not isinstance(p, dict):
+                continue
+            if isinstance(p.get("text"), str):
+                out.append(p["text"])
+            elif "data" in p:
+                out.append(json.dumps(p["data"], ensure_ascii=False))
+        return "\n".join(out)
+
+    if result.get("kind") == "message" or "parts" in result:
+        return parts_text(result.get("parts"))
+    texts = [parts_text(a.get("parts")) for a in result.get("artifacts") or [] if isinstance(a, dict)]
+    text = "\n".join(t for t in texts if t)
+    if text:
+        return text
+    status_msg = (result.get("status") or {}).get("message")
+    if isinstance(status_msg, dict) and status_msg.get("parts"):
+        return parts_text(status_msg.get("parts"))
+    for msg in reversed(result.get("history") or []):
+        if isinstance(msg, dict) and msg.get("role") == "agent":
+            return parts_text(msg.get("parts"))
+    return ""
+
+
+class ParticipantClient:
+    """
+    One pooled httpx.AsyncClient for all participants of an assessment.
+
+    `protocol` is how a question is sent:
+      "a2a"  JSON-RPC message/send with a text part (AgentBeats participants)
+      "json" POST {"query": text}, answer read from answer / response / output
+    """
+
+    def __init__(
+        self,
+        participants: Optional[Dict[str, str]] = None,
+        protocol: str = "a2a",
+        timeout: float = DEFAULT_TIMEOUT,
+        max_per_host: int = DEFAULT_MAX_PER_HOST,
+        retries: int = DEFAULT_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        http2: Optional[bool] = None,
+        budget: Optional[float] = None,
+    ):
+        if protocol not in ("a2a", "json"):
+            raise ValueError(f"unknown participant protocol: {protocol}")
+        self.participants = {k: v for k, v in (participants or {}).items() if is_endpoint(v)}
+        self.protocol = protocol
+        self.max_per_host = max(1, int(max_per_host))
+        self.retries = max(0, int(retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = float(timeout)
+        # total seconds for one request including retries and backoff; None = unbounded
+        self.budget = float(budget) if budget else None
+        self.http2 = _http2_available() if http2 is None else http2
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=httpx.Timeout(timeout, connect=min(10.0, timeout)),
+            limits=httpx.Limits(
+                max_connections=self.max_per_host * max(1, len(self.participants)),
+                max_keepalive_connections=self.max_per_host * max(1, len(self.participants)),
+            ),
+        )
+        self._host_sems: Dict[str, asyncio.Semaphore] = {}
+        self._hist: Dict[str, LatencyHistogram] = {}
+
+    def _sem(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = self._host_sems[host] = asyncio.Semaphore(self.max_per_host)
+        return sem
+
+    def _backoff(self, attempt: int) -> float:
+        # exponential with +/-50% jitter so retries from parallel items don't line up
+        return min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+    async def post_json(self, role: str, url: str, body: Dict[str, Any]) -> Any:
+        """
+        POST with retries on timeouts, transport errors, 429 and 5xx.
+        Other 4xx fail immediately. With a `budget`, attempts and backoff
+        are cut to fit inside it, so the caller sees a ParticipantError
+        rather than its own timeout.
+        """
+        hist = self._hist.setdefault(role, LatencyHistogram())
+        last: Optional[BaseException] = None
+        deadline = time.perf_counter() + self.budget if self.budget else None
+        for attempt in range(self.retries + 1):
+            timeout = self.timeout
+            if attempt:
+                delay = self._backoff(attempt - 1)
+                if deadline is not None and deadline - time.perf_counter() - delay < MIN_ATTEMPT_SECONDS:
+                    break  # no room left for another attempt
+                hist.retries += 1
+                await asyncio.sleep(delay)
+            if deadline is not None:
+                timeout = max(MIN_ATTEMPT_SECONDS, min(timeout, deadline - time.perf_counter()))
+            limits = httpx.Timeout(timeout, connect=min(10.0, timeout))
+            t0 = time.perf_counter()
+            try:
+                async with self._sem(url):
+                    resp = await self._client.post(url, json=body, timeout=limits)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                hist.observe((time.perf_counter() - t0) * 1000.0)
+                last = e
+                continue
+            hist.observe((time.perf_counter() - t0) * 1000.0)
+            if resp.status_code == 429 or resp.status_code >= 500:
+                last = ParticipantError(f"{role}: HTTP {resp.status_code}")
+                continue
+            if resp.status_code >= 400:
+                hist.errors += 1
+                raise ParticipantError(f"{role}: HTTP {resp.status_code}: {resp.text[:200]}")
+            return resp.json()
+        hist.errors += 1
+        if isinstance(last, ParticipantError):
+            raise last
+        raise ParticipantError(f"{role}: {type(last).__name__}: {last}")
+
+    async def ask(self, role: str, text: str) -> str:
+        """Send one question to a participant and return its text answer."""
+        url = self.participants.get(role)
+        if url is None:
+            raise ParticipantError(f"no endpoint for participant {role!r}")
+        if self.protocol == "json":
+            data = await self.post_json(role, url, {"query": text})
+            if isinstance(data, dict):
+                return data.get("answer") or data.get("response") or data.get("output") or str(data)
+            return str(data)
+
+        body = {
+            "jsonrpc": "2.0",
+            "id": uuid.uuid4().hex,
+            "method": "message/send",
+            "params": {
+                "message": {
+                    "kind": "message",
+                    "role": "user",
+                    "messageId": uuid.uuid4().hex,
+                    "parts": [{"kind": "text", "text": text}],
+                },
+                "configuration": {"blocking": True},
+            },
+        }
+        data = await self.post_json(role, url, body)
+        if isinstance(data, dict) and data.get("error"):
+            err = data["error"]
+            raise ParticipantError(f"{role}: JSON-RPC error {err.get('code')}: {err.get('message')}")
+        return _a2a_text(data.get("result") if isinstance(data, dict) else data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "protocol": self.protocol,
+            "http2": self.http2,
+            "max_per_host": self.max_per_host,
+            "participants": {role: h.stats() for role, h in self._hist.items()},
+        }
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "ParticipantClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+
+class BlockingParticipantClient:
+    """
+    Thread-safe synchronous facade: a ParticipantClient on a private event
+    loop thread, so worker threads share one connection pool.
+    """
+
+    def __init__(self, participants: Dict[str, str], **kwargs: Any):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="participant-client", daemon=True)
+        self._thread.start()
+        self.client: ParticipantClient = self._call(self._make(participants, kwargs))
+
+    @staticmethod
+    async def _make(participants: Dict[str, str], kwargs: Dict[str, Any]) -> ParticipantClient:
+        return ParticipantClient(participants, **kwargs)
+
+    def _call(self, coro) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def ask(self, role: str, text: str) -> str:
+        return self._call(self.client.ask(role, text))
+
+    def stats(self) -> Dict[str, Any]:
+        return self.client.stats()
+
+    def close(self) -> None:
+        self._call(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def pick_participant(participants: Dict[str, Any], role: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """
+    (role, endpoint) to query: `role` if given, else the first participant whose
+    value is an http(s) endpoint. None when nothing is reachable.
+    """
+    if role:
+        url = participants.get(role)
+        return (role, url) if is_endpoint(url) else None
+    for r, url in participants.items():
+        if is_endpoint(url):
+            return r, url
+    return None
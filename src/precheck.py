@@ -0,0 +1,106 @@
+# src/precheck.py
+# 打分前的规则预判：能用确定性规则直接定下来的条目不再调用 judge LLM。
+#   exact_match        回答与参考答案（数据集的 output）规范化后完全相同          -> GREEN
+#   citation_mismatch  回答引用了法条，但没有一条出现在依据文档里                -> RED
+#   no_citation        依据文档引用了法条，回答一条法条都没引用                  -> YELLOW
+# 判不了的返回 None，交给 LLM。每条结果带 decided_by（"rule:<规则名>" 或 "llm"）；
+# 按 shadow_rate 抽一部分规则判定的条目同时交给 LLM，用来统计规则与 LLM 的一致率。
+from __future__ import annotations
+
+import re
+import unicodedata
+import zlib
+from typing import Any, Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from .citations import citation_keys, cited_in, get_statute_table
+
+RULES = ("exact_match", "citation_mismatch", "no_citation")
+DEFAULT_SHADOW_RATE = 0.1
+
+# 去掉空白和标点后再比较（NFKC 之后全角标点已折成半角）
+_STRIP = re.compile(r"[\s\.,;:!?'\"`()\[\]{}<>《》「」『』“”‘’、。，；：！？（）【】—…-]+")
+
+
+def normalize_answer(text: Any) -> str:
+    return _STRIP.sub("", unicodedata.normalize("NFKC", str(text or ""))).lower()
+
+
+def precheck(agent_response: str, ground_truth_docs: Sequence[str], reference: Optional[str] = None,
+             rules: Iterable[str] = RULES) -> Optional[Dict[str, Any]]:
+    """
+    A judge-shaped verdict {"signal", "reason", "score", "decided_by"} when a
+    rule settles the item, else None. `reference` is the expected answer, if
+    the item has one distinct from the response being judged.
+    """
+    rules = set(rules)
+    if not str(agent_response or "").strip():
+        return None
+    if "exact_match" in rules and reference:
+        if normalize_answer(agent_response) == normalize_answer(reference):
+            return {"signal": "GREEN", "reason": "Response matches the reference answer.", "score": 1.0,
+                    "decided_by": "rule:exact_match"}
+
+    if not rules & {"citation_mismatch", "no_citation"}:
+        return None
+    table = get_statute_table()
+    known: Set[Tuple[str, int]] = set()
+    for doc in ground_truth_docs or ():
+        known |= citation_keys(doc, table)
+    if not known:
+        return None  # 依据里没有法条，引用规则无从判断
+    cited = citation_keys(agent_response, table)
+    if "citation_mismatch" in rules and cited and not any(cited_in(law, n, known) for law, n in cited):
+        return {"signal": "RED", "reason": "None of the cited articles appear in the ground truth.", "score": 0.0,
+                "decided_by": "rule:citation_mismatch"}
+    if "no_citation" in rules and not cited:
+        return {"signal": "YELLOW", "reason": "Response cites no statute although the ground truth does.",
+                "score": 0.5, "decided_by": "rule:no_citation"}
+    return None
+
+
+def shadowed(key: str, rate: float) -> bool:
+    """
+    Deterministic sample (by item key) of rule-decided items that are also
+    sent to the LLM judge, to measure agreement.
+    """
+    if rate <= 0:
+        return False
+    if rate >= 1:
+        return True
+    return (zlib.crc32(key.encode("utf-8")) % 10000) < rate * 10000
+
+
+def new_precheck_stats() -> Dict[str, Any]:
+    return {"items": 0, "decided": 0, "by_rule": {}, "shadowed": 0, "agreed": 0}
+
+
+def fold_precheck(stats: Dict[str, Any], decided_by: Optional[str], llm_signal: Optional[str] = None,
+                  rule_signal: Optional[str] = None) -> None:
+    """
+    Count one item: decided_by is "rule:<name>" or "llm"; llm_signal is the
+    LLM's verdict on a shadowed rule-decided item.
+    """
+    stats["items"] += 1
+    if not decided_by or not decided_by.startswith("rule:"):
+        return
+    stats["decided"] += 1
+    rule = decided_by[len("rule:"):]
+    by = stats["by_rule"].setdefault(rule, {"decided": 0, "shadowed": 0, "agreed": 0})
+    by["decided"] += 1
+    if llm_signal is not None:
+        stats["shadowed"] += 1
+        by["shadowed"] += 1
+        if llm_signal == rule_signal:
+            stats["agreed"] += 1
+            by["agreed"] += 1
+
+
+def precheck_summary(stats: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(stats)
+    out["coverage"] = stats["decided"] / stats["items"] if stats["items"] else 0.0
+    out["agreement"] = stats["agreed"] / stats["shadowed"] if stats["shadowed"] else None
+    out["by_rule"] = {
+        rule: dict(v, agreement=(v["agreed"] / v["shadowed"]) if v["shadowed"] else None)
+        for rule, v in stats["by_rule"].items()
+    }
+    return out
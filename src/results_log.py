@@ -0,0 +1,435 @@
+# src/results_log.py
+# 审计结果 JSONL 的断点续跑索引：旁边维护一个 <path>.idx（按 id 哈希排好序 + 字节偏移，mmap 打开），
+# 每次 append 同步追加到 <path>.idx.log；启动时不用再逐行 json.loads 整个结果文件。
+# 索引里同时记着每条记录的信号和分数，报告汇总（ReportAggregator）可以直接从索引重建。
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+MAGIC = 0x31584449534C5247  # b"GRLSIDX1"
+VERSION = 2
+HEADER_WORDS = 8  # magic, version, n, bits, covered_bytes, reserved...
+COMPACT_EVERY = 100_000
+
+# 每条记录在索引里的状态码
+ERROR, GREEN, YELLOW, RED = 0, 1, 2, 3
+_SIGNALS = {"GREEN": GREEN, "YELLOW": YELLOW, "RED": RED}
+
+# (hash, offset, end, status, score) per appended line
+_LOG_DTYPE = np.dtype([("h", "<u8"), ("off", "<u8"), ("end", "<u8"), ("status", "<u8"), ("score", "<f8")])
+
+# 本项目写出的每条记录都以 "id" 开头，紧跟 signal/score 或 error：先用正则取，取不到再完整 json.loads
+_ID = rb'("(?:[^"\\]|\\.)*"|-?\d+)'
+_LEADING_OK = re.compile(rb'^\{"id": ' + _ID + rb', "signal": "([A-Z]+)", "score": (-?[0-9.eE+-]+)[,}]')
+_LEADING_ERR = re.compile(rb'^\{"id": ' + _ID + rb', "error": ')
+
+
+def id_hash(_id: str) -> int:
+    """
+    64-bit hash of a record id (blake2b, stable across processes).
+    """
+    return int.from_bytes(hashlib.blake2b(_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def record_status(rec: Dict[str, Any]) -> Tuple[int, float]:
+    """
+    (status, score) of a result record; errors score 0 and are not averaged.
+    """
+    if "error" in rec:
+        return ERROR, 0.0
+    signal = str(rec.get("signal") or "YELLOW").upper()
+    return _SIGNALS.get(signal, YELLOW), float(rec.get("score") or 0.0)
+
+
+def _parse_line(line: bytes) -> Optional[Tuple[str, int, float]]:
+    m = _LEADING_OK.match(line) or _LEADING_ERR.match(line)
+    if m is None or b"\\" in m.group(1):
+        rec = json.loads(line)
+        _id = str(rec.get("id", ""))
+        return (_id,) + record_status(rec) if _id else None
+    _id = m.group(1).strip(b'"').decode("utf-8")
+    if m.re is _LEADING_ERR:
+        return _id, ERROR, 0.0
+    return _id, _SIGNALS.get(m.group(2).decode(), YELLOW), float(m.group(3))
+
+
+class ResultsLog:
+    """
+    Append-only JSONL results file plus a resume index.
+
+    <path>.idx      header, a bucket directory on the top `bits` hash bits,
+                    then n sorted uint64 id hashes, their int64 line offsets,
+                    float64 scores and int8 statuses; covers the first
+                    `covered_bytes` of the JSONL
+    <path>.idx.log  (hash, offset, end, status, score) per line appended since
+                    the last compaction
+
+    Membership and lookup are a directory probe plus a search inside one
+    bucket (a handful of entries), so O(1) on average. On open, lines past
+    what the index covers (a crash between the JSONL write and the index
+    write, or a results file that predates the index) are parsed once and
+    indexed. The log is merged into the sorted file on close or once it
+    holds `compact_every` entries.
+    """
+
+    def __init__(self, path: str, compact_every: int = COMPACT_EVERY):
+        self.path = path
+        self.compact_every = max(1, int(compact_every))
+        self._idx_path = path + ".idx"
+        self._log_path = path + ".idx.log"
+        # hash -> (offset, status, score), entries not yet in the sorted file
+        self._recent: Dict[int, Tuple[int, int, float]] = {}
+        self._covered = 0
+        self._n = 0
+        self._bits = 0
+        self._dir = self._hashes = self._offsets = self._scores = self._status = None
+        self._log = self._f = None
+        # one writer thread appends while the reader checks membership
+        self._lock = threading.Lock()
+
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._size = os.path.getsize(path) if os.path.exists(path) else 0
+        if not self._load_sorted(self._size):
+            self._remove_index()
+        end = self._load_recent(self._size)
+        if end < self._size:
+            self._index_tail(end, self._size)
+        self._log = open(self._log_path, "ab")
+        self._f = open(path, "ab")
+        self._needs_newline = self._size > 0 and not self._ends_with_newline()
+        if len(self._recent) >= self.compact_every:
+            self._compact()
+
+    @property
+    def size(self) -> int:
+        """Bytes of the JSONL written so far (all of them indexed)."""
+        return self._size
+
+    # -----------------------------
+    # open / repair
+    # -----------------------------
+    def _load_sorted(self, size: int) -> bool:
+        try:
+            head = np.fromfile(self._idx_path, dtype=np.int64, count=HEADER_WORDS)
+        except (OSError, ValueError):
+            return True  # no index yet: everything is "tail"
+        if len(head) < HEADER_WORDS or head[0] != MAGIC or head[1] != VERSION:
+            return False
+        n, bits, covered = int(head[2]), int(head[3]), int(head[4])
+        if covered > size:
+            return False  # results file was truncated or replaced
+        body = np.memmap(self._idx_path, dtype=np.int64, mode="r")
+        ndir = (1 << bits) + 1
+        nstatus = (n + 7) // 8
+        if len(body) != HEADER_WORDS + ndir + 3 * n + nstatus:
+            return False
+        p = HEADER_WORDS
+        self._dir = body[p:p + ndir]
+        p += ndir
+        self._hashes = body[p:p + n].view(np.uint64)
+        self._offsets = body[p + n:p + 2 * n]
+        self._scores = body[p + 2 * n:p + 3 * n].view(np.float64)
+        self._status = body[p + 3 * n:].view(np.int8)[:n]
+        self._n, self._bits, self._covered = n, bits, covered
+        return True
+
+    def _load_recent(self, size: int) -> int:
+        """Read the append log; returns the end of the last line it covers."""
+        end = self._covered
+        try:
+            raw = np.fromfile(self._log_path, dtype=np.uint8)
+        except (OSError, ValueError):
+            return end
+        log = raw[:len(raw) - len(raw) % _LOG_DTYPE.itemsize].view(_LOG_DTYPE)
+        # entries are in append order: keep the prefix whose lines fully reached the JSONL
+        ok = log["end"] <= size
+        valid = len(log) if ok.all() else int(np.argmin(ok))
+        with open(self._log_path, "r+b") as f:
+            f.truncate(valid * _LOG_DTYPE.itemsize)
+        for h, off, line_end, status, score in log[:valid].tolist():
+            if off >= self._covered:
+                self._recent[h] = (off, status, score)
+                end = max(end, line_end)
+        return end
+
+    def _index_tail(self, start: int, size: int) -> None:
+        entries = []
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            pos = start
+            for line in f:
+                off, pos = pos, pos + len(line)
+                if not line.endswith(b"\n"):
+                    break  # torn last line from a crash; not a record
+                try:
+                    parsed = _parse_line(line)
+                except Exception:
+                    continue
+                if parsed:
+                    _id, status, score = parsed
+                    h = id_hash(_id)
+                    self._recent[h] = (off, status, score)
+                    entries.append((h, off, pos, status, score))
+        if entries:
+            with open(self._log_path, "ab") as f:
+                np.asarray(entries, dtype=_LOG_DTYPE).tofile(f)
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _remove_index(self) -> None:
+        for p in (self._idx_path, self._log_path):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        self._n = self._bits = self._covered = 0
+        self._dir = self._hashes = self._offsets = self._scores = self._status = None
+
+    # -----------------------------
+    # lookup
+    # -----------------------------
+    def _find(self, h: int) -> Optional[Tuple[int, int, float]]:
+        hit = self._recent.get(h)
+        if hit is not None or not self._n:
+            return hit
+        b = h >> (64 - self._bits) if self._bits else 0
+        lo, hi = int(self._dir[b]), int(self._dir[b + 1])
+        if lo == hi:
+            return None
+        i = lo + int(np.searchsorted(self._hashes[lo:hi], np.uint64(h)))
+        if i < hi and int(self._hashes[i]) == h:
+            return int(self._offsets[i]), int(self._status[i]), float(self._scores[i])
+        return None
+
+    def __contains__(self, _id: str) -> bool:
+        with self._lock:
+            return self._find(id_hash(str(_id))) is not None
+
+    def is_done(self, _id: str) -> bool:
+        return _id in self
+
+    def __len__(self) -> int:
+        return self._n + len(self._recent)
+
+    def entry(self, _id: str) -> Optional[Tuple[int, float]]:
+        """(status, score) of the latest record for `_id`, without reading the JSONL."""
+        with self._lock:
+            hit = self._find(id_hash(str(_id)))
+        return None if hit is None else hit[1:]
+
+    def get(self, _id: str) -> Optional[Dict[str, Any]]:
+        """The latest record written for `_id`, or None."""
+        with self._lock:
+            hit = self._find(id_hash(str(_id)))
+        if hit is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(hit[0])
+            rec = json.loads(f.readline())
+        return rec if str(rec.get("id", "")) == str(_id) else None  # 64-bit hash collision
+
+    def totals(self) -> Dict[str, Any]:
+        """
+        Per-status counts and score sums over the latest record of every id,
+        computed from the index arrays (no JSONL parsing).
+        """
+        with self._lock:
+            status = np.asarray(self._status if self._n else np.zeros(0, np.int8), dtype=np.int64)
+            scores = np.asarray(self._scores if self._n else np.zeros(0), dtype=np.float64)
+            if self._recent:
+                # ids re-written since the last compaction override their sorted entry
+                hs = np.fromiter(self._recent.keys(), dtype=np.uint64, count=len(self._recent))
+                if self._n:
+                    pos = np.searchsorted(self._hashes, hs)
+                    pos_c = np.minimum(pos, self._n - 1)
+                    stale = pos_c[(pos < self._n) & (self._hashes[pos_c] == hs)]
+                    keep = np.ones(self._n, dtype=bool)
+                    keep[stale] = False
+                    status, scores = status[keep], scores[keep]
+                rs = np.asarray([v[1] for v in self._recent.values()], dtype=np.int64)
+                rv = np.asarray([v[2] for v in self._recent.values()], dtype=np.float64)
+                status, scores = np.concatenate([status, rs]), np.concatenate([scores, rv])
+        counts = np.bincount(status, minlength=4)
+        scored = status != ERROR
+        return {
+            "green": int(counts[GREEN]),
+            "yellow": int(counts[YELLOW]),
+            "red": int(counts[RED]),
+            "errors": int(counts[ERROR]),
+            "avg_score_sum": float(scores[scored].sum()),
+            "avg_score_count": int(scored.sum()),
+        }
+
+    # -----------------------------
+    # append / compact
+    # -----------------------------
+    def append(self, obj: Dict[str, Any]) -> int:
+        """Write one record line, index it, and return its byte offset."""
+        line = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            return self._append(line, str(obj.get("id", "")), *record_status(obj))
+
+    def _append(self, line: bytes, _id: str, status: int, score: float) -> int:
+        if self._needs_newline:
+            # a crash left a torn last line: keep it out of the next record
+            self._f.write(b"\n")
+            self._size += 1
+            self._needs_newline = False
+        off = self._size
+        self._f.write(line)
+        self._f.flush()
+        self._size += len(line)
+
+        if _id:
+            h = id_hash(_id)
+            self._recent[h] = (off, status, score)
+            np.asarray([(h, off, self._size, status, score)], dtype=_LOG_DTYPE).tofile(self._log)
+            self._log.flush()
+            if len(self._recent) >= self.compact_every:
+                self._compact()
+        return off
+
+    def compact(self) -> None:
+        """Merge the append log into the sorted index (atomic replace)."""
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        m = len(self._recent)
+        hashes = np.fromiter(self._recent.keys(), dtype=np.uint64, count=m)
+        offsets = np.fromiter((v[0] for v in self._recent.values()), dtype=np.int64, count=m)
+        status = np.fromiter((v[1] for v in self._recent.values()), dtype=np.int8, count=m)
+        scores = np.fromiter((v[2] for v in self._recent.values()), dtype=np.float64, count=m)
+        if self._n:
+            hashes = np.concatenate([np.asarray(self._hashes), hashes])
+            offsets = np.concatenate([np.asarray(self._offsets), offsets])
+            status = np.concatenate([np.asarray(self._status), status])
+            scores = np.concatenate([np.asarray(self._scores), scores])
+        # sort by hash; for a repeated id keep the latest (largest) offset
+        order = np.lexsort((-offsets, hashes))
+        hashes, offsets, status, scores = hashes[order], offsets[order], status[order], scores[order]
+        if len(hashes):
+            keep = np.ones(len(hashes), dtype=bool)
+            keep[1:] = hashes[1:] != hashes[:-1]
+            hashes, offsets, status, scores = hashes[keep], offsets[keep], status[keep], scores[keep]
+
+        n = len(hashes)
+        bits = min(24, max(0, int(n).bit_length() - 2))  # ~2-4 entries per bucket
+        if bits:
+            bounds = np.arange(1 << bits, dtype=np.uint64) << np.uint64(64 - bits)
+            directory = np.append(np.searchsorted(hashes, bounds), n).astype(np.int64)
+        else:
+            directory = np.asarray([0, n], dtype=np.int64)
+        covered = self._size  # every complete line below this is indexed
+        head = np.zeros(HEADER_WORDS, dtype=np.int64)
+        head[:5] = [MAGIC, VERSION, n, bits, covered]
+        status_words = np.zeros(((n + 7) // 8) * 8, dtype=np.int8)
+        status_words[:n] = status
+
+        tmp = self._idx_path + ".tmp"
+        with open(tmp, "wb") as f:
+            head.tofile(f)
+            directory.tofile(f)
+            hashes.tofile(f)
+            offsets.tofile(f)
+            scores.tofile(f)
+            status_words.tofile(f)
+        self._dir = self._hashes = self._offsets = self._scores = self._status = None  # release the old mmap
+        os.replace(tmp, self._idx_path)
+        # the sorted file now covers everything; an empty log is the commit point
+        with open(self._log_path, "wb"):
+            pass
+        self._log.close()
+        self._log = open(self._log_path, "ab")
+        self._recent = {}
+        self._load_sorted(covered)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._recent:
+                self._compact()
+            self._f.close()
+            self._log.close()
+
+
+class ReportAggregator:
+    """
+    Running GREEN / YELLOW / RED / error counts and score sums over the whole
+    results file, across resumes.
+
+    Each appended record is folded in O(1). The state is checkpointed to
+    `<results>.agg.json` by write-to-temp + rename, tagged with the results
+    size it covers; if that does not match on open (a crash after the last
+    checkpoint, or no checkpoint yet) the totals are rebuilt from the
+    ResultsLog index rather than the JSONL.
+    """
+
+    KEYS = ("green", "yellow", "red", "errors", "avg_score_sum", "avg_score_count")
+
+    def __init__(self, results: ResultsLog, path: Optional[str] = None):
+        self.results = results
+        self.path = path or results.path + ".agg.json"
+        self.rebuilt = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                ckpt = json.load(f)
+            if ckpt.get("covered_bytes") != results.size:
+                raise ValueError("stale checkpoint")
+            self.totals: Dict[str, Any] = {k: ckpt[k] for k in self.KEYS}
+        except (OSError, ValueError, KeyError):
+            self.totals = results.totals()
+            self.rebuilt = True
+
+    def fold(self, rec: Dict[str, Any], prev: Optional[Tuple[int, float]] = None) -> None:
+        """
+        Add one record. `prev` is ResultsLog.entry(id) from before the append,
+        so a re-written id replaces its old contribution instead of adding twice.
+        """
+        if prev is not None:
+            self._apply(*prev, sign=-1)
+        self._apply(*record_status(rec), sign=1)
+
+    def _apply(self, status: int, score: float, sign: int) -> None:
+        key = {GREEN: "green", YELLOW: "yellow", RED: "red"}.get(status, "errors")
+        self.totals[key] += sign
+        if status != ERROR:
+            self.totals["avg_score_sum"] += sign * score
+            self.totals["avg_score_count"] += sign
+
+    def summary(self) -> Dict[str, Any]:
+        t = dict(self.totals)
+        t["total"] = t["green"] + t["yellow"] + t["red"]
+        t["avg_score"] = (t["avg_score_sum"] / t["avg_score_count"]) if t["avg_score_count"] else 0.0
+        return t
+
+    def checkpoint(self) -> None:
+        state = dict(self.totals)
+        state["covered_bytes"] = self.results.size
+        write_json_atomic(self.path, state)
+
+
+def write_json_atomic(path: str, obj: Any) -> None:
+    """
+    Write JSON to a temp file in the same directory, fsync, then rename over `path`.
+    """
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -2,22 +2,32 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import os
 import uuid
-from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Optional
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 
 from .executor import run_assessment
+from .task_store import TaskStore
 
 APP_NAME = "green-agent"
 A2A_VERSION = "0.1"
 
 app = FastAPI(title=f"{APP_NAME} (A2A)", version=A2A_VERSION)
 
+# Assessments run in the background; tasks/get polls this store.
+TASKS = TaskStore(
+    max_tasks=int(os.getenv("TASK_STORE_MAX_TASKS", "256")),
+    ttl_seconds=float(os.getenv("TASK_STORE_TTL_SECONDS", "86400")),
+    spill_dir=os.getenv("TASK_STORE_DIR", "output/tasks") or None,
+)
+
 
 @app.get("/health")
 def health() -> Dict[str, Any]:
@@ -46,7 +56,7 @@ async def agent_card(request: Request) -> Dict[str, Any]:
         "defaultInputModes": ["text"],
         "defaultOutputModes": ["text"],
         "capabilities": {
-            "streaming": False,
+            "streaming": True,
             "pushNotifications": False,
         },
         "skills": [
@@ -84,7 +94,49 @@ def _make_completed_task(req_id: Any, context_id: Optional[str], result_obj: Dic
     return {"jsonrpc": "2.0", "id": req_id, "result": task}
 
 
-async def _handle_a2a_message(params: Dict[str, Any]) -> Dict[str, Any]:
+def _status_message(task_id: str, context_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "kind": "message",
+        "role": "agent",
+        "messageId": f"msg_{uuid.uuid4().hex}",
+        "taskId": task_id,
+        "contextId": context_id,
+        "parts": [{"kind": "data", "data": data}],
+    }
+
+
+def _make_status(state: str, task_id: str, context_id: str, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    status: Dict[str, Any] = {"state": state, "timestamp": datetime.now(timezone.utc).isoformat()}
+    if data is not None:
+        status["message"] = _status_message(task_id, context_id, data)
+    return status
+
+
+def _make_status_update(req_id: Any, context_id: Optional[str], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Wrap one executor TaskUpdate as an A2A TaskStatusUpdateEvent (state=working).
+    """
+    task_id = update.get("task_id")
+    ctx = context_id or task_id
+    event = {
+        "kind": "status-update",
+        "taskId": task_id,
+        "contextId": ctx,
+        "status": {
+            "state": "working",
+            "message": _status_message(task_id, ctx, update),
+            "timestamp": datetime.fromtimestamp(update.get("ts") or 0, tz=timezone.utc).isoformat(),
+        },
+        "final": False,
+    }
+    return {"jsonrpc": "2.0", "id": req_id, "result": event}
+
+
+async def _handle_a2a_message(
+    params: Dict[str, Any],
+    on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+    task_id: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     Accept A2A message payload. We try to find assessment payload in:
       params.message.parts[].data  OR params.message.parts[].text (JSON string) OR params.payload OR params itself.
@@ -140,21 +192,106 @@ async def _handle_a2a_message(params: Dict[str, Any]) -> Dict[str, Any]:
         payload["participants"] = participants_dict
         print(f"[executor] Transformed participants: {participants_dict}", flush=True)
 
-    result_obj = await run_assessment(payload)
+    if task_id is not None:
+        payload["task_id"] = task_id  # keep executor task id == A2A task id
+
+    result_obj = await run_assessment(payload, on_update=on_update)
     result_obj.setdefault("context_id", context_id)
     return result_obj
 
 
+def _start_task(params: Dict[str, Any], on_update: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+    """
+    Register a working task and run the assessment for it in the background.
+    """
+    task_id = f"task_{uuid.uuid4().hex}"
+    context_id = (params.get("message") or {}).get("contextId") or task_id
+
+    async def run() -> None:
+        def progress(update: Dict[str, Any]) -> None:
+            # only the latest update is kept on the task, so memory stays flat
+            TASKS.update_status(task_id, _make_status("working", task_id, context_id, update))
+            if on_update is not None:
+                on_update(update)
+
+        try:
+            result_obj = await _handle_a2a_message(params, on_update=progress, task_id=task_id)
+        except asyncio.CancelledError:
+            TASKS.finish(task_id, {
+                "kind": "task",
+                "id": task_id,
+                "contextId": context_id,
+                "status": _make_status("canceled", task_id, context_id),
+            })
+            raise
+        except Exception as e:
+            TASKS.finish(task_id, {
+                "kind": "task",
+                "id": task_id,
+                "contextId": context_id,
+                "status": _make_status("failed", task_id, context_id, {"error": str(e)}),
+            })
+            return
+        TASKS.finish(task_id, _make_completed_task(None, context_id, result_obj)["result"])
+
+    working = {
+        "kind": "task",
+        "id": task_id,
+        "contextId": context_id,
+        "status": _make_status("working", task_id, context_id),
+        "artifacts": [],
+    }
+    # run() cannot start before this returns, so finish() always finds the entry
+    TASKS.put(task_id, working, runner=asyncio.create_task(run()))
+    return task_id
+
+
+def _task_not_found(req_id: Any, task_id: Any) -> Dict[str, Any]:
+    return {
+        "jsonrpc": "2.0",
+        "id": req_id,
+        "error": {"code": -32001, "message": f"Task not found: {task_id}"},
+    }
+
+
 async def _jsonrpc_dispatch(body: Dict[str, Any]) -> Dict[str, Any]:
     req_id = body.get("id")
     method = body.get("method")
     params = body.get("params") or {}
 
     # 关键：agentbeats-client 用 JSON-RPC transport（你日志里就是 jsonrpc.py）
-    if method in ("message/send", "message/stream"):
-        result_obj = await _handle_a2a_message(params)
-        context_id = (params.get("message") or {}).get("contextId")
-        return _make_completed_task(req_id, context_id, result_obj)
+    if method == "message/send":
+        task_id = _start_task(params)
+        # A2A clients that ask for blocking=true get the finished task as before;
+        # otherwise return the working task right away and let them poll tasks/get.
+        if (params.get("configuration") or {}).get("blocking"):
+            runner = TASKS.runner(task_id)
+            if runner is not None:
+                await asyncio.wait([runner])  # a dropped request does not cancel the run
+        return {"jsonrpc": "2.0", "id": req_id, "result": await TASKS.get(task_id)}
+
+    if method == "tasks/get":
+        task_id = params.get("id")
+        task = await TASKS.get(task_id) if task_id else None
+        if task is None:
+            return _task_not_found(req_id, task_id)
+        return {"jsonrpc": "2.0", "id": req_id, "result": task}
+
+    if method == "tasks/cancel":
+        task_id = params.get("id")
+        task = await TASKS.get(task_id) if task_id else None
+        if task is None:
+            return _task_not_found(req_id, task_id)
+        runner = TASKS.runner(task_id)
+        if runner is None:
+            return {
+                "jsonrpc": "2.0",
+                "id": req_id,
+                "error": {"code": -32002, "message": f"Task cannot be canceled: {task_id}"},
+            }
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+        return {"jsonrpc": "2.0", "id": req_id, "result": await TASKS.get(task_id)}
 
     return {
         "jsonrpc": "2.0",
@@ -167,6 +304,52 @@ def _sse(obj: Dict[str, Any]) -> str:
     return "data: " + json.dumps(obj, ensure_ascii=False) + "\n\n"
 
 
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
+async def _stream_a2a_message(body: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    message/stream: one status-update event per executor update (per scored item,
+    aggregate snapshots, warnings) while the assessment runs, then the completed task.
+    Idle gaps get SSE comments so proxies don't drop the connection. A disconnect
+    leaves the run going (poll tasks/get) unless configuration.cancelOnDisconnect.
+    """
+    req_id = body.get("id")
+    params = body.get("params") or {}
+
+    queue: asyncio.Queue = asyncio.Queue()
+    listening = True
+
+    def on_update(update: Optional[Dict[str, Any]]) -> None:
+        # nobody reads the queue once the client is gone
+        if listening:
+            queue.put_nowait(update)
+
+    task_id = _start_task(params, on_update=on_update)
+    runner = TASKS.runner(task_id)
+    runner.add_done_callback(lambda _: on_update(None))
+    context_id = (await TASKS.get(task_id))["contextId"]
+
+    try:
+        while True:
+            try:
+                update = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if update is None:
+                break
+            yield _sse(_make_status_update(req_id, context_id, update))
+
+        yield _sse({"jsonrpc": "2.0", "id": req_id, "result": await TASKS.get(task_id)})
+    finally:
+        listening = False
+        # client went away mid-run: the run keeps going and stays visible via tasks/get,
+        # unless the client opted into configuration.cancelOnDisconnect
+        if not runner.done() and (params.get("configuration") or {}).get("cancelOnDisconnect"):
+            runner.cancel()
+
+
 # 多挂几个路径，避免 client 期望的 base path 和你不同导致 404
 @app.post("/")
 @app.post("/a2a")
@@ -178,10 +361,7 @@ async def a2a_jsonrpc(request: Request, assistant_id: Optional[str] = None):
     print(f"[jsonrpc] path={request.url.path} method={body.get('method')} id={body.get('id')}", flush=True)
 
     if body.get("method") == "message/stream":
-        async def gen():
-            resp = await _jsonrpc_dispatch(body)
-            yield _sse(resp)
-        return StreamingResponse(gen(), media_type="text/event-stream")
+        return StreamingResponse(_stream_a2a_message(body), media_type="text/event-stream")
 
     resp = await _jsonrpc_dispatch(body)
     return JSONResponse(content=resp)
@@ -0,0 +1,167 @@
+# src/table_router.py
+# 本地选表：用 schema.py 的字段名 + 人工整理的关键词（案号 → LegalDoc、统一社会信用代码 → CompanyRegister ...）
+# 预先编译成一个正则，一次扫描问题就能给每张表打分；只有一张表都命不中（问题太含糊）时才交给 LLM 选表。
+# 选中的表集合按 schema 顺序规范化，渲染好的 table_used_prompt 按表集合缓存成不可变字符串，
+# 同一组表在不同题目之间拿到的是同一个字符串（也让 agent 提示词的静态前缀保持不变）。
+from __future__ import annotations
+
+import functools
+import re
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# 字段名里带的单位后缀（schema.build_enum_list 加的），建索引时去掉
+_UNIT_SUFFIX = "（元）"
+
+# 问题里出现即可确定用哪张表的关键词（权重 1）；schema 里只属于一张表的字段名自动算作这一类
+TABLE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "CompanyInfo": ("上市公司", "上市", "股票代码", "证券代码", "公司代码", "简称", "董秘", "总经理",
+                    "主营业务", "所属行业", "所属市场", "入选指数", "首发", "主承销商", "英文名称"),
+    "CompanyRegister": ("统一社会信用代码", "信用代码", "登记状态", "注册资本", "参保人数", "注册号",
+                        "组织机构代码", "工商", "企业简介", "行业一级", "行业二级", "行业三级"),
+    "SubCompanyInfo": ("子公司", "母公司", "控股", "参股", "持股", "投资金额", "关联上市公司"),
+    "LegalDoc": ("案号", "裁判文书", "判决", "裁定", "起诉", "原告", "被告", "案由", "审理", "诉讼",
+                 "民初", "民终", "刑初", "案件", "涉诉"),
+    "CourtInfo": ("法院", "法院负责人", "法院地址", "法院官网", "院长"),
+    "CourtCode": ("法院代字", "区划代码", "法院级别", "行政级别"),
+    "LawfirmInfo": ("律师事务所", "律所", "事务所"),
+    "LawfirmLog": ("业务量排名", "业务量", "服务已上市公司", "违规事件", "立案调查"),
+    "AddrInfo": ("省份", "城市", "区县"),
+    "LegalAbstract": ("摘要", "概要", "概述"),
+    "RestrictionCase": ("限制高消费", "限高", "限消"),
+    "FinalizedCase": ("终本", "终结本次执行", "未履行"),
+    "DishonestyCase": ("失信", "老赖"),
+    "AdministrativeCase": ("行政处罚", "处罚", "罚款"),
+}
+
+# 太泛的字段名不参与打分（几乎每个问题都会出现）
+GENERIC_FIELDS = frozenset({"日期", "地址", "标题", "事实", "级别", "城市", "省份", "区县", "传真", "文件名"})
+
+# 形如 （2019）沪0115民初12345号 的案号、18 位统一社会信用代码
+_CASE_NO = re.compile(r"[（(]\d{4}[）)][\u4e00-\u9fa5\d]{1,12}?\d+号")
+_CREDIT_CODE = re.compile(r"(?<![0-9A-Z])[0-9A-HJ-NPQRTUWXY]{2}\d{6}[0-9A-HJ-NPQRTUWXY]{10}(?![0-9A-Z])")
+PATTERNS: Tuple[Tuple[re.Pattern, str], ...] = ((_CASE_NO, "LegalDoc"), (_CREDIT_CODE, "CompanyRegister"))
+
+# 每张表累计到这个分数才入选；只在多张表之间共享的字段名每次命中得 1 / 表数
+THRESHOLD = 1.0
+
+
+class Route(NamedTuple):
+    tables: Tuple[str, ...]          # schema 顺序, 含 always 里的表
+    matched: Dict[str, List[str]]    # 表 -> 命中的关键词
+    ambiguous: bool                  # 没有任何表达到阈值
+
+
+class TableRouter:
+    """
+    Keyword router over the schema's tables. `fields` maps table -> field
+    names as shown in the prompt (schema.build_enum_list); `tools` maps
+    table -> tool objects (generated_tools.Tools_map).
+    """
+
+    def __init__(self, fields: Dict[str, Sequence[str]], tools: Dict[str, Sequence[Any]],
+                 keywords: Optional[Dict[str, Sequence[str]]] = None,
+                 always: Sequence[str] = ("CompanyInfo", "AddrInfo")):
+        self.tables: Tuple[str, ...] = tuple(fields)
+        self.fields = {t: list(f) for t, f in fields.items()}
+        self.tools = tools
+        self.always = tuple(t for t in always if t in fields)
+        self._order = {t: i for i, t in enumerate(self.tables)}
+        self._weights = self._build_weights(keywords if keywords is not None else TABLE_KEYWORDS)
+        # 长词在前：同一位置优先命中更长的关键词（“执行法院”不会再算一次“法院”）
+        alternation = "|".join(re.escape(k) for k in sorted(self._weights, key=len, reverse=True))
+        self._pattern = re.compile(alternation) if alternation else None
+        self.table_prompt = functools.lru_cache(maxsize=256)(self._render_table_prompt)
+        self._lock = threading.Lock()
+        self.local_routes = 0
+        self.ambiguous_routes = 0
+
+    def _build_weights(self, keywords: Dict[str, Sequence[str]]) -> Dict[str, Dict[str, float]]:
+        owners: Dict[str, List[str]] = {}
+        for table, names in self.fields.items():
+            for name in names:
+                name = str(name)
+                if name.endswith(_UNIT_SUFFIX):
+                    name = name[:-len(_UNIT_SUFFIX)]
+                if name in GENERIC_FIELDS:
+                    continue
+                owners.setdefault(name, [])
+                if table not in owners[name]:
+                    owners[name].append(table)
+        weights: Dict[str, Dict[str, float]] = {}
+        for name, tables in owners.items():
+            weights[name] = {t: 1.0 / len(tables) for t in tables}
+        for table, words in keywords.items():
+            if table not in self._order:
+                continue
+            for w in words:
+                weights.setdefault(w, {})[table] = THRESHOLD
+        return weights
+
+    def select(self, tables: Iterable[str]) -> Tuple[str, ...]:
+        """
+        Canonical table set: known tables plus `always`, in schema order.
+        """
+        picked = {t for t in tables if t in self._order} | set(self.always)
+        return tuple(sorted(picked, key=self._order.__getitem__))
+
+    def route(self, query: str) -> Route:
+        query = str(query or "")
+        scores: Dict[str, float] = {}
+        matched: Dict[str, List[str]] = {}
+        seen = set()
+        if self._pattern is not None:
+            for m in self._pattern.finditer(query):
+                word = m.group(0)
+                if word in seen:
+                    continue
+                seen.add(word)
+                for table, w in self._weights[word].items():
+                    scores[table] = scores.get(table, 0.0) + w
+                    matched.setdefault(table, []).append(word)
+        for pattern, table in PATTERNS:
+            if table in self._order and pattern.search(query):
+                scores[table] = scores.get(table, 0.0) + THRESHOLD
+                matched.setdefault(table, []).append(pattern.pattern)
+        hits = [t for t, s in scores.items() if s >= THRESHOLD - 1e-9]
+        with self._lock:
+            if hits:
+                self.local_routes += 1
+            else:
+                self.ambiguous_routes += 1
+        return Route(self.select(hits), matched, not hits)
+
+    def _render_table_prompt(self, tables: Tuple[str, ...]) -> str:
+        # 与原来逐表拼接的文本逐字相同
+        out = ""
+        for t in tables:
+            out += f"""
+{t}表格有下列字段:
+{self.fields[t]}
+-------------------------------------
+""" + "\n"
+        return out
+
+    def tools_for(self, tables: Sequence[str]) -> List[Any]:
+        """
+        Tools of the given tables, in order, each tool once (CourtInfo and
+        CourtCode share one tool list).
+        """
+        out: List[Any] = []
+        seen = set()
+        for t in tables:
+            for tool in self.tools.get(t, ()):
+                key = getattr(tool, "name", id(tool))
+                if key not in seen:
+                    seen.add(key)
+                    out.append(tool)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        info = self.table_prompt.cache_info()
+        return {
+            "local_routes": self.local_routes,
+            "ambiguous_routes": self.ambiguous_routes,
+            "cached_table_prompts": info.currsize,
+            "table_prompt_hits": info.hits,
+        }
@@ -0,0 +1,304 @@
+# src/table_store.py
+# 列式表存储：schema.py 的每张表一个目录，每列单独存成 int32 字典编码 + 字符串字典，全部 mmap 打开；
+# 查询键上建二级哈希索引（排序后的键表 + CSR 行号表），按公司 / 法院 / 案号查一次是二分查找 + 切片，
+# 取结果时只读 columns 里要求的那几列。
+# 目录布局和 lexical_index 一样：header 最后写，没有 header 的目录视为不存在。
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_STORE_DIR = os.getenv("TOOL_STORE_DIR", "data/table_store")
+
+HEADER = "table.json"
+# 列字典里存的是单元格的 JSON 编码，取回时类型（数字 / null / 字符串）和 RowTable、远程 API 一致；
+# 没有这个字段的旧目录里存的是 str(值)
+VALUE_ENCODING = "json"
+
+# schema.build_enum_list 在提示词里给金额类字段加了 “（元）”，模型经常原样抄回 columns
+_UNIT_SUFFIX = "（元）"
+# 一个单元格里可能有多个公司 / 律所，用这些分隔符拆开分别建索引
+_MULTI_SEP = re.compile(r"[,，、;；\n]+")
+
+
+def normalize_key(value: Any) -> str:
+    """
+    Lookup-key normalization shared by index build and probe: strip, fold
+    full-width brackets and spaces (案号 is written both ways in the data).
+    """
+    s = str(value if value is not None else "").strip()
+    return s.replace("(", "（").replace(")", "）").replace("　", "").replace(" ", "")
+
+
+def index_keys(value: Any, multi_valued: bool = False) -> List[str]:
+    """
+    Distinct normalized keys a cell is indexed under; a multi-valued cell is
+    indexed whole and under each separated part.
+    """
+    parts = [value] + _MULTI_SEP.split(str(value)) if multi_valued and value else [value]
+    out: List[str] = []
+    for part in parts:
+        k = normalize_key(part)
+        if k and k not in out:
+            out.append(k)
+    return out
+
+
+def resolve_columns(columns: Sequence[str], requested: Optional[Sequence[str]]) -> Optional[List[str]]:
+    """
+    Requested columns, all columns when empty; None if any is unknown.
+    """
+    if not requested:
+        return list(columns)
+    known = set(columns)
+    out = []
+    for c in requested:
+        c = str(c).strip()
+        if c not in known and c.endswith(_UNIT_SUFFIX):
+            c = c[:-len(_UNIT_SUFFIX)]
+        if c not in known:
+            return None
+        out.append(c)
+    return out
+
+
+# -----------------------------
+# string tables
+# -----------------------------
+class _Strings:
+    """
+    Strings concatenated in one utf-8 blob with int64 offsets (n + 1).
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode("utf-8")
+
+    def find(self, key: str) -> Optional[int]:
+        # binary search; only valid when the strings were written byte-sorted
+        target = key.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = self.raw(mid)
+            if cur < target:
+                lo = mid + 1
+            elif cur > target:
+                hi = mid
+            else:
+                return mid
+        return None
+
+
+def _write_strings(path: str, prefix: str, strings: Sequence[str]) -> None:
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    with open(os.path.join(path, prefix + ".bin"), "wb") as f:
+        pos = 0
+        for i, s in enumerate(strings):
+            raw = s.encode("utf-8")
+            f.write(raw)
+            pos += len(raw)
+            offsets[i + 1] = pos
+    np.save(os.path.join(path, prefix + "_off.npy"), offsets)
+
+
+def _mmap_bytes(path: str) -> np.ndarray:
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def _open_strings(path: str, prefix: str) -> _Strings:
+    return _Strings(_mmap_bytes(os.path.join(path, prefix + ".bin")),
+                    np.load(os.path.join(path, prefix + "_off.npy"), mmap_mode="r"))
+
+
+class ColumnarTable:
+    """
+    Read-only, memory-mapped columnar table. Files per column i:
+    c<i>.npy (int32 codes), c<i>_dict.bin / c<i>_dict_off.npy (dictionary of
+    JSON-encoded cell values, so types and nulls round-trip).
+    Files per index j: x<j>_keys.bin / x<j>_keys_off.npy (byte-sorted
+    normalized keys), x<j>_off.npy (CSR offsets), x<j>_rows.npy (row ids).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, HEADER), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        self.name = header["name"]
+        self.n = int(header["n"])
+        self.columns: List[str] = header["columns"]
+        self._col_pos = {c: i for i, c in enumerate(self.columns)}
+        self._index_pos = {(x["field"], bool(x["multi_valued"])): j for j, x in enumerate(header["indexes"])}
+        self._decode = json.loads if header.get("value_encoding") == VALUE_ENCODING else str
+        self._codes: Dict[int, np.ndarray] = {}
+        self._dicts: Dict[int, _Strings] = {}
+        self._indexes: Dict[int, Tuple[_Strings, np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return self.n
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, HEADER))
+
+    # -----------------------------
+    # build
+    # -----------------------------
+    @classmethod
+    def build(cls, path: str, name: str, rows: Iterable[Dict[str, Any]],
+              columns: Optional[Sequence[str]] = None,
+              indexes: Sequence[Tuple[str, bool]] = ()) -> "ColumnarTable":
+        """
+        One pass over `rows`: dictionary-encode every column and collect the
+        index postings, then write the files and return the table opened.
+        `columns` defaults to the keys of the first row.
+        """
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        cols: List[str] = list(columns) if columns else []
+        dicts: List[Dict[str, int]] = []
+        codes: List[array] = []
+        postings: List[Dict[str, List[int]]] = [defaultdict(list) for _ in indexes]
+        n = 0
+        for row in rows:
+            if not cols:
+                cols = list(row.keys())
+            if not dicts:
+                dicts = [{} for _ in cols]
+                codes = [array("i") for _ in cols]
+            for i, c in enumerate(cols):
+                v = json.dumps(row.get(c), ensure_ascii=False, default=str)
+                code = dicts[i].get(v)
+                if code is None:
+                    code = dicts[i][v] = len(dicts[i])
+                codes[i].append(code)
+            for j, (field, multi) in enumerate(indexes):
+                for k in index_keys(row.get(field), multi):
+                    postings[j][k].append(n)
+            n += 1
+        if not dicts:
+            dicts = [{} for _ in cols]
+            codes = [array("i") for _ in cols]
+
+        for i in range(len(cols)):
+            np.save(os.path.join(path, f"c{i}.npy"), np.frombuffer(codes[i], dtype=np.int32))
+            _write_strings(path, f"c{i}_dict", list(dicts[i]))  # insertion order == code order
+        for j, plist in enumerate(postings):
+            keys = sorted(plist, key=lambda k: k.encode("utf-8"))
+            off = np.zeros(len(keys) + 1, dtype=np.int64)
+            off[1:] = np.cumsum([len(plist[k]) for k in keys])
+            rows_arr = np.fromiter((r for k in keys for r in plist[k]), dtype=np.int32, count=int(off[-1]))
+            _write_strings(path, f"x{j}_keys", keys)
+            np.save(os.path.join(path, f"x{j}_off.npy"), off)
+            np.save(os.path.join(path, f"x{j}_rows.npy"), rows_arr)
+
+        header = {
+            "name": name,
+            "n": n,
+            "columns": cols,
+            "value_encoding": VALUE_ENCODING,
+            "indexes": [{"field": f, "multi_valued": bool(m)} for f, m in indexes],
+        }
+        tmp = os.path.join(path, HEADER) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(path, HEADER))
+        return cls(path)
+
+    # -----------------------------
+    # read
+    # -----------------------------
+    def _column(self, i: int) -> Tuple[np.ndarray, _Strings]:
+        if i not in self._codes:
+            self._codes[i] = np.load(os.path.join(self.path, f"c{i}.npy"), mmap_mode="r")
+            self._dicts[i] = _open_strings(self.path, f"c{i}_dict")
+        return self._codes[i], self._dicts[i]
+
+    def _index(self, j: int) -> Tuple[_Strings, np.ndarray, np.ndarray]:
+        if j not in self._indexes:
+            self._indexes[j] = (
+                _open_strings(self.path, f"x{j}_keys"),
+                np.load(os.path.join(self.path, f"x{j}_off.npy"), mmap_mode="r"),
+                np.load(os.path.join(self.path, f"x{j}_rows.npy"), mmap_mode="r"),
+            )
+        return self._indexes[j]
+
+    def resolve_columns(self, requested: Optional[Sequence[str]]) -> Optional[List[str]]:
+        return resolve_columns(self.columns, requested)
+
+    def lookup(self, field: str, key: Any, multi_valued: bool = False) -> np.ndarray:
+        """
+        Ascending row ids whose `field` matches `key` (normalized). Uses the
+        secondary index when one was built, else scans the column dictionary.
+        """
+        k = normalize_key(key)
+        if not k:
+            return np.zeros(0, dtype=np.int32)
+        j = self._index_pos.get((field, multi_valued))
+        if j is not None:
+            keys, off, rows = self._index(j)
+            pos = keys.find(k)
+            if pos is None:
+                return np.zeros(0, dtype=np.int32)
+            return np.asarray(rows[off[pos]:off[pos + 1]])
+        i = self._col_pos.get(field)
+        if i is None:
+            return np.zeros(0, dtype=np.int32)
+        codes, dictionary = self._column(i)
+        match = [c for c in range(len(dictionary)) if k in index_keys(self._decode(dictionary[c]), multi_valued)]
+        return np.flatnonzero(np.isin(codes, match)).astype(np.int32)
+
+    def project(self, row_ids: Sequence[int], columns: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        Gather `columns` for `row_ids`; only those columns' files are touched.
+        """
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        out: List[Dict[str, Any]] = [{} for _ in range(len(row_ids))]
+        for c in columns:
+            codes, dictionary = self._column(self._col_pos[c])
+            picked = np.asarray(codes[row_ids])
+            decoded = {int(code): self._decode(dictionary[int(code)]) for code in np.unique(picked)}
+            for rec, code in zip(out, picked.tolist()):
+                rec[c] = decoded[code]
+        return out
+
+
+class TableStore:
+    """
+    Directory of ColumnarTables, one subdirectory per table name.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+        self._tables: Dict[str, Optional[ColumnarTable]] = {}
+
+    def table(self, name: str) -> Optional[ColumnarTable]:
+        if name not in self._tables:
+            path = os.path.join(self.root, name)
+            self._tables[name] = ColumnarTable(path) if ColumnarTable.exists(path) else None
+        return self._tables[name]
+
+    def build_table(self, name: str, rows: Iterable[Dict[str, Any]], columns: Optional[Sequence[str]] = None,
+                    indexes: Sequence[Tuple[str, bool]] = ()) -> ColumnarTable:
+        table = ColumnarTable.build(os.path.join(self.root, name), name, rows, columns, indexes)
+        self._tables[name] = table
+        return table
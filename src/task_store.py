@@ -0,0 +1,167 @@
+# src/task_store.py
+# A2A task 状态存储：条数 + TTL 双重上限，已完成任务的结果可落盘，
+# 长期运行的容器里内存不随评测次数增长。
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+TERMINAL_STATES = ("completed", "canceled", "failed", "rejected")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    task: Dict[str, Any]  # full task while running; a stub once spilled
+    runner: Optional[asyncio.Task]
+    path: Optional[str]  # spill file of the finished task, if any
+    finished_at: Optional[float]
+
+
+class TaskStore:
+    """
+    In-memory task table bounded by `max_tasks` and `ttl_seconds`.
+
+    Finished tasks expire `ttl_seconds` after completion and are evicted
+    oldest-first once the store is over `max_tasks`; running tasks are never
+    evicted. With `spill_dir`, finished tasks are written to disk (off the
+    event loop) and only a status stub stays in memory; a task whose spill
+    fails stays in memory in full. Meant to be used from the event loop thread;
+    `get` is a coroutine so reading a spilled task back does not block it.
+    """
+
+    def __init__(self, max_tasks: int = 256, ttl_seconds: float = 86400.0, spill_dir: Optional[str] = None):
+        self.max_tasks = max(1, int(max_tasks))
+        self.ttl_seconds = float(ttl_seconds)
+        self.spill_dir = spill_dir
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __contains__(self, task_id: str) -> bool:
+        self._prune()
+        return task_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, task_id: str, task: Dict[str, Any], runner: Optional[asyncio.Task] = None) -> None:
+        self._entries[task_id] = _Entry(task=task, runner=runner, path=None, finished_at=None)
+        self._entries.move_to_end(task_id)
+        if self._is_terminal(task):
+            self.finish(task_id, task)
+        self._prune()
+
+    def update_status(self, task_id: str, status: Dict[str, Any]) -> None:
+        """Replace the status of a running task (e.g. latest progress message)."""
+        entry = self._entries.get(task_id)
+        if entry is not None and entry.finished_at is None:
+            entry.task["status"] = status
+
+    def finish(self, task_id: str, task: Dict[str, Any]) -> None:
+        entry = self._entries.get(task_id)
+        if entry is None:
+            return
+        entry.finished_at = time.time()
+        entry.runner = None
+        # 完整结果先留在内存里，落盘成功后才换成 stub；落盘在线程池里做，不阻塞事件循环
+        entry.task = task
+        if self.spill_dir:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is None:
+                try:
+                    self._spilled(task_id, entry, task, self._spill(task_id, task))
+                except OSError as e:
+                    logger.warning("task %s not spilled, kept in memory: %s", task_id, e)
+            else:
+                fut = loop.run_in_executor(None, self._spill, task_id, task)
+                fut.add_done_callback(lambda f: self._spill_done(task_id, entry, task, f))
+        self._prune()
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Current task; a spilled task is read back from disk off the event loop."""
+        self._prune()
+        entry = self._entries.get(task_id)
+        if entry is None:
+            return None
+        if entry.path:
+            try:
+                return await asyncio.to_thread(self._load, entry.path)
+            except (OSError, json.JSONDecodeError):
+                return entry.task  # spill file gone; the stub still says how it ended
+        return entry.task
+
+    def runner(self, task_id: str) -> Optional[asyncio.Task]:
+        entry = self._entries.get(task_id)
+        return entry.runner if entry is not None else None
+
+    # -----------------------------
+    # internals
+    # -----------------------------
+    @staticmethod
+    def _is_terminal(task: Dict[str, Any]) -> bool:
+        return (task.get("status") or {}).get("state") in TERMINAL_STATES
+
+    def _spill(self, task_id: str, task: Dict[str, Any]) -> str:
+        path = os.path.join(self.spill_dir, f"{task_id}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(task, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, Any]:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _spill_done(self, task_id: str, entry: _Entry, task: Dict[str, Any], fut: "asyncio.Future") -> None:
+        if fut.cancelled():
+            return
+        err = fut.exception()
+        if err is not None:
+            logger.warning("task %s not spilled, kept in memory: %s", task_id, err)
+            return
+        self._spilled(task_id, entry, task, fut.result())
+
+    def _spilled(self, task_id: str, entry: _Entry, task: Dict[str, Any], path: str) -> None:
+        if self._entries.get(task_id) is not entry:
+            # evicted while the spill was in flight
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return
+        entry.path = path
+        entry.task = {k: task[k] for k in ("kind", "id", "contextId", "status") if k in task}
+
+    def _drop(self, task_id: str) -> None:
+        entry = self._entries.pop(task_id)
+        if entry.path:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _prune(self) -> None:
+        now = time.time()
+        finished = [tid for tid, e in self._entries.items() if e.finished_at is not None]
+        for tid in finished:
+            if now - self._entries[tid].finished_at > self.ttl_seconds:
+                self._drop(tid)
+        # over capacity: drop oldest finished tasks first (insertion order)
+        for tid in finished:
+            if len(self._entries) <= self.max_tasks:
+                break
+            if tid in self._entries:
+                self._drop(tid)
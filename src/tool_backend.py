@@ -0,0 +1,301 @@
+# src/tool_backend.py
+# 进程内的工具后端：在本地表格上实现 generated_tools.py 里描述的工具，代替远程 law_api。
+# 表优先从列式存储（src/table_store.py，scripts/build_table_store.py 生成）mmap 打开；没有就读
+# 按 schema.py 模型命名的原始文件（CompanyInfo.jsonl / LegalDoc.json ...），在内存里对查询键建哈希索引。
+# 一次工具调用是一次索引探查 + 取列，不走网络，同样的输入永远得到同样的输出。
+# 返回值和错误文案与远程 API 保持一致，agent 的提示词和纠错逻辑不用改。
+from __future__ import annotations
+
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .dataset_reader import JsonArrayReader
+from .table_store import DEFAULT_STORE_DIR, ColumnarTable, TableStore, index_keys, resolve_columns
+
+DEFAULT_TABLES_DIR = os.getenv("TOOL_TABLES_DIR", "data/tables")
+
+NO_DATA = "No data found for the specified identifier."
+BAD_COLUMNS = "One or more specified columns do not exist."
+BAD_INPUT = "工具调用发生错误, 请检查传入工具的参数是否正确!"
+
+
+@dataclass(frozen=True)
+class Lookup:
+    """
+    One table tool: which table, which fields the input is matched against,
+    and whether it returns the first hit (dict) or all hits (list).
+    """
+    table: str
+    keys: Tuple[str, ...]
+    many: bool = False
+    params: Tuple[str, ...] = ("identifier",)
+    multi_valued: bool = False
+
+
+LOOKUPS: Dict[str, Lookup] = {
+    "get_company_info": Lookup("CompanyInfo", ("公司名称", "公司简称", "公司代码")),
+    "get_company_register": Lookup("CompanyRegister", ("公司名称",)),
+    "get_company_register_name": Lookup("CompanyRegister", ("统一社会信用代码",)),
+    "get_sub_company_info": Lookup("SubCompanyInfo", ("公司名称",)),
+    "get_sub_company_info_list": Lookup("SubCompanyInfo", ("关联上市公司全称",), many=True),
+    "get_legal_document": Lookup("LegalDoc", ("案号",)),
+    "get_legal_document_company_list": Lookup("LegalDoc", ("关联公司",), many=True, multi_valued=True),
+    "get_legal_document_law_list": Lookup("LegalDoc", ("原告律师事务所", "被告律师事务所"), many=True,
+                                          multi_valued=True),
+    "get_court_info": Lookup("CourtInfo", ("法院名称",)),
+    "get_court_info_list": Lookup("CourtInfo", ("法院省份", "法院城市", "法院区县"), many=True,
+                                  params=("prov", "city", "county")),
+    "get_court_code": Lookup("CourtCode", ("法院名称", "法院代字")),
+    "get_lawfirm_info": Lookup("LawfirmInfo", ("律师事务所名称",)),
+    "get_lawfirm_info_list": Lookup("LawfirmInfo", ("事务所省份", "事务所城市", "事务所区县"), many=True,
+                                    params=("prov", "city", "county")),
+    "get_lawfirm_log": Lookup("LawfirmLog", ("律师事务所名称",)),
+    "get_address_info": Lookup("AddrInfo", ("地址",)),
+    "get_legal_abstract": Lookup("LegalAbstract", ("案号",)),
+    "get_restriction_case": Lookup("RestrictionCase", ("案号",)),
+    "get_restriction_case_company_list": Lookup("RestrictionCase", ("限制高消费企业名称",), many=True),
+    "get_restriction_case_court_list": Lookup("RestrictionCase", ("执行法院",), many=True),
+    "get_finalized_case": Lookup("FinalizedCase", ("案号",)),
+    "get_finalized_case_company_list": Lookup("FinalizedCase", ("终本公司名称",), many=True),
+    "get_finalized_case_court_list": Lookup("FinalizedCase", ("执行法院",), many=True),
+    "get_dishonesty_case": Lookup("DishonestyCase", ("案号",)),
+    "get_dishonesty_case_company_list": Lookup("DishonestyCase", ("失信被执行公司名称",), many=True),
+    "get_dishonesty_case_court_list": Lookup("DishonestyCase", ("执行法院",), many=True),
+    "get_administrative_case": Lookup("AdministrativeCase", ("案号",)),
+    "get_administrative_case_company_list": Lookup("AdministrativeCase", ("行政处罚公司名称",), many=True),
+    "get_administrative_case_court_list": Lookup("AdministrativeCase", ("处罚单位",), many=True),
+}
+
+RETRIEVERS = ("legal_article_retriever", "legal_case_retriever", "legal_knowledge_retriever")
+
+
+def index_specs(table: str) -> List[Tuple[str, bool]]:
+    """
+    (field, multi_valued) pairs the tools probe on `table`, in LOOKUPS order.
+    """
+    out: List[Tuple[str, bool]] = []
+    for spec in LOOKUPS.values():
+        if spec.table == table:
+            for field in spec.keys:
+                if (field, spec.multi_valued) not in out:
+                    out.append((field, spec.multi_valued))
+    return out
+
+
+def iter_table_rows(path: str) -> Iterator[Dict[str, Any]]:
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from JsonArrayReader(path)
+
+
+def find_table_file(tables_dir: str, table: str) -> Optional[str]:
+    for ext in (".jsonl", ".json"):
+        p = os.path.join(tables_dir, table + ext)
+        if os.path.exists(p):
+            return p
+    return None
+
+
+def _number(x: Any) -> float:
+    if isinstance(x, (int, float)):
+        return x
+    s = str(x).strip().replace(",", "").replace("，", "")
+    for unit in ("元", "%"):
+        s = s.rstrip(unit)
+    v = float(s)
+    return int(v) if v.is_integer() and "." not in s else v
+
+
+def _numbers(values: Any) -> List[float]:
+    if not isinstance(values, (list, tuple)):
+        raise ValueError("identifier must be a list")
+    return [_number(v) for v in values]
+
+
+def _product(values: Sequence[float]) -> float:
+    out = 1
+    for v in values:
+        out *= v
+    return out
+
+
+def _truthy(v: Any) -> bool:
+    return v is True or str(v).strip().lower() == "true"
+
+
+# 计算类工具：纯函数，不依赖表
+MATH_TOOLS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "get_sum": lambda a: sum(_numbers(a["identifier"])),
+    "get_multiplication": lambda a: _product(_numbers(a["identifier"])),
+    "get_rank": lambda a: sorted(a["identifier"], key=_number, reverse=_truthy(a.get("is_desc", "False"))),
+    "get_subtraction": lambda a: _number(a["minuend"]) - _number(a["subtrahend"]),
+    "get_division": lambda a: _number(a["dividend"]) / _number(a["divisor"]),
+}
+
+
+class RowTable:
+    """
+    Rows of one table plus hash indexes on its lookup fields
+    (normalized key -> ascending row ids).
+    """
+
+    def __init__(self, name: str, rows: List[Dict[str, Any]]):
+        self.name = name
+        self.rows = rows
+        self.columns: List[str] = list(rows[0].keys()) if rows else []
+        self._indexes: Dict[Tuple[str, bool], Dict[str, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def index(self, field: str, multi_valued: bool = False) -> Dict[str, List[int]]:
+        key = (field, multi_valued)
+        idx = self._indexes.get(key)
+        if idx is None:
+            idx = defaultdict(list)
+            for i, row in enumerate(self.rows):
+                for k in index_keys(row.get(field), multi_valued):
+                    idx[k].append(i)
+            idx = self._indexes[key] = dict(idx)
+        return idx
+
+    def lookup(self, field: str, key: Any, multi_valued: bool = False) -> List[int]:
+        keys = index_keys(key)
+        return self.index(field, multi_valued).get(keys[0], []) if keys else []
+
+    def resolve_columns(self, requested: Optional[Sequence[str]]) -> Optional[List[str]]:
+        return resolve_columns(self.columns, requested)
+
+    def project(self, row_ids: Sequence[int], columns: Sequence[str]) -> List[Dict[str, Any]]:
+        return [{c: self.rows[i].get(c) for c in columns} for i in row_ids]
+
+
+class LocalToolBackend:
+    """
+    Deterministic in-process implementation of the law_api tools.
+
+    Tables are opened lazily on first use: from the columnar store under
+    `store_dir` when it has the table, else from the raw file in `tables_dir`
+    (indexed in memory). The three
+    retriever tools are served from a GreenRAG collection's BM25 index when
+    `retriever_index` points at one; otherwise they are reported unsupported
+    and the caller may fall back to the remote API.
+    """
+
+    def __init__(self, tables_dir: str = DEFAULT_TABLES_DIR, retriever_index: Optional[str] = None,
+                 store_dir: str = DEFAULT_STORE_DIR):
+        self.tables_dir = tables_dir
+        self.store = TableStore(store_dir)
+        self.retriever_index = retriever_index if retriever_index is not None else os.getenv("TOOL_RETRIEVER_INDEX")
+        self._tables: Dict[str, Optional[Union[ColumnarTable, RowTable]]] = {}
+        self._retriever = None
+
+    # -----------------------------
+    # tables
+    # -----------------------------
+    def table(self, name: str) -> Optional[Union[ColumnarTable, RowTable]]:
+        if name not in self._tables:
+            table = self.store.table(name)
+            if table is None:
+                path = find_table_file(self.tables_dir, name)
+                table = RowTable(name, list(iter_table_rows(path))) if path else None
+            self._tables[name] = table
+        return self._tables[name]
+
+    def supports(self, name: str) -> bool:
+        if name in MATH_TOOLS:
+            return True
+        if name in LOOKUPS:
+            return self.table(LOOKUPS[name].table) is not None
+        if name in RETRIEVERS:
+            return bool(self.retriever_index) and os.path.isdir(self.retriever_index)
+        return False
+
+    # -----------------------------
+    # dispatch
+    # -----------------------------
+    def call(self, name: str, args: Any) -> Any:
+        """
+        Run one tool. Bad input yields the same error strings the remote API
+        returns, so agent prompts and repair hints stay valid.
+        """
+        try:
+            if name in MATH_TOOLS:
+                return MATH_TOOLS[name](args)
+            if name in LOOKUPS:
+                return self._lookup(LOOKUPS[name], args)
+            if name in RETRIEVERS:
+                return self._retrieve(name, args)
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            return BAD_INPUT
+        raise KeyError(f"unknown tool: {name}")
+
+    def _lookup(self, spec: Lookup, args: Any) -> Any:
+        table = self.table(spec.table)
+        if table is None:
+            raise KeyError(f"table not loaded: {spec.table}")
+        if not isinstance(args, dict):
+            args = {"identifier": args}
+        columns = table.resolve_columns(args.get("columns"))
+        if columns is None:
+            return BAD_COLUMNS
+
+        if len(spec.params) > 1:
+            # 省 / 市 / 区三个条件取交集
+            hits: Optional[set] = None
+            for param, field in zip(spec.params, spec.keys):
+                ids = set(int(i) for i in table.lookup(field, args[param]))
+                hits = ids if hits is None else hits & ids
+            row_ids = sorted(hits or ())
+        else:
+            parts = [table.lookup(field, args["identifier"], spec.multi_valued) for field in spec.keys]
+            # 单键直接用索引返回的行号（已升序）；多键（名称 / 简称 / 代码）合并去重
+            row_ids = parts[0] if len(parts) == 1 else sorted(set().union(*(map(int, p) for p in parts)))
+
+        if not len(row_ids):
+            return NO_DATA
+        if spec.many:
+            return table.project(row_ids, columns)
+        return table.project(row_ids[:1], columns)[0]
+
+    def _retrieve(self, name: str, args: Any) -> Any:
+        if self._retriever is None:
+            from .lexical_index import LexicalIndex
+            from .vector_index import VectorIndex
+
+            self._retriever = (LexicalIndex(self.retriever_index), VectorIndex(self.retriever_index))
+        lexical, vectors = self._retriever
+        if isinstance(args, dict):
+            query, k = args["identifier"], int(args.get("k", 1 if name == "legal_case_retriever" else 5))
+        else:
+            query, k = args, 1 if name == "legal_case_retriever" else 5
+        rows, _ = lexical.search(str(query), top_k=max(1, k))
+        if not len(rows):
+            return NO_DATA
+        return [r["document"] for r in vectors.records(rows.tolist())]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tables_dir": self.tables_dir,
+            "store_dir": self.store.root,
+            "tables": {name: {"rows": len(t), "columnar": isinstance(t, ColumnarTable)}
+                       for name, t in self._tables.items() if t is not None},
+            "retriever_index": self.retriever_index,
+        }
+
+
+_DEFAULT_BACKEND: Optional[LocalToolBackend] = None
+
+
+def get_local_backend() -> LocalToolBackend:
+    global _DEFAULT_BACKEND
+    if _DEFAULT_BACKEND is None:
+        _DEFAULT_BACKEND = LocalToolBackend()
+    return _DEFAULT_BACKEND
@@ -0,0 +1,214 @@
+# src/tool_cache.py
+# 工具调用结果的记忆化：工具是确定性的（README "Deterministic Tools"），同一个工具 + 同样的输入永远得到同样的结果，
+# 所以一道题里重复的调用、300 道题之间重复查询的同一家上市公司都可以直接复用上一次的结果。
+# 进程内 LRU 在前，可选的 SQLite 持久层在后（跨进程 / 跨次运行复用）；只缓存确定性的结果，
+# 网络失败之类的错误不缓存。命中统计按题目（question_scope）单独累计。
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_SIZE", "4096"))
+DEFAULT_CACHE_PATH = os.getenv("TOOL_CACHE_PATH", "output/tool_cache.sqlite")
+DEFAULT_STORE_MAX_ENTRIES = 200_000
+
+# 当前题目的命中统计；线程池里执行的调用通过 contextvars.copy_context 带上同一个 dict
+_QUESTION_STATS: ContextVar[Optional[Dict[str, int]]] = ContextVar("tool_cache_question_stats", default=None)
+
+
+def make_key(name: str, tool_input: Any) -> str:
+    """
+    Tool name + canonical JSON of the (already formatted) input: key order
+    and whitespace don't matter, list order does.
+    """
+    return name + "\x00" + json.dumps(tool_input, ensure_ascii=False, sort_keys=True,
+                                      separators=(",", ":"), default=str)
+
+
+def new_question_stats() -> Dict[str, int]:
+    return {"calls": 0, "hits": 0, "store_hits": 0, "misses": 0}
+
+
+@contextmanager
+def question_scope(stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, int]]:
+    """
+    Attribute cache lookups made inside the block to one question.
+    """
+    stats = stats if stats is not None else new_question_stats()
+    token = _QUESTION_STATS.set(stats)
+    try:
+        yield stats
+    finally:
+        _QUESTION_STATS.reset(token)
+
+
+class ToolResultStore:
+    """
+    SQLite-backed key/value store with size-bounded LRU eviction; the same
+    layout as JudgeCache, in its own file.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_STORE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tool_cache_lru ON tool_cache(last_used)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM tool_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM tool_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE tool_cache SET last_used = ? WHERE key = ?", (time.time_ns(), key))
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            now = time.time_ns()
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO tool_cache (key, value, last_used) VALUES (?, ?, ?)",
+                (key, value, now),
+            )
+            if cur.rowcount == 1:
+                self._count += 1
+            else:
+                self._conn.execute(
+                    "UPDATE tool_cache SET value = ?, last_used = ? WHERE key = ?",
+                    (value, now, key),
+                )
+            if self._count > self.max_entries:
+                # Evict down to 90% of capacity so we don't pay a DELETE on every insert once full.
+                target = int(self.max_entries * 0.9)
+                n = self._count - target
+                self._conn.execute(
+                    "DELETE FROM tool_cache WHERE key IN "
+                    "(SELECT key FROM tool_cache ORDER BY last_used ASC LIMIT ?)",
+                    (n,),
+                )
+                self.evictions += n
+                self._count = target
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ToolCache:
+    """
+    Memoizes tool calls: an in-memory LRU of JSON-encoded results, backed by
+    an optional ToolResultStore. Values are stored encoded, so every hit
+    returns a fresh object the caller may mutate.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, store: Optional[ToolResultStore] = None,
+                 cacheable: Optional[Callable[[Any], bool]] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.store = store
+        self.cacheable = cacheable or (lambda result: True)
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, field: str) -> None:
+        setattr(self, field, getattr(self, field) + 1)
+        q = _QUESTION_STATS.get()
+        if q is not None:
+            q[field] += 1
+            if field != "store_hits":
+                q["calls"] += 1
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            text = self._lru.get(key)
+            if text is not None:
+                self._lru.move_to_end(key)
+                self._count("hits")
+                return True, json.loads(text)
+        if self.store is not None:
+            text = self.store.get(key)
+            if text is not None:
+                with self._lock:
+                    self._remember(key, text)
+                    self._count("store_hits")
+                    self._count("hits")
+                return True, json.loads(text)
+        with self._lock:
+            self._count("misses")
+        return False, None
+
+    def put(self, key: str, result: Any) -> None:
+        if not self.cacheable(result):
+            return
+        try:
+            text = json.dumps(result, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._remember(key, text)
+        if self.store is not None:
+            self.store.put(key, text)
+
+    def _remember(self, key: str, text: str) -> None:
+        self._lru[key] = text
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def call(self, name: str, tool_input: Any, fn: Callable[[str, Any], Any]) -> Any:
+        """
+        fn(name, tool_input), memoized.
+        """
+        key = make_key(name, tool_input)
+        hit, result = self.get(key)
+        if hit:
+            return result
+        result = fn(name, tool_input)
+        self.put(key, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "store": {"path": self.store.path, "entries": len(self.store)} if self.store is not None else None,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
@@ -1,11 +1,55 @@
 # 实现 "Traffic Light" & "HalluGraph" 审计器
 import json
+import threading
 from .utils import LLM, parse_json_from_response
  # 复用 agents.py 里的 LLM 调用函数和增强的 JSON 解析
+from .judge_cache import make_key
+from .llm_usage import note_cache_hit
+
+SIGNALS = ("GREEN", "YELLOW", "RED")
+
+
+def normalize_audit(obj):
+    """
+    批量结果里的一条：signal 合法、score 可转成数字才算有效，否则返回 None（该条退回逐条打分）
+    """
+    if not isinstance(obj, dict):
+        return None
+    signal = str(obj.get("signal") or "").strip().upper()
+    if signal not in SIGNALS:
+        return None
+    try:
+        score = float(obj.get("score"))
+    except (TypeError, ValueError):
+        return None
+    return {"signal": signal, "reason": str(obj.get("reason") or ""), "score": score}
+
 
 class TrafficLightAuditor:
-    def __init__(self, model_name="glm-4-flash"):
+    def __init__(self, model_name="glm-4-flash", cache=None):
         self.model_name = model_name
+        self.cache = cache  # 可选的 JudgeCache；None 表示每次都真实调用 judge
+        # 批量打分统计：批次数、批内条数、退回逐条打分的条数
+        self.batch_stats = {"batches": 0, "items": 0, "fallbacks": 0}
+        self._stats_lock = threading.Lock()
+
+    def _llm(self, prompt):
+        """
+        带缓存的 judge 调用：key = hash(模型名 + 完整 prompt)。返回 (回复, 是否命中缓存)；
+        新回复不在这里写缓存，由调用方确认能解析成有效结果后再 _remember，
+        否则一次截断 / 乱码的回复会被永久重放。
+        """
+        if self.cache is None:
+            return LLM(prompt, self.model_name), False
+        cached = self.cache.get(make_key(self.model_name, prompt))
+        if cached is not None:
+            note_cache_hit()
+            return cached, True
+        return LLM(prompt, self.model_name), False
+
+    def _remember(self, prompt, result):
+        if self.cache is not None:
+            self.cache.put(make_key(self.model_name, prompt), result)
         
     def extract_triples(self, text):
         """
@@ -17,7 +61,14 @@ class TrafficLightAuditor:
         Text: {text}
         Output format: JSON list of triples.
         """
-        return LLM(prompt, self.model_name)
+        result, hit = self._llm(prompt)
+        if not hit:
+            try:
+                parse_json_from_response(result, repair=False, expect=list)
+                self._remember(prompt, result)
+            except json.JSONDecodeError:
+                pass
+        return result
 
     def evaluate_signal(self, query, agent_response, ground_truth_docs):
         """
@@ -42,8 +93,86 @@ class TrafficLightAuditor:
         Output JSON: {{ "signal": "GREEN/YELLOW/RED", "reason": "...", "score": 0-1 }}
         """
         
-        result = LLM(prompt, self.model_name)
+        result, hit = self._llm(prompt)
         try:
-            return parse_json_from_response(result)
+            # 被 max_tokens 截断的判决不补齐：补出来的对象没有 score，会被当成有效判决
+            parsed = parse_json_from_response(result, repair=False, expect=dict)
         except:
+            parsed = None
+        if not isinstance(parsed, dict):
             return {"signal": "RED", "reason": "Parse Error", "score": 0}
+        if not hit and normalize_audit(parsed) is not None:
+            self._remember(prompt, result)
+        return parsed
+
+    def evaluate_batch(self, items):
+        """
+        批量打分：把 K 条 (query, agent_response, ground_truth_docs) 放进同一个 prompt，
+        说明和输出格式只付一次 token；要求模型输出带 id 的 JSON 数组。
+        结果里缺失或格式不对的条目退回 evaluate_signal 逐条打分。返回与 items 同序的结果列表。
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [self.evaluate_signal(q, a, d) for q, a, d in items]
+
+        blocks = []
+        for i, (query, agent_response, ground_truth_docs) in enumerate(items, 1):
+            gt_text = "\n".join(ground_truth_docs)
+            blocks.append(f"""
+        [Item {i}]
+        [Query]: {query}
+        [Agent Response]: {agent_response}
+        [Ground Truth Laws/Facts]: {gt_text}
+        """)
+
+        prompt = f"""
+        You are a Senior Legal Auditor (Green Agent).
+
+        Audit each of the {len(items)} items below independently; never let one item's content affect another's verdict.
+        {"".join(blocks)}
+        Task (for every item):
+        1. Compare the Agent Response against that item's Ground Truth.
+        2. Assign a Traffic Light Signal:
+           - GREEN: Answer is correct AND fully supported by Ground Truth.
+           - YELLOW: Answer is correct but reasoning/citations are missing or vague.
+           - RED: Answer contradicts Ground Truth OR hallucinates non-existent laws.
+
+        Output a JSON array with exactly one object per item, ids 1 to {len(items)}:
+        [{{ "id": 1, "signal": "GREEN/YELLOW/RED", "reason": "...", "score": 0-1 }}, ...]
+        """
+
+        # LLM 调用本身的错误（限流 / 超时 / 网络）直接抛给调用方重试，不拆成 K 次单条调用；
+        # 只有回复解析不出来、或个别条目缺失 / 格式不对时才逐条补打分
+        rsp, hit = self._llm(prompt)
+        by_id = {}
+        try:
+            # 只认元素里有对象的数组
+            parsed = parse_json_from_response(rsp, expect=list, accept=lambda v: any(isinstance(x, dict) for x in v))
+        except json.JSONDecodeError:
+            try:
+                # 有的模型把数组包在 {"results": [...]} 里
+                parsed = parse_json_from_response(rsp, expect=dict)
+            except json.JSONDecodeError:
+                parsed = None
+        if isinstance(parsed, dict):
+            parsed = parsed.get("results") or parsed.get("items") or [parsed]
+        for obj in parsed if isinstance(parsed, list) else []:
+            if isinstance(obj, dict) and str(obj.get("id", "")).strip() not in by_id:
+                by_id[str(obj.get("id", "")).strip()] = normalize_audit(obj)
+        # 每条都有有效判决才写缓存：缺条目的回复下次应重新请求，而不是重放后再逐条补打分
+        if not hit and all(by_id.get(str(i)) is not None for i in range(1, len(items) + 1)):
+            self._remember(prompt, rsp)
+
+        results = []
+        fallbacks = 0
+        for i, (query, agent_response, ground_truth_docs) in enumerate(items, 1):
+            audit = by_id.get(str(i))
+            if audit is None:
+                fallbacks += 1
+                audit = self.evaluate_signal(query, agent_response, ground_truth_docs)
+            results.append(audit)
+        with self._stats_lock:
+            self.batch_stats["batches"] += 1
+            self.batch_stats["items"] += len(items)
+            self.batch_stats["fallbacks"] += fallbacks
+        return results
@@ -1,8 +1,18 @@
 from zhipuai import ZhipuAI
+from zhipuai import APIConnectionError, APIInternalError, APIReachLimitError, APIServerFlowExceedError
+import httpx
 import json
+import logging
+import random
 import re
 import os
+import threading
+import time
+from typing import Optional
 import src.config as config
+from src.llm_usage import llm_caller, record_llm_call
+from src.json_scan import loads_tolerant
+from src.table_router import TableRouter
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -11,32 +21,100 @@ load_dotenv()
 # 配置智谱 AI
 zhipuai_api_key = os.getenv("ZHIPUAI_API_KEY", "your_api_key")
 
-def LLM(query, model_name):
+# 连接池大小：并发打分时每个模型最多保持的 keep-alive 连接数
+LLM_POOL_MAXSIZE = int(os.getenv("LLM_POOL_MAXSIZE", "32"))
+
+# LLM(prefix=...) 的静态前缀（说明 / 示例 / 工具 / 表格）作为单独的 system 消息发送，便于服务端前缀缓存；
+# 设为 0 则和以前一样拼进同一条 user 消息（两种方式文本完全相同）
+LLM_PREFIX_AS_SYSTEM = os.getenv("LLM_PREFIX_AS_SYSTEM", "1") != "0"
+
+# 重试由 LLM() 自己做（SDK 内部重试关掉），这样每次调用的重试次数和总耗时都能记进 src/llm_usage.py
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 8.0
+# 超时（APITimeoutError 是 APIConnectionError 的子类）/ 连接失败 / 限流 / 服务端错误可以重试；参数、鉴权错误直接抛出
+_RETRYABLE = (APIConnectionError, APIReachLimitError, APIInternalError, APIServerFlowExceedError)
+
+# 进程级 client 注册表：model_name -> ZhipuAI
+# 同一模型复用同一个 client（以及它的 HTTP 连接池），避免每次调用都重新握手 TLS
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_llm_client(model_name):
+    """
+    按模型名获取（或懒创建）共享的 ZhipuAI client，线程安全
+    """
+    client = _CLIENTS.get(model_name)
+    if client is not None:
+        return client
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(model_name)
+        if client is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=LLM_POOL_MAXSIZE,
+                    max_keepalive_connections=LLM_POOL_MAXSIZE,
+                    keepalive_expiry=60.0,
+                ),
+            )
+            client = ZhipuAI(api_key=zhipuai_api_key, http_client=http_client, max_retries=0)
+            _CLIENTS[model_name] = client
+    return client
+
+
+def LLM(query, model_name, prefix=None):
     """
     统一的 LLM 调用接口，使用智谱 AI
+    prefix: 跨多次调用不变的提示词前缀（agent 的说明 / 示例 / 工具描述），query 是本次新增的部分
     """
     # 如果传入的是其他模型名，统一使用 glm-4-flash
     if model_name.find('glm') == -1:
         model_name = "glm-4-flash"
     
-    # 使用智谱 AI
-    client = ZhipuAI(api_key=zhipuai_api_key)
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[
+    # 使用智谱 AI（复用进程级 client）
+    client = get_llm_client(model_name)
+    if prefix and LLM_PREFIX_AS_SYSTEM:
+        messages = [
+            {"role": "system", "content": prefix},
             {"role": "user", "content": query},
-        ],
-        stream=False,
-        max_tokens=2000,
-        temperature=0,
-        do_sample=False,
-    )
+        ]
+    else:
+        messages = [
+            {"role": "user", "content": (prefix or "") + query},
+        ]
+    t0 = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            response = client.chat.completions.create(
+                model=model_name,
+                messages=messages,
+                stream=False,
+                max_tokens=2000,
+                temperature=0,
+                do_sample=False,
+            )
+            break
+        except Exception as e:
+            if not isinstance(e, _RETRYABLE) or attempt >= LLM_MAX_RETRIES:
+                record_llm_call(model_name, latency_ms=(time.perf_counter() - t0) * 1000.0,
+                                retries=attempt, error=True)
+                raise
+            # 带抖动的指数退避，并发打分时各线程的重试不会挤在同一时刻
+            time.sleep(min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.5))
+            attempt += 1
 
     # 记录 token 消耗数
     input_token = response.usage.prompt_tokens
     output_token = response.usage.completion_tokens
     used_token = response.usage.total_tokens
 
+    # 计入当前题目 / 运行的累加器（调用方由 llm_caller 标注）
+    record_llm_call(model_name, input_token, output_token,
+                    latency_ms=(time.perf_counter() - t0) * 1000.0, retries=attempt)
+
+    # 兼容旧代码的进程级累计值（不分题目、不加锁，仅供参考）
     config.this_question_input_token += input_token
     config.this_question_output_token += output_token
     config.this_question_total_token += used_token
@@ -45,61 +123,22 @@ def LLM(query, model_name):
     return response.choices[0].message.content.strip()
     
 
-import json
-import re
+logger = logging.getLogger(__name__)
 
-def parse_json_from_response(rsp: str):
+
+def parse_json_from_response(rsp: str, repair: bool = True, expect: Optional[type] = None, accept=None):
     """
-    强壮的 JSON 解析函数：能处理 Markdown、纯文本以及包含废话的回答
+    从模型回答里取出 JSON：Markdown 代码块、夹杂说明文字、全角标点、单引号、被截断的输出都能处理（见 src/json_scan.py）
+    repair=False 时不补齐被截断的输出（截断的判决缺字段，应当按解析失败处理）
+    expect=dict / list 时只取该类型的值（跳过正文里 “第[577]条” 这类带括号的文字），accept 可再加一道检查
+    解析失败抛出 json.JSONDecodeError
     """
-    print(f"DEBUG: LLM Raw Response:\n{rsp}\n----------------") # 关键调试信息
-    
-    json_str = None
-    
-    # 策略 1: 尝试提取 Markdown 代码块 (无论是否标记为 json)
-    # 匹配 ```json ... ``` 或 ``` ... ```
-    pattern = r"```(?:json|JSON)?(.*?)```"
-    match = re.search(pattern, rsp, re.DOTALL)
-    
-    if match:
-        json_str = match.group(1).strip()
-    else:
-        # 策略 2: 没找到代码块？尝试寻找最外层的 {}
-        # 这能处理："Here is the result: { ... } Hope it helps."
-        start = rsp.find('{')
-        end = rsp.rfind('}')
-        if start != -1 and end != -1:
-            json_str = rsp[start:end+1]
-        else:
-            # 策略 3: 死马当活马医，尝试解析整个字符串
-            json_str = rsp.strip()
-
-    # 统一的数据清洗（处理中文括号等常见问题）
-    # 注意：直接把 ' 换成 " 有风险（如果内容里有 don't），但在报错重试里做是可以的
-    
+    logger.debug("LLM raw response:\n%s", rsp)
     try:
-        # 尝试 1: 直接解析提取出的字符串
-        return json.loads(json_str)
+        return loads_tolerant(rsp, repair=repair, expect=expect, accept=accept)
     except json.JSONDecodeError:
-        try:
-            # 尝试 2: 清洗数据后再解析
-            # 替换中文括号，处理 Python 风格的单引号字典
-            cleaned_str = json_str.replace('(', '（').replace(')', '）').replace("'", '"')
-            return json.loads(cleaned_str)
-        except json.JSONDecodeError as e:
-            # 尝试 3: 处理常见的列表/字典截断问题（你的旧逻辑）
-            try:
-                match = re.search(r"\{(.*?)\}", json_str, re.DOTALL)
-                if match:
-                    content = "[{" + match.group(1) + "}]"
-                    return json.loads(content)
-            except:
-                pass
-            
-            # 彻底失败，打印报错
-            print(f"ERROR: JSON Parsing Failed completely.\nExtracted String: {json_str}")
-            # 抛出异常，让上层知道这题没分
-            raise e
+        logger.warning("JSON parsing failed; response starts with: %r", (rsp or "")[:200])
+        raise
     
 
 from .generated_tools import *
@@ -120,52 +159,63 @@ TABLE_PROMPT = """根据用户问题选择需要使用的数据表。
 请返回一个JSON格式的响应，包含"名称"字段，值为需要使用的表名列表。
 """
 
-def filter_table_and_tool(query, model_name):
+# 选表方式: local = 关键词路由, 命不中时再问 LLM; llm = 每题都问 LLM（原来的做法）; local_only = 从不调用 LLM,
+# 命不中时用全部表
+TABLE_ROUTER_MODE = os.getenv("TABLE_ROUTER", "local")
+
+_TABLE_ROUTER = None
+_TABLE_ROUTER_LOCK = threading.Lock()
+
+
+def get_table_router():
+    """
+    进程级 TableRouter：字段索引和关键词正则只在第一次用到时编译一次
+    """
+    global _TABLE_ROUTER
+    if _TABLE_ROUTER is None:
+        with _TABLE_ROUTER_LOCK:
+            if _TABLE_ROUTER is None:
+                fields = {name: build_enum_list(enum) for name, enum in table_map.items()}
+                _TABLE_ROUTER = TableRouter(fields, Tools_map)
+    return _TABLE_ROUTER
+
+
+def _llm_pick_tables(query, model_name):
+    """
+    让 LLM 从全部表里选，最多 3 次；都失败返回 None
+    """
     for attempt in range(3):
         try:
             # Use database_schema if available, otherwise empty string
             db_schema = database_schema if 'database_schema' in globals() else ""
             table_prompt = TABLE_PROMPT.format(question=query, database_schema=db_schema)
-            table_answer = LLM(table_prompt, model_name)
-            table_response = parse_json_from_response(table_answer)
-            table = table_response["名称"]
-            break
-        except:
-            table = [
-                "CompanyInfo",
-                "CompanyRegister",
-                "SubCompanyInfo",
-                "LegalDoc",
-                "CourtInfo",
-                "CourtCode",
-                "LawfirmInfo",
-                "LawfirmLog",
-                "AddrInfo",
-                "LegalAbstract",
-                "RestrictionCase",
-                "FinalizedCase",
-                "DishonestyCase",
-                "AdministrativeCase"
-            ]
-    print(f"用到的table: {table}")
-    if "CompanyInfo" not in table:
-        table.append("CompanyInfo")
-    if "AddrInfo" not in table:
-        table.append("AddrInfo")
-
-    table_used_prompt = ""
-    used_tools = []
-    for i in table:
-        emun = table_map[i]
-        one_prompt = f"""
-{i}表格有下列字段:
-{build_enum_list(emun)}
--------------------------------------
-"""
-        table_used_prompt += one_prompt + "\n"
-        used_tools.extend(Tools_map[i])
+            with llm_caller("table_router"):
+                table_answer = LLM(table_prompt, model_name)
+            table_response = parse_json_from_response(table_answer, expect=dict)
+            return list(table_response["名称"])
+        except Exception:
+            continue
+    return None
+
+
+def filter_table_and_tool(query, model_name):
+    router = get_table_router()
+    if TABLE_ROUTER_MODE == "llm":
+        route = None
+    else:
+        route = router.route(query)
+
+    if route is not None and not route.ambiguous:
+        table = route.tables
+    elif TABLE_ROUTER_MODE == "local_only":
+        table = router.select(router.tables)
+    else:
+        picked = _llm_pick_tables(query, model_name)
+        table = router.select(picked if picked else router.tables)
+    print(f"用到的table: {list(table)}")
 
-    return used_tools, table_used_prompt
+    # CompanyInfo / AddrInfo 总会带上（router.select 已保证）；同一组表复用同一个渲染好的字符串
+    return router.tools_for(table), router.table_prompt(table)
 
 from termcolor import colored
 
@@ -0,0 +1,231 @@
+# src/vector_index.py
+# 预计算的语料向量索引：向量存成 float32 矩阵文件，启动时 mmap，检索就是一次矩阵乘 + top-k；
+# 文档和 metadata 存在 jsonl sidecar 里，按字节偏移按需读取。
+# 可选两阶段检索（Matryoshka）：先在截断到前 d 维、重新归一化的矩阵上粗排全库，
+# 再用全维向量只对 top-N 候选精排。
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+HEADER = "index.json"
+VECTORS = "vectors.f32"
+META = "meta.jsonl"
+META_IDX = "meta.idx"
+PREFIX = "prefix-"
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    rows = np.argpartition(-scores, k - 1)[:k]
+    rows = rows[np.argsort(-scores[rows], kind="stable")]
+    return rows, scores[rows]
+
+
+class VectorIndex:
+    """
+    Append-only on-disk index in one directory:
+
+      index.json   {"n", "dim", "embedder", "meta_bytes"}; written last, so a
+                   crash mid-append leaves the previous state readable
+      vectors.f32  row-major float32 (n, dim), L2-normalized rows, mmapped
+      meta.jsonl   one {"id", "document", "metadata"} per row
+      meta.idx     int64 byte offset of each meta.jsonl row
+      prefix-<d>.f32  float32 (n, d): first d dims of each row, re-normalized;
+                   derived from vectors.f32 on first two-stage search and
+                   extended incrementally after appends
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self.n = 0
+        self.dim = 0
+        self.embedder: Optional[str] = None
+        self._meta_bytes = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._meta_offsets = array("q")
+        self._prefix: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        try:
+            with open(self._file(HEADER), "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self.n = int(header["n"])
+        self.dim = int(header["dim"])
+        self.embedder = header.get("embedder")
+        self._meta_bytes = int(header.get("meta_bytes", 0))
+        self._meta_offsets = array("q")
+        if self.n:
+            with open(self._file(META_IDX), "rb") as f:
+                self._meta_offsets.fromfile(f, self.n)
+            self._vectors = np.memmap(self._file(VECTORS), dtype=np.float32, mode="r", shape=(self.n, self.dim))
+        else:
+            self._vectors = None
+        self._prefix = {}
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self._vectors
+
+    def append(
+        self,
+        vectors: np.ndarray,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        embedder: Optional[str] = None,
+    ) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids) or len(ids) != len(documents):
+            raise ValueError("vectors, ids and documents must have the same length")
+        if self.n and vectors.shape[1] != self.dim:
+            raise ValueError(f"dim mismatch: index has {self.dim}, got {vectors.shape[1]}")
+        if self.n and embedder and self.embedder and embedder != self.embedder:
+            raise ValueError(f"embedder mismatch: index built with {self.embedder}, got {embedder}")
+        metadatas = metadatas or [{} for _ in ids]
+
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors = None  # drop the mmap before growing the file
+
+        # cut off anything a crashed append left past the committed header
+        with open(self._file(VECTORS), "ab") as f:
+            f.truncate(self.n * self.dim * 4)
+            f.write(vectors.tobytes())
+        offsets = array("q")
+        with open(self._file(META), "ab") as f:
+            f.truncate(self._meta_bytes)
+            pos = self._meta_bytes
+            for _id, doc, meta in zip(ids, documents, metadatas):
+                line = (json.dumps({"id": str(_id), "document": doc, "metadata": meta}, ensure_ascii=False) + "\n").encode("utf-8")
+                offsets.append(pos)
+                f.write(line)
+                pos += len(line)
+        with open(self._file(META_IDX), "ab") as f:
+            f.truncate(self.n * 8)
+            offsets.tofile(f)
+
+        header = {
+            "n": self.n + len(ids),
+            "dim": int(vectors.shape[1]),
+            "embedder": self.embedder or embedder,
+            "meta_bytes": pos,
+        }
+        tmp = self._file(HEADER) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp, self._file(HEADER))
+        self._load()
+
+    def clear(self) -> None:
+        names = [HEADER, VECTORS, META, META_IDX]
+        if os.path.isdir(self.path):
+            names += [n for n in os.listdir(self.path) if n.startswith(PREFIX)]
+        for name in names:
+            try:
+                os.remove(self._file(name))
+            except OSError:
+                pass
+        self._reset()
+
+    def prefix(self, dims: int) -> np.ndarray:
+        """
+        (n, dims) matrix of truncated, re-normalized rows for the coarse pass.
+
+        Rows already on disk are mmapped; rows appended since are computed from
+        vectors.f32 and added to the sidecar, so an append never rebuilds it.
+        """
+        if dims in self._prefix:
+            return self._prefix[dims]
+        path = self._file(f"{PREFIX}{dims}.f32")
+        row_bytes = dims * 4
+        try:
+            have = os.path.getsize(path) // row_bytes
+        except OSError:
+            have = 0
+        if have > self.n:
+            have = 0  # index was rebuilt smaller; start over
+        if have < self.n:
+            with open(path, "r+b" if have else "wb") as f:
+                f.truncate(have * row_bytes)
+                f.seek(have * row_bytes)
+                step = max(1, (64 << 20) // (self.dim * 4))  # ~64MB of source rows per block
+                for i in range(have, self.n, step):
+                    block = np.array(self.vectors[i:i + step, :dims], dtype=np.float32)
+                    norms = np.linalg.norm(block, axis=1, keepdims=True)
+                    norms[norms == 0] = 1.0
+                    f.write((block / norms).tobytes())
+        mat = np.memmap(path, dtype=np.float32, mode="r", shape=(self.n, dims)) if self.n else np.zeros((0, dims), np.float32)
+        self._prefix[dims] = mat
+        return mat
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 5,
+        prefilter_dims: Optional[int] = None,
+        candidates: int = 100,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Inner-product top-k. Returns (rows, scores), best first; scores are
+        always full-dimension.
+
+        With `prefilter_dims` < dim, the whole corpus is first scored on the
+        truncated prefix matrix and only the best `candidates` rows are
+        rescored on full vectors. Otherwise (or when the corpus is no larger
+        than `candidates`) the search is exact.
+        """
+        if not self.n:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        k = min(top_k, self.n)
+        candidates = max(candidates, k)
+        if not prefilter_dims or prefilter_dims >= self.dim or candidates >= self.n:
+            return _top_k(self.vectors @ query, k)
+
+        q = query[:prefilter_dims]
+        norm = float(np.linalg.norm(q))
+        coarse = self.prefix(prefilter_dims) @ (q / norm if norm else q)
+        cand, _ = _top_k(coarse, candidates)
+        cand.sort()  # ascending rows -> sequential reads from the mmap
+        rows, scores = _top_k(self.vectors[cand] @ query, k)
+        return cand[rows], scores
+
+    def record(self, row: int) -> Dict[str, Any]:
+        with open(self._file(META), "rb") as f:
+            f.seek(self._meta_offsets[row])
+            return json.loads(f.readline())
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """All committed rows in order (a sequential scan of meta.jsonl)."""
+        if not self.n:
+            return
+        with open(self._file(META), "rb") as f:
+            for _ in range(self.n):
+                yield json.loads(f.readline())
+
+    def records(self, rows: Sequence[int]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        if not len(rows):
+            return out
+        with open(self._file(META), "rb") as f:
+            for row in rows:
+                f.seek(self._meta_offsets[int(row)])
+                out.append(json.loads(f.readline()))
+        return out